@@ -1,53 +1,39 @@
-# Downloadable libraries
-import pandas as pd
-import yaml
+# Downloadable libraries (pandas, yaml) are imported lazily where needed,
+# so --help and submit-only runs start fast.
 
 # Standard libraries
 import os
 import sys
 import argparse
 import gzip
-import subprocess
 import shutil
 import glob
+import re
+import math
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-def load_config(cfg_path: str = "../config.yaml") -> dict:
-    """
-    Return a dict with the YAML content or an empty dict if the file is absent.
-    """
-    if os.path.exists(cfg_path):
-        with open(cfg_path, "r") as fh:
-            return yaml.safe_load(fh) or {}
-    return {}
-
-def load_table(path: str, case: str = "upper"):
-    """
-    Read first-sheet Excel (.xlsx/.xls) or TSV (.tsv/.tab/.txt) into a DataFrame.
-    Normalizes header whitespace and case.
-    """
-    ext = os.path.splitext(path)[1].lower()
-    if ext in {".xlsx", ".xls"}:
-        df = pd.read_excel(path, sheet_name=0)
-    elif ext in {".tsv", ".tab", ".txt"}:
-        df = pd.read_csv(path, sep="\t")
-    else:
-        sys.exit(f"Unsupported table extension '{ext}'. Use .xlsx/.xls or .tsv/.tab/.txt")
+# Code shared with the other scripts lives in ../enflora.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+import enflora
+from enflora import (
+    AdaptiveConcurrency, Catalog, discover_manifests, gc_store, init_metrics, _isnull, load_config,
+    load_table, plan_submission, prestage_inputs, print_plan, promotable, promote_manifests, sample_lock,
+    stage, stage_compressed, start_profile, STORE_DIR, submit_manifests, suggest_slurm, WATCH_POLL,
+    WATCH_SETTLE, watch_sheet, webin_throttled,
+)
 
-    df.columns = df.columns.str.strip()
-    if case == "upper":
-        df.columns = df.columns.str.upper()
-    elif case == "lower":
-        df.columns = df.columns.str.lower()
-    return df
 
-def stage_file(src_path: str, dest_dir: str, mode: str = "cp") -> str:
+def stage_file(src_path: str, dest_dir: str, mode: str = "cp", store: Optional[str] = None) -> str:
     """
     Stage `src_path` into `dest_dir`.
 
     mode = "cp"  -> copy into dest_dir as <basename>; returns <basename>
     mode = "cmp" -> gzip into dest_dir as <basename>.gz; returns <basename>.gz
+    With `store` (the submission dir), "cmp" goes through its content-addressed store.
     """
     if mode not in {"cp", "cmp"}:
         sys.exit(f"stage_file: invalid mode '{mode}', use 'cp' or 'cmp'")
@@ -61,13 +47,19 @@ def stage_file(src_path: str, dest_dir: str, mode: str = "cp") -> str:
     if mode == "cp":
         dst = os.path.join(dest_dir, os.path.basename(src))
         if os.path.abspath(src) != os.path.abspath(dst):
-            shutil.copy(src, dst)
+            with stage("copy", bytes_in=os.path.getsize(src), file=os.path.basename(src)) as rec:
+                shutil.copy(src, dst)
+                rec["bytes_out"] = rec["bytes_in"]
         return os.path.basename(dst)
 
     # mode == "cmp"
+    if store:
+        return stage_compressed(src, dest_dir, store)
     dst_gz = os.path.join(dest_dir, os.path.basename(src) + ".gz")
-    with open(src, "rb") as f_in, gzip.open(dst_gz, "wb") as f_out:
-        shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+    with stage("compress", bytes_in=os.path.getsize(src), file=os.path.basename(dst_gz)) as rec:
+        with open(src, "rb") as f_in, gzip.open(dst_gz, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+        rec["bytes_out"] = os.path.getsize(dst_gz)
     return os.path.basename(dst_gz)
 
 def extract_first_accession(path):
@@ -84,6 +76,272 @@ def extract_first_accession(path):
                 return parts[0]
     sys.exit(f"Error: no accession line ('AC' or '>') found in {path}")
 
+# Bytes that are not sequence residues (digits, spaces, newlines in EMBL SQ blocks)
+_NON_RESIDUE = bytes(c for c in range(256) if not chr(c).isalpha())
+
+def _embl_name(ac_line: bytes) -> str:
+    parts = ac_line[2:].decode().strip().rstrip(";").split()
+    if parts and parts[0] == "*" and len(parts) > 1:
+        return parts[1]
+    return parts[0].rstrip(";") if parts else ""
+
+def build_seq_index(path: str) -> list:
+    """
+    Single streaming pass over a FASTA or EMBL file (optionally .gz) returning
+    [(name, length, offset), ...], like a .fai index.
+
+    Names follow extract_first_accession (first '>' token, or the AC / 'AC * _name'
+    identifier); offsets are into the uncompressed stream: the first sequence line for
+    FASTA, the ID line for EMBL.
+    """
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    index = []
+    name, length, start = None, 0, 0
+    fmt, in_seq, ac_seen = None, False, False
+    pos = 0
+    with opener(path, "rb") as fh:
+        for line in fh:
+            line_start = pos
+            pos += len(line)
+            if fmt is None:
+                if line.startswith(b">"):
+                    fmt = "fasta"
+                elif line.startswith(b"ID"):
+                    fmt = "embl"
+                elif not line.strip():
+                    continue
+                else:
+                    sys.exit(f"Error: {path} is neither FASTA nor EMBL")
+
+            if fmt == "fasta":
+                if line.startswith(b">"):
+                    if name is not None:
+                        index.append((name, length, start))
+                    name, length, start = line[1:].split()[0].decode(), 0, pos
+                else:
+                    length += len(line.rstrip())
+                continue
+
+            # EMBL: one record per ID … // block
+            if line.startswith(b"ID"):
+                fields = line[2:].decode().split(";")
+                name, length, start, in_seq = fields[0].strip() or None, 0, line_start, False
+                ac_seen = False
+            elif line.startswith(b"AC") and not ac_seen:
+                name, ac_seen = _embl_name(line) or name, True
+            elif line.startswith(b"SQ"):
+                in_seq = True
+            elif line.startswith(b"//"):
+                index.append((name, length, start))
+                name = None
+            elif name is not None and in_seq:
+                length += len(line.translate(None, _NON_RESIDUE))
+    if fmt == "fasta" and name is not None:
+        index.append((name, length, start))
+    if not index:
+        sys.exit(f"Error: no sequences found in {path}")
+    return index
+
+def load_seq_index(path: str) -> list:
+    """
+    Return build_seq_index(path), cached as <path>.seqidx next to the input.
+
+    The cache header records the source size and mtime, so it is rebuilt
+    whenever the sequence file changes. Read-only input dirs just skip caching.
+    """
+    st = os.stat(path)
+    stamp = f"# {st.st_size} {st.st_mtime_ns}"
+    idx_path = path + ".seqidx"
+    if os.path.exists(idx_path):
+        with open(idx_path) as fh:
+            if fh.readline().rstrip("\n") == stamp:
+                index = []
+                for line in fh:
+                    name, length, offset = line.rstrip("\n").split("\t")
+                    index.append((name, int(length), int(offset)))
+                return index
+
+    index = build_seq_index(path)
+    try:
+        with open(idx_path, "w") as fh:
+            fh.write(stamp + "\n")
+            for name, length, offset in index:
+                fh.write(f"{name}\t{length}\t{offset}\n")
+    except OSError as exc:
+        print(f"  Could not cache sequence index {idx_path}: {exc}")
+    return index
+
+# --- EMBL flatfile lint: structure, lengths and feature bounds in one streaming pass ---
+_BP_RE = re.compile(rb"(\d+)\s+BP\b")
+# Remote locations (other entries, e.g. 'J00194.1:100..202') are not bounded by this record
+_REMOTE_LOC = re.compile(rb"[A-Za-z][\w.]*:[<>]?\d+(?:\.\.[<>]?\d+)?")
+_DIGITS = re.compile(rb"\d+")
+LINT_MAX_PROBLEMS = 20  # per file; the rest are only counted
+
+def lint_embl(path: str) -> list:
+    """
+    Check an EMBL flatfile (optionally .gz) the way Webin-CLI would reject it, in bounded memory:
+    every record is ID … SQ … //, the ID and SQ lengths match the residues, the running
+    counts at the end of sequence lines add up, and no feature location exceeds the sequence.
+    Returns a list of problems (empty if the file looks fine).
+    """
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    problems, extra = [], 0
+    def problem(ln, msg):
+        nonlocal extra
+        if len(problems) < LINT_MAX_PROBLEMS:
+            problems.append(f"line {ln}: {msg}")
+        else:
+            extra += 1
+
+    name, id_line = None, 0
+    id_len = sq_len = None
+    length, in_seq, in_loc = 0, False, False
+    max_loc, max_loc_line = 0, 0
+    counter_ok = True
+    records = 0
+    ln = 0
+    with opener(path, "rb") as fh:
+        for ln, line in enumerate(fh, start=1):
+            code = line[:2]
+            if code == b"ID":
+                if name is not None:
+                    problem(id_line, f"record {name} is not terminated with '//' before the next ID")
+                fields = line[2:].split(b";")
+                name, id_line = fields[0].strip().decode(errors="replace") or "?", ln
+                m = _BP_RE.search(line)
+                id_len = int(m.group(1)) if m else None
+                sq_len, length, in_seq, in_loc = None, 0, False, False
+                max_loc, max_loc_line, counter_ok = 0, 0, True
+                continue
+            if name is None:
+                if line.strip():
+                    problem(ln, "content outside of an ID … // record")
+                continue
+            if code == b"//":
+                records += 1
+                if not in_seq:
+                    problem(ln, f"record {name} has no SQ block")
+                if id_len is not None and id_len != length:
+                    problem(id_line, f"record {name}: ID line says {id_len} BP, sequence has {length}")
+                if sq_len is not None and sq_len != length:
+                    problem(id_line, f"record {name}: SQ line says {sq_len} BP, sequence has {length}")
+                if max_loc > length:
+                    problem(max_loc_line, f"record {name}: feature location {max_loc} is beyond the sequence end ({length})")
+                name = None
+            elif in_seq:
+                residues = len(line.translate(None, _NON_RESIDUE))
+                length += residues
+                tail = line.split()[-1:]
+                if counter_ok and residues and tail and tail[0].isdigit() and int(tail[0]) != length:
+                    problem(ln, f"record {name}: sequence line count {int(tail[0])} != residues so far {length}")
+                    counter_ok = False  # one report per record
+            elif code == b"SQ":
+                in_seq, in_loc = True, False
+                m = _BP_RE.search(line)
+                sq_len = int(m.group(1)) if m else None
+            elif code == b"FT":
+                body = line[21:].strip()
+                if line[5:6].strip():  # feature key line: location starts at column 22
+                    in_loc = True
+                elif body.startswith(b"/"):
+                    in_loc = False  # qualifiers follow the location
+                if in_loc:
+                    for d in _DIGITS.findall(_REMOTE_LOC.sub(b"", body)):
+                        pos = int(d)
+                        if pos == 0:
+                            problem(ln, f"record {name}: feature location 0 (positions start at 1)")
+                        elif pos > max_loc:
+                            max_loc, max_loc_line = pos, ln
+    if name is not None:
+        problem(ln, f"record {name} is not terminated with '//' (truncated file?)")
+    if not records and not problems:
+        problem(ln, "no ID … // records found")
+    if extra:
+        problems.append(f"… and {extra} more")
+    return problems
+
+def lint_flatfiles(paths, threads: int = 4):
+    """
+    lint_embl() every flatfile before anything is staged; all broken files are
+    reported together and the run stops.
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return
+    size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+    bad = {}
+    with stage("lint_embl", bytes_in=size, files=len(paths)) as rec:
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+            for path, problems in zip(paths, pool.map(lint_embl, paths)):
+                if problems:
+                    bad[path] = problems
+        rec["bad"] = len(bad)
+    if bad:
+        for path, problems in bad.items():
+            print(f"  {path}:")
+            for p in problems:
+                print(f"    {p}")
+        sys.exit(f"{len(bad)} of {len(paths)} flatfile(s) failed the EMBL check; fix them or run with --no_lint")
+    print(f"→ EMBL check: {len(paths)} flatfile(s) OK")
+
+def build_chr_entries(index: list, chr_map: str, chr_rule: str, chr_type: str, chr_loc: str) -> list:
+    """
+    Chromosome list entries (object name, chromosome name, type, location) for a
+    multi-sequence assembly.
+
+    chr_map:  TSV of 'sequence<TAB>chromosome[<TAB>type[<TAB>location]]' lines.
+    chr_rule: 'all' (every sequence, named after itself) or a regex; sequences
+              matching it become chromosomes named after the first group (or the
+              whole name). Non-matching sequences stay unplaced.
+    """
+    names = {name for name, _, _ in index}
+    entries = []
+    if chr_map:
+        if not os.path.isfile(chr_map):
+            sys.exit(f"Chromosome mapping file not found: {chr_map}")
+        with open(chr_map) as fh:
+            for line in fh:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                parts = [p.strip() for p in line.rstrip("\n").split("\t")]
+                if len(parts) < 2:
+                    sys.exit(f"{chr_map}: expected 'sequence<TAB>chromosome', got '{line.strip()}'")
+                parts += [chr_type, chr_loc][len(parts) - 2:]
+                entries.append(tuple(parts[:4]))
+        unknown = [e[0] for e in entries if e[0] not in names]
+        if unknown:
+            sys.exit(f"{chr_map}: sequence(s) not in assembly: {', '.join(unknown[:10])}"
+                     + (" …" if len(unknown) > 10 else ""))
+    elif chr_rule.lower() == "all":
+        entries = [(name, name, chr_type, chr_loc) for name, _, _ in index]
+    else:
+        try:
+            rx = re.compile(chr_rule)
+        except re.error as exc:
+            sys.exit(f"Invalid CHR_RULE regex '{chr_rule}': {exc}")
+        for name, _, _ in index:
+            m = rx.search(name)
+            if m:
+                entries.append((name, m.group(1) if rx.groups else name, chr_type, chr_loc))
+    if not entries:
+        sys.exit(f"No sequences selected as chromosomes (CHR_MAP='{chr_map}', CHR_RULE='{chr_rule}')")
+    return entries
+
+def write_chr_list(path: str, entries: list, row: int):
+    """
+    Write chromosome list entries as ENA expects: object name, chromosome name and type,
+    plus the location column only where one is given.
+    """
+    lines = []
+    for entry in entries:
+        obj, name, ctype, loc = (("" if _isnull(v) else str(v).strip()) for v in entry)
+        if not obj or not name or not ctype:
+            sys.exit(f"Row {row}: chromosome list entry {entry} needs an object name, chromosome name and type")
+        lines.append("\t".join([obj, name, ctype, loc] if loc else [obj, name, ctype]))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
 def _norm_level(x: Optional[str]) -> str:
     if not x:
         return "chromosome" # backward-compatible default
@@ -111,10 +369,148 @@ def has_n_gaps(fasta_path, n=50):
             prev = s[-(n-1):]
     return False
 
-def convert_manifests(table_file: str, submission_dir: str = "submission", default_level: str = "chromosome", default_mingaplength: Optional[int] = None,) -> list:
+_N_RUN = re.compile(rb"[Nn]+")
+AGP_BLOCK = 1024 * 1024  # bytes read at a time by write_agp_from_gaps
+
+def write_agp_from_gaps(fasta_path: str, dest_dir: str, min_gap: int, evidence: str = "unspecified", width: int = 60):
+    """
+    Split the scaffolds of `fasta_path` at N-runs >= `min_gap` in one streaming pass.
+
+    Writes, gzipped into dest_dir:
+      <stem>.contigs.fasta.gz – the contig components (<scaffold>_<k>), `width` bases per line
+      <stem>.agp.gz           – AGP 2.0 with a W line per contig and a scaffold gap line per N-run
+    Shorter N-runs stay inside their contig; leading/trailing Ns are trimmed off the scaffold.
+    The input is read AGP_BLOCK bytes at a time, so memory stays flat whatever the assembly
+    size and however long its lines (unwrapped scaffolds included).
+
+    Returns (contigs_name, agp_name, n_gaps).
+    """
+    base = os.path.basename(fasta_path)
+    if base.lower().endswith(".gz"):
+        base = base[:-3]
+    stem = os.path.splitext(base)[0]
+    fa_name, agp_name = f"{stem}.contigs.fasta.gz", f"{stem}.agp.gz"
+    opener = gzip.open if fasta_path.lower().endswith(".gz") else open
+    os.makedirs(dest_dir, exist_ok=True)
+
+    n_gaps = 0
+    with opener(fasta_path, "rb") as fh, \
+         gzip.open(os.path.join(dest_dir, fa_name), "wb", compresslevel=6) as fa, \
+         gzip.open(os.path.join(dest_dir, agp_name), "wt", compresslevel=6) as agp:
+        agp.write("##agp-version\t2.0\n")
+        st = {}
+
+        def start_scaffold(name):
+            st.update(name=name, pos=0, trim=None, part=0, contigs=0,
+                      contig_beg=None, col=0, n_run=0)
+
+        def put(seq):
+            # wrapped write of contig sequence: fill the open line, then whole lines, then the rest
+            off, n = 0, len(seq)
+            if st["col"]:
+                off = min(width - st["col"], n)
+                fa.write(seq[:off])
+                st["col"] += off
+                if st["col"] < width:
+                    return
+                fa.write(b"\n")
+                st["col"] = 0
+            full = off + (n - off) // width * width
+            if full > off:
+                fa.write(b"\n".join(seq[k:k + width] for k in range(off, full, width)) + b"\n")
+            if full < n:
+                fa.write(seq[full:])
+                st["col"] = n - full
+
+        def close_contig(end):
+            # `end` is the 0-based exclusive scaffold position of the contig end
+            if st["col"]:
+                fa.write(b"\n")
+                st["col"] = 0
+            beg = st["contig_beg"]
+            st["part"] += 1
+            clen = end - beg
+            agp.write(f"{st['name']}\t{beg - st['trim'] + 1}\t{end - st['trim']}\t{st['part']}\tW\t"
+                      f"{st['name']}_{st['contigs']}\t1\t{clen}\t+\n")
+            st["contig_beg"] = None
+
+        def bases(chunk):
+            nonlocal n_gaps
+            run = st["n_run"]
+            if run:
+                st["n_run"] = 0
+                if st["contig_beg"] is not None and run >= min_gap:
+                    gap_beg = st["pos"] - run
+                    close_contig(gap_beg)
+                    st["part"] += 1
+                    agp.write(f"{st['name']}\t{gap_beg - st['trim'] + 1}\t{st['pos'] - st['trim']}\t{st['part']}\tN\t"
+                              f"{run}\tscaffold\tyes\t{evidence}\n")
+                    n_gaps += 1
+                elif st["contig_beg"] is not None:
+                    put(b"N" * run)  # short run stays inside the contig
+            if st["contig_beg"] is None:
+                if st["trim"] is None:
+                    st["trim"] = st["pos"]  # leading Ns are dropped
+                st["contigs"] += 1
+                st["contig_beg"] = st["pos"]
+                fa.write(f">{st['name']}_{st['contigs']}\n".encode())
+            put(chunk)
+            st["pos"] += len(chunk)
+
+        def end_scaffold():
+            if not st:
+                return
+            if st["contig_beg"] is not None:
+                close_contig(st["pos"] - st["n_run"])  # trailing Ns are dropped
+            elif st["contigs"] == 0:
+                print(f"  WARNING: scaffold {st['name']} is all N; left out of the AGP")
+
+        def residues(seq):
+            last = 0
+            for m in _N_RUN.finditer(seq):
+                if m.start() > last:
+                    bases(seq[last:m.start()])
+                run = m.end() - m.start()
+                st["n_run"] += run
+                st["pos"] += run
+                last = m.end()
+            if last < len(seq):
+                bases(seq[last:])
+
+        header = None  # the '>' line being read, once it spans blocks
+        bol = True     # block position is at the start of a line
+        while True:
+            block = fh.read(AGP_BLOCK)
+            if not block:
+                break
+            i = 0
+            while i < len(block):
+                if header is not None:
+                    j = block.find(b"\n", i)
+                    if j < 0:
+                        header += block[i:]
+                        break
+                    header += block[i:j]
+                    end_scaffold()
+                    start_scaffold(header.split()[0].decode())
+                    header, bol, i = None, True, j + 1
+                elif bol and block[i] == 0x3E:  # '>'
+                    header, i = b"", i + 1
+                else:
+                    # sequence up to the next header line, line breaks and blanks dropped
+                    j = block.find(b"\n>", i)
+                    end = len(block) if j < 0 else j + 1
+                    residues(block[i:end].translate(None, b" \t\r\n\v\f"))
+                    bol, i = block[end - 1] == 0x0A, end
+        end_scaffold()
+    return fa_name, agp_name, n_gaps
+
+def convert_manifests(table_file: str, submission_dir: str = "submission", default_level: str = "chromosome", default_mingaplength: Optional[int] = None, default_chr_rule: Optional[str] = None, generate_agp: bool = False, sample_map: Optional[dict] = None, wait: bool = True, lint: bool = True, threads: int = 4, byte_budget: int = 0, rows: Optional[set] = None, staged: Optional[dict] = None,) -> list:
     """
     Convert the analysis table (Excel/TSV) to per-sample Webin-CLI submission folders.
     ...
+    With `rows` (0-based row numbers) only those rows are staged; sample IDs are still
+    counted over the whole sheet. `staged`, if given, is filled with {row: manifest}.
     """
     # Load table (UPPERCASE headers expected by this script)
     df = load_table(table_file, case="upper")
@@ -139,146 +535,275 @@ def convert_manifests(table_file: str, submission_dir: str = "submission", defau
     has_chr_name = "CHR_NAME" in optional_cols
     has_chr_type = "CHR_TYPE" in optional_cols
     has_chr_loc  = "CHR_LOCATION" in optional_cols
+    has_chr_map  = "CHR_MAP" in optional_cols
+    has_chr_rule = "CHR_RULE" in optional_cols
+
+    # Lint all EMBL flatfiles up front, so a broken one stops the run before anything is staged
+    selected = lambda idx: rows is None or idx in rows
+    if lint and "FLATFILE" in df.columns:
+        flats = []
+        for idx, row in df.iterrows():
+            if not selected(idx):
+                continue
+            val = row.get("FLATFILE")
+            if not _isnull(val) and str(val).strip().lower().endswith((".embl", ".embl.gz")):
+                flats.append(os.path.abspath(str(val).strip()))
+        lint_flatfiles([p for p in flats if os.path.exists(p)], threads=threads)
+
+    # Inputs that are gzipped as they are go into the store up front, in parallel and largest first
+    # (FASTA is split instead when AGPs are generated, and .gb is converted first)
+    plain = []
+    for idx, row in df.iterrows():
+        if not selected(idx):
+            continue
+        for col in ("FLATFILE", "AGP") if generate_agp else ("FLATFILE", "AGP", "FASTA"):
+            val = row.get(col)
+            if not _isnull(val) and str(val).strip().lower() not in ("", "nan"):
+                src = os.path.abspath(str(val).strip())
+                if not src.lower().endswith(".gb") and os.path.isfile(src):
+                    plain.append(src)
+    prestage_inputs(plain, submission_dir, threads=threads, byte_budget=byte_budget)
 
     os.makedirs(submission_dir, exist_ok=True)
     manifest_paths = []
+    catalog = Catalog(submission_dir)
 
-    for idx, row in df.iterrows():
-        n = idx + 1
+    try:
+        for idx, row in df.iterrows():
+            n = idx + 1
 
-        # In case there is more than one object associated with the same sample
-        raw_id = str(row["SAMPLE"]).strip()
-        sample_counts[raw_id] += 1
-        sample_id = raw_id if sample_counts[raw_id] == 1 else f"{raw_id}_{sample_counts[raw_id]}"
+            # In case there is more than one object associated with the same sample
+            raw_id = str(row["SAMPLE"]).strip()
+            # Biosample aliases → accessions, when called from ../pipeline.py
+            if sample_map:
+                raw_id = sample_map.get(raw_id, raw_id)
+            sample_counts[raw_id] += 1
+            sample_id = raw_id if sample_counts[raw_id] == 1 else f"{raw_id}_{sample_counts[raw_id]}"
+            if not selected(idx):
+                continue
 
-        samp_dir = os.path.join(submission_dir, sample_id)
-        os.makedirs(samp_dir, exist_ok=True)
-
-        # Data file: exactly one of FLATFILE or FASTA
-        flat = str(row.get("FLATFILE", "")).strip()
-        fasta = str(row.get("FASTA", "")).strip()
-        has_flat = bool(flat) and flat.lower() != "nan"
-        has_fasta = bool(fasta) and fasta.lower() != "nan"
-        if has_flat == has_fasta:
-            sys.exit(f"Row {n}: exactly one of FLATFILE or FASTA must be set")
-
-        if has_flat:
-            path_in = os.path.abspath(flat)
-            ext = os.path.splitext(path_in)[1].lower()
-            if ext == ".gb":
-                try:
-                    from Bio import SeqIO  # lazy import
-                except ImportError:
-                    sys.exit(
-                        "Error: converting .gb → .embl requires Biopython;\n"
-                        " please install biopython or supply an .embl flatfile."
-                    )
-                stem = os.path.splitext(os.path.basename(flat))[0]
-                embl_path = os.path.join(samp_dir, stem + ".embl")
-                recs = SeqIO.parse(path_in, "genbank")
-                count = SeqIO.write(recs, embl_path, "embl")
-                if count == 0:
-                    sys.exit(f"Row {n}: no records written converting {path_in}")
-                print(f"[Row {n}] Converted {path_in} → {embl_path} ({count} recs)")
-                seqname = extract_first_accession(embl_path)
-                data_field = ("FLATFILE", stage_file(embl_path, samp_dir, mode="cmp"))
-
-            elif ext == ".embl":
-                seqname = extract_first_accession(path_in)
-                data_field = ("FLATFILE", stage_file(path_in, samp_dir, mode="cmp"))
-            else:
-                sys.exit(f"Row {n}: FLATFILE must end in .gb or .embl, not '{ext}'")
-        else:
-            src = os.path.abspath(fasta)
-            seqname = extract_first_accession(src)            # read the original to get the first header
-            data_field = ("FASTA", stage_file(src, samp_dir, mode="cmp"))
-
-        # Determine assembly level
-        level = _norm_level(row.get("ASSEMBLY_LEVEL") if has_level_col else default_level)
-
-        # Prepare optional files/fields depending on level
-        agp_field = None
-        chrlist_field = None
-        mingap_value: Optional[int] = None
-
-        if level == "chromosome":
-            # Allow user-provided CHR_* columns, else fall back to plastid-friendly default
-            chr_name = str(row.get("CHR_NAME", "1")).strip() if has_chr_name else "1"
-            chr_type = str(row.get("CHR_TYPE", "Circular-Chromosome")).strip() if has_chr_type else "Circular-Chromosome"
-            chr_loc  = str(row.get("CHR_LOCATION", "Plastid")).strip() if has_chr_loc else "Plastid"
-
-            chr_txt = os.path.join(samp_dir, "chr_list.txt")
-            with open(chr_txt, "w") as f:
-                f.write(f"{seqname}\t{chr_name}\t{chr_type}\t{chr_loc}")
-            chr_gz = stage_file(chr_txt, samp_dir, mode="cmp")
-            chrlist_field = ("CHROMOSOME_LIST", chr_gz)
-
-        elif level == "scaffold":
-            # Either AGP or MINGAPLENGTH must be provided
-            agp_val = str(row.get("AGP", "")).strip() if has_agp_col else ""
-            if agp_val and agp_val.lower() != "nan":
-                agp_field = ("AGP", stage_file(agp_val, samp_dir, mode="cmp"))
-            else:
-                # No AGP: require MINGAPLENGTH either in Excel or default from config
-                if has_mingap_col:
-                    raw_mg = row.get("MINGAPLENGTH")
-                    if pd.notnull(raw_mg) and str(raw_mg).strip() != "":
+            samp_dir = os.path.join(submission_dir, sample_id)
+            # Another job staging/submitting the same sample holds this lock
+            lock = sample_lock(samp_dir, wait=wait)
+            if not lock.acquire():
+                print(f"[Row {n}] {sample_id} is claimed by another job, skipping")
+                continue
+            try:
+                os.makedirs(samp_dir, exist_ok=True)
+
+                # Data file: exactly one of FLATFILE or FASTA
+                flat = str(row.get("FLATFILE", "")).strip()
+                fasta = str(row.get("FASTA", "")).strip()
+                has_flat = bool(flat) and flat.lower() != "nan"
+                has_fasta = bool(fasta) and fasta.lower() != "nan"
+                if has_flat == has_fasta:
+                    sys.exit(f"Row {n}: exactly one of FLATFILE or FASTA must be set")
+                embl_path = None  # set when a .gb flatfile is converted
+
+                if has_flat:
+                    path_in = os.path.abspath(flat)
+                    ext = os.path.splitext(path_in)[1].lower()
+                    if ext == ".gb":
                         try:
-                            mingap_value = int(raw_mg)
-                        except ValueError:
-                            sys.exit(f"Row {n}: MINGAPLENGTH must be an integer (got '{raw_mg}')")
-                if mingap_value is None:
-                    if default_mingaplength is None:
-                        sys.exit(
-                            f"Row {n}: scaffold-level requires AGP or MINGAPLENGTH (set column or config.default_mingaplength)."
-                        )
-                    mingap_value = int(default_mingaplength)
-
-        elif level == "contig":
-            pass  # nothing extra
-        else:
-            raise SystemExit(f"Internal error: unexpected level '{level}'")
+                            from Bio import SeqIO  # lazy import
+                        except ImportError:
+                            sys.exit(
+                                "Error: converting .gb → .embl requires Biopython;\n"
+                                " please install biopython or supply an .embl flatfile."
+                            )
+                        stem = os.path.splitext(os.path.basename(flat))[0]
+                        embl_path = os.path.join(samp_dir, stem + ".embl")
+                        with stage("genbank_to_embl", row=n, bytes_in=os.path.getsize(path_in)) as rec:
+                            recs = SeqIO.parse(path_in, "genbank")
+                            count = SeqIO.write(recs, embl_path, "embl")
+                            rec["bytes_out"] = os.path.getsize(embl_path)
+                        if count == 0:
+                            sys.exit(f"Row {n}: no records written converting {path_in}")
+                        print(f"[Row {n}] Converted {path_in} → {embl_path} ({count} recs)")
+                        if lint:
+                            problems = lint_embl(embl_path)
+                            if problems:
+                                sys.exit(f"Row {n}: converted flatfile {embl_path} failed the EMBL check:\n  " + "\n  ".join(problems))
+                        seq_file = embl_path  # rewritten every run, so its index is not cached
+                        seqname = extract_first_accession(embl_path)
+                        data_field = ("FLATFILE", stage_file(embl_path, samp_dir, mode="cmp", store=submission_dir))
+
+                    elif ext == ".embl":
+                        seq_file = path_in
+                        seqname = extract_first_accession(path_in)
+                        data_field = ("FLATFILE", stage_file(path_in, samp_dir, mode="cmp", store=submission_dir))
+                    else:
+                        sys.exit(f"Row {n}: FLATFILE must end in .gb or .embl, not '{ext}'")
+                else:
+                    src = os.path.abspath(fasta)
+                    seq_file = src
+                    seqname = extract_first_accession(src)            # read the original to get the first header
+                    data_field = None  # staged below, unless split into contigs + AGP
+
+                # Determine assembly level
+                level = _norm_level(row.get("ASSEMBLY_LEVEL") if has_level_col else default_level)
+
+                # Prepare optional files/fields depending on level
+                agp_field = None
+                chrlist_field = None
+                mingap_value: Optional[int] = None
+
+                if level == "chromosome":
+                    # Allow user-provided CHR_* columns, else fall back to plastid-friendly default
+                    chr_name = str(row.get("CHR_NAME", "1")).strip() if has_chr_name else "1"
+                    chr_type = str(row.get("CHR_TYPE", "Circular-Chromosome")).strip() if has_chr_type else "Circular-Chromosome"
+                    chr_loc  = str(row.get("CHR_LOCATION", "Plastid")).strip() if has_chr_loc else "Plastid"
+
+                    # Multi-entry chromosome list from a mapping file or a naming rule
+                    chr_map = str(row.get("CHR_MAP", "")).strip() if has_chr_map else ""
+                    chr_rule = str(row.get("CHR_RULE", "")).strip() if has_chr_rule else ""
+                    chr_map = "" if chr_map.lower() == "nan" else chr_map
+                    chr_rule = "" if chr_rule.lower() == "nan" else chr_rule
+                    if not chr_rule:
+                        chr_rule = default_chr_rule or ""
+                    if chr_map or chr_rule:
+                        # Nuclear defaults unless the table says otherwise
+                        multi_type = chr_type if has_chr_type else "Linear-Chromosome"
+                        multi_loc = chr_loc if has_chr_loc else ""
+                        with stage("seq_index", row=n, bytes_in=os.path.getsize(seq_file)):
+                            index = build_seq_index(seq_file) if seq_file == embl_path else load_seq_index(seq_file)
+                        entries = build_chr_entries(index, chr_map, chr_rule, multi_type, multi_loc)
+                    else:
+                        entries = [(seqname, chr_name, chr_type, chr_loc)]
+
+                    chr_txt = os.path.join(samp_dir, "chr_list.txt")
+                    write_chr_list(chr_txt, entries, row=n)
+                    if len(entries) > 1:
+                        print(f"[Row {n}] Chromosome list: {len(entries)} entries")
+                    chr_gz = stage_file(chr_txt, samp_dir, mode="cmp")
+                    chrlist_field = ("CHROMOSOME_LIST", chr_gz)
+
+                elif level == "scaffold":
+                    # Either AGP or MINGAPLENGTH must be provided
+                    agp_val = str(row.get("AGP", "")).strip() if has_agp_col else ""
+                    if agp_val and agp_val.lower() != "nan":
+                        agp_field = ("AGP", stage_file(agp_val, samp_dir, mode="cmp", store=submission_dir))
+                    else:
+                        # No AGP: require MINGAPLENGTH either in Excel or default from config
+                        if has_mingap_col:
+                            raw_mg = row.get("MINGAPLENGTH")
+                            if not _isnull(raw_mg) and str(raw_mg).strip() != "":
+                                try:
+                                    mingap_value = int(raw_mg)
+                                except ValueError:
+                                    sys.exit(f"Row {n}: MINGAPLENGTH must be an integer (got '{raw_mg}')")
+                        if mingap_value is None:
+                            if default_mingaplength is None:
+                                sys.exit(
+                                    f"Row {n}: scaffold-level requires AGP or MINGAPLENGTH (set column or config.default_mingaplength)."
+                                )
+                            mingap_value = int(default_mingaplength)
+
+                        # Optionally turn the N-runs into a real AGP over contig components
+                        if generate_agp and has_fasta:
+                            with stage("generate_agp", row=n, bytes_in=os.path.getsize(src)) as rec:
+                                fa_gz, agp_gz, n_gaps = write_agp_from_gaps(src, samp_dir, mingap_value)
+                                rec["bytes_out"] = os.path.getsize(os.path.join(samp_dir, fa_gz))
+                            print(f"[Row {n}] Generated {agp_gz} ({n_gaps} gaps ≥ {mingap_value} N)")
+                            if not n_gaps:
+                                print(f"[Row {n}] WARNING: no N runs ≥ {mingap_value} found; this looks contig-level.")
+                            data_field = ("FASTA", fa_gz)
+                            agp_field = ("AGP", agp_gz)
+                            mingap_value = None
+                        elif generate_agp:
+                            print(f"[Row {n}] WARNING: AGP generation needs a FASTA; using MINGAPLENGTH for the flatfile.")
+
+                elif level == "contig":
+                    pass  # nothing extra
+                else:
+                    raise SystemExit(f"Internal error: unexpected level '{level}'")
         
-        # Decide which source file to scan for Ns
-        seq_src = None
-        if has_fasta:
-            seq_src = src  # scan the original FASTA
-
-        # Only warn for scaffold-level with implicit Ns (no AGP)
-        if level == "scaffold" and not agp_field:
-            threshold = (mingap_value if mingap_value is not None else default_mingaplength or 50)
-            if seq_src and not has_n_gaps(seq_src, threshold):
-                print(f"[Row {n}] WARNING: no N runs ≥ {threshold} found; this looks contig-level.")
-
-        # Write manifest.txt
-        mf = os.path.join(samp_dir, "manifest.txt")
-        with open(mf, "w") as fh:
-            fh.write(f"STUDY\t{row['STUDY']}\n")
-            fh.write(f"SAMPLE\t{row['SAMPLE']}\n")
-            fh.write(f"RUN_REF\t{row['RUN_REF']}\n")
-            fh.write(f"ASSEMBLYNAME\t{row['ASSEMBLYNAME']}\n")
-            fh.write(f"ASSEMBLY_TYPE\t{row['ASSEMBLY_TYPE']}\n")
-            fh.write(f"COVERAGE\t{row['COVERAGE']}\n")
-            fh.write(f"PROGRAM\t{row['PROGRAM']}\n")
-            fh.write(f"PLATFORM\t{row['PLATFORM']}\n")
-            # MINGAPLENGTH is only meaningful for scaffold level when using Ns
-            if mingap_value is not None:
-                fh.write(f"MINGAPLENGTH\t{mingap_value}\n")
-            fh.write(f"MOLECULETYPE\t{row['MOLECULETYPE']}\n")
-            if pd.notnull(row.get("DESCRIPTION")) and str(row.get("DESCRIPTION")).strip().lower() != "nan":
-                fh.write(f"DESCRIPTION\t{row['DESCRIPTION']}\n")
-            # Data file
-            fh.write(f"{data_field[0]}\t{data_field[1]}\n")
-            # Optional files according to level
-            if agp_field:
-                fh.write(f"{agp_field[0]}\t{agp_field[1]}\n")
-            if chrlist_field:
-                fh.write(f"{chrlist_field[0]}\t{chrlist_field[1]}\n")
-        print(f"[Row {n}] Wrote manifest → {mf} (level={level})")
-        manifest_paths.append(mf)
+                if data_field is None:
+                    data_field = ("FASTA", stage_file(src, samp_dir, mode="cmp", store=submission_dir))
+
+                # Decide which source file to scan for Ns
+                seq_src = None
+                if has_fasta:
+                    seq_src = src  # scan the original FASTA
+
+                # Only warn for scaffold-level with implicit Ns (no AGP)
+                if level == "scaffold" and not agp_field:
+                    threshold = (mingap_value if mingap_value is not None else default_mingaplength or 50)
+                    if seq_src:
+                        with stage("has_n_gaps", row=n, bytes_in=os.path.getsize(seq_src)):
+                            gapped = has_n_gaps(seq_src, threshold)
+                        if not gapped:
+                            print(f"[Row {n}] WARNING: no N runs ≥ {threshold} found; this looks contig-level.")
+
+                # Write manifest.txt
+                mf = os.path.join(samp_dir, "manifest.txt")
+                with open(mf, "w") as fh:
+                    fh.write(f"STUDY\t{row['STUDY']}\n")
+                    fh.write(f"SAMPLE\t{raw_id}\n")
+                    fh.write(f"RUN_REF\t{row['RUN_REF']}\n")
+                    fh.write(f"ASSEMBLYNAME\t{row['ASSEMBLYNAME']}\n")
+                    fh.write(f"ASSEMBLY_TYPE\t{row['ASSEMBLY_TYPE']}\n")
+                    fh.write(f"COVERAGE\t{row['COVERAGE']}\n")
+                    fh.write(f"PROGRAM\t{row['PROGRAM']}\n")
+                    fh.write(f"PLATFORM\t{row['PLATFORM']}\n")
+                    # MINGAPLENGTH is only meaningful for scaffold level when using Ns
+                    if mingap_value is not None:
+                        fh.write(f"MINGAPLENGTH\t{mingap_value}\n")
+                    fh.write(f"MOLECULETYPE\t{row['MOLECULETYPE']}\n")
+                    if not _isnull(row.get("DESCRIPTION")) and str(row.get("DESCRIPTION")).strip().lower() != "nan":
+                        fh.write(f"DESCRIPTION\t{row['DESCRIPTION']}\n")
+                    # Data file
+                    fh.write(f"{data_field[0]}\t{data_field[1]}\n")
+                    # Optional files according to level
+                    if agp_field:
+                        fh.write(f"{agp_field[0]}\t{agp_field[1]}\n")
+                    if chrlist_field:
+                        fh.write(f"{chrlist_field[0]}\t{chrlist_field[1]}\n")
+                print(f"[Row {n}] Wrote manifest → {mf} (level={level})")
+                catalog.add_sample(sample_id, n, mf)
+                manifest_paths.append(mf)
+                if staged is not None:
+                    staged[idx] = mf
+            finally:
+                lock.release()
 
+        catalog.link_store(os.path.join(submission_dir, STORE_DIR))
+    finally:
+        catalog.close()
     return manifest_paths
 
+
+def _row_inputs(row, file_cols) -> list:
+    """
+    Absolute paths of the files a row reads.
+    """
+    return [os.path.abspath(str(row.get(col)).strip()) for col in file_cols
+            if not _isnull(row.get(col)) and str(row.get(col)).strip().lower() not in ("", "nan")]
+
+
+def plan_inputs(table_file) -> list:
+    """
+    [(sample_id, [(path, compress), …]), …] for --plan, following convert_manifests'
+    rules (FASTA/FLATFILE/AGP are gzipped into submission/) without writing anything.
+    GenBank files are costed as if the converted EMBL had the same size.
+    """
+    df = load_table(table_file, case="upper")
+    if "SAMPLE" not in df.columns:
+        sys.exit("Missing columns in table: SAMPLE")
+    sample_counts = defaultdict(int)
+    samples = []
+    for _, row in df.iterrows():
+        raw_id = str(row["SAMPLE"]).strip()
+        sample_counts[raw_id] += 1
+        sample_id = raw_id if sample_counts[raw_id] == 1 else f"{raw_id}_{sample_counts[raw_id]}"
+        files = []
+        for col in ("FLATFILE", "FASTA", "AGP"):
+            val = row.get(col)
+            if not _isnull(val) and str(val).strip().lower() not in ("", "nan"):
+                files.append((os.path.abspath(str(val).strip()), True))
+        samples.append((sample_id, files))
+    return samples
+
 def prepare_logs_dir(logs_dir="logs"):
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
@@ -305,51 +830,6 @@ def find_jar(jar_arg):
         return webin[0]
     sys.exit("Auto-detect failed; pass --jar /path/to/webin-cli.jar")
 
-def drop_cached_validation(log_subdir: str):
-    """
-    Delete logs/<sample_id>/genome/*/validate.json without deleting the whole log dir, forcing Webin-CLI to recalculate MD5s on the next run.
-    """
-    pattern = os.path.join(log_subdir, "genome", "*", "validate.json")
-    for path in glob.glob(pattern):
-        try:
-            os.remove(path)
-            print(f"  Removed cached validation → {path}")
-        except OSError as exc:
-            print(f"  Could not remove {path}: {exc}")
-
-def submit_manifests(manifests, jar, user, pwd, live, logs_dir):
-    for mf in manifests:
-        inp = os.path.dirname(mf)
-        sample_id = os.path.basename(inp)
-        log_subdir = os.path.join(logs_dir, sample_id)
-        os.makedirs(log_subdir, exist_ok=True)
-        drop_cached_validation(log_subdir)
-        cmd = [
-            "java", "-jar", jar,
-            "-context", "genome",
-            "-manifest", mf,
-            "-inputDir", inp,
-            "-outputDir", log_subdir,
-            "-submit",
-            "-username", user,
-            "-password", pwd
-        ]
-        if not live:
-            cmd.insert(cmd.index("-submit"), "-test")
-
-        # redact user and password in the printed command
-        safe_cmd = [
-            ("******" if c in (user, pwd) else c)       # replace secrets
-            for c in cmd
-        ]
-        print(f"→ Running: {' '.join(safe_cmd)}")
-
-        res = subprocess.run(cmd, capture_output=True, text=True)
-        print(f"  Return code: {res.returncode}")
-        if res.stdout:
-            print(res.stdout)
-        if res.stderr:
-            print(res.stderr, file=sys.stderr)
 
 def main():
     p = argparse.ArgumentParser(
@@ -393,6 +873,94 @@ def main():
     p.add_argument(
     "--mingaplength", type=int,
     help="Default MINGAPLENGTH when submitting scaffolds without AGP")
+
+    p.add_argument(
+    "--generate_agp", action="store_true",
+    help="For scaffolds without AGP, split the FASTA at N-runs >= MINGAPLENGTH into contigs + a generated AGP")
+
+    p.add_argument(
+    "--chr_rule",
+    help="Default CHR_RULE for chromosome lists: 'all' or a regex on sequence names (first group = chromosome name)")
+
+    p.add_argument(
+        "--on_locked", choices=["wait", "skip"], default="wait",
+        help="When another job is staging/submitting the same sample: wait for it (default) or skip the sample")
+
+    p.add_argument(
+        "--plan", action="store_true",
+        help="Dry run: estimate staged bytes, compression/checksum/upload time and Slurm resources for TABLE, then exit")
+
+    p.add_argument(
+        "--plan_mbps", type=float, default=20.0,
+        help="Upload bandwidth assumed by --plan, in MB/s (default=20)")
+
+    p.add_argument(
+        "--no_lint", action="store_true",
+        help="Skip the EMBL flatfile check (record structure, lengths, feature bounds) before staging")
+
+    p.add_argument(
+        "--threads", type=int, default=4,
+        help="Flatfiles checked in parallel (default=4)")
+
+    p.add_argument(
+        "--webin_batch", action="store_true",
+        help="Run all manifests in one long-lived Webin-CLI JVM (../webin_batch/WebinBatch.java); falls back to one java -jar per manifest")
+
+    p.add_argument(
+        "--jobs", type=int, default=1,
+        help="Webin-CLI submissions running at once, largest sample first (default=1; 1 with --webin_batch)")
+
+    p.add_argument(
+        "--min_jobs", type=int, default=1,
+        help="Lower bound for adaptive concurrency (with --max_jobs, default=1)")
+
+    p.add_argument(
+        "--max_jobs", type=int, default=0,
+        help="Adapt the number of parallel submissions between --min_jobs and this, from throughput and throttling (default=0, fixed --jobs)")
+
+    p.add_argument(
+        "--max_mbps", type=float, default=0,
+        help="Cap on the total upload rate in MB/s, e.g. on a shared login node (default=0, no cap)")
+
+    p.add_argument(
+        "--max_inflight_gb", type=float, default=0,
+        help="Cap on GB being compressed or uploaded at once; larger items wait, an item over the cap runs alone (default=0, no cap)")
+
+    p.add_argument(
+        "--promote", action="store_true",
+        help="Submit to live every sample whose test submission succeeded and whose staged files are unchanged; nothing is re-staged")
+
+    p.add_argument(
+        "--gc_store", action="store_true",
+        help="Remove staged objects in <submission_dir>/.objects/ that no sample folder links to any more")
+
+    p.add_argument(
+        "--report", action="store_true",
+        help="Print what the catalog (<submission_dir>/.catalog.sqlite) holds: samples and bytes per status, failed samples")
+
+    p.add_argument(
+        "--profile", action="store_true",
+        help="Run under cProfile and dump stats to logs/metrics/")
+
+    p.add_argument(
+        "--watch", action="store_true",
+        help="Keep running: stage (and with -s submit) rows of TABLE as they and their files arrive, until Ctrl-C")
+
+    p.add_argument(
+        "--watch_settle", type=float, default=WATCH_SETTLE,
+        help=f"Seconds an input must keep its size and mtime before --watch stages it (default={WATCH_SETTLE:g})")
+
+    p.add_argument(
+        "--watch_poll", type=float, default=WATCH_POLL,
+        help=f"Seconds between --watch re-scans when inotify is unavailable (default={WATCH_POLL:g})")
+
+    p.add_argument(
+        "--table_cache", metavar="DIR",
+        help="Cache dir for parsed Excel sheets (default: ~/.cache/enflora/tables)")
+
+    p.add_argument(
+        "--no_table_cache", action="store_true",
+        help="Always re-parse Excel sheets instead of using the cache")
     
     args = p.parse_args()
 
@@ -424,6 +992,10 @@ def main():
     live = cfg.get("live")
     if not live:
         live = args.live
+    # Per-stage metrics under logs/metrics/, and optional cProfile of the whole run
+    init_metrics(args.logs_dir, "analysis")
+    if args.profile:
+        start_profile(args.logs_dir, "analysis")
     # 7. assembly level (chromosome, scaffold or contig) and mingaplength for scaffold and no agp file
     default_level = cfg.get("assembly_level")
     if not default_level:
@@ -431,6 +1003,130 @@ def main():
     default_mingap = cfg.get("mingaplength")
     if not default_mingap:
         default_mingap = args.mingaplength
+    # 8. chromosome list rule for multi-sequence assemblies
+    chr_rule = cfg.get("chr_rule")
+    if not chr_rule:
+        chr_rule = args.chr_rule
+    # 9. generate AGP from N-runs for scaffolds without an AGP column
+    generate_agp = cfg.get("generate_agp")
+    if not generate_agp:
+        generate_agp = args.generate_agp
+    # 10. parsed Excel cache directory (table_cache: False disables it)
+    if cfg.get("table_cache") is False or args.no_table_cache:
+        enflora.TABLE_CACHE_DIR = None
+    elif cfg.get("table_cache") or args.table_cache:
+        enflora.TABLE_CACHE_DIR = cfg.get("table_cache") or args.table_cache
+    # 11. EMBL flatfile check before staging (lint: False disables it), and its worker threads
+    lint = cfg.get("lint", True) is not False and not args.no_lint
+    threads = cfg.get("threads")
+    if not threads:
+        threads = args.threads
+    # 12. Watch mode and its timings
+    watch = cfg.get("watch")
+    if not watch:
+        watch = args.watch
+    watch_settle = cfg.get("watch_settle")
+    if not watch_settle:
+        watch_settle = args.watch_settle
+    watch_poll = cfg.get("watch_poll")
+    if not watch_poll:
+        watch_poll = args.watch_poll
+
+    # Dry run: cost estimate only, nothing is staged or submitted
+    if args.plan:
+        if not table_path:
+            sys.exit("--plan needs a table (-c TABLE or data_analysis in config)")
+        samples = plan_inputs(table_path)
+        plan = plan_submission(samples, upload_mbps=args.plan_mbps)
+        print_plan(plan, suggest_slurm(plan, mem_gb=4 + math.ceil(3 * max(
+            (os.path.getsize(f) for _, files in samples for f, _ in files if f.lower().endswith(".gb")), default=0) / 1e9)))
+        return
+
+    # Samples locked by another job sharing submission/ or logs/: wait or skip
+    on_locked = cfg.get("on_locked")
+    if not on_locked:
+        on_locked = args.on_locked
+    if on_locked not in ("wait", "skip"):
+        sys.exit(f"on_locked must be 'wait' or 'skip', not '{on_locked}'")
+    wait = on_locked == "wait"
+
+    # Batched Webin-CLI: one JVM for all manifests
+    webin_batch = cfg.get("webin_batch")
+    if not webin_batch:
+        webin_batch = args.webin_batch
+
+    # Parallel submissions and the cap on bytes in flight (compression and upload)
+    jobs = cfg.get("jobs")
+    if not jobs:
+        jobs = args.jobs
+    max_inflight_gb = cfg.get("max_inflight_gb")
+    if not max_inflight_gb:
+        max_inflight_gb = args.max_inflight_gb
+    byte_budget = int(float(max_inflight_gb) * 1e9)
+    # Adaptive concurrency: with max_jobs the submissions at a time move between min_jobs and
+    # max_jobs (AIMD on throughput and throttling); max_mbps caps the total upload rate
+    max_jobs = cfg.get("max_jobs")
+    if not max_jobs:
+        max_jobs = args.max_jobs
+    min_jobs = cfg.get("min_jobs")
+    if not min_jobs:
+        min_jobs = args.min_jobs
+    max_mbps = cfg.get("max_mbps")
+    if not max_mbps:
+        max_mbps = args.max_mbps
+    limit = None
+    if max_jobs or max_mbps:
+        limit = AdaptiveConcurrency(lo=min_jobs if max_jobs else jobs, hi=max_jobs or jobs, start=jobs,
+                                    max_mbps=max_mbps, label="submit")
+
+    # Promote: test-accepted samples go to live as staged, no conversion and no re-hashing
+    if args.promote:
+        user, pwd = load_credentials(cred_path)
+        jar = find_jar(jar_path)
+        logs = prepare_logs_dir(args.logs_dir)
+        manifests = discover_manifests(sub_dir)
+        if not manifests:
+            sys.exit("No manifests found; run with -c your.xlsx and submit to test first.")
+        promote_manifests(manifests, jar, user, pwd, logs, "genome", batch=bool(webin_batch), wait=wait,
+                          jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+        return
+
+    # Watch: stage, and submit, only the rows that are new or changed, as their data arrive
+    if watch:
+        if not table_path:
+            sys.exit("--watch needs a table (-c TABLE or data_analysis in config)")
+        if submit:
+            user, pwd = load_credentials(cred_path)
+            jar = find_jar(jar_path)
+            logs = prepare_logs_dir(args.logs_dir)
+
+        def process(rows):
+            staged = {}
+            convert_manifests(table_path, submission_dir=sub_dir, default_level=default_level,
+                              default_mingaplength=default_mingap, default_chr_rule=chr_rule,
+                              generate_agp=bool(generate_agp), wait=wait, lint=lint, threads=int(threads),
+                              byte_budget=byte_budget, rows=set(rows), staged=staged)
+            statuses = {idx: "staged" for idx in staged}
+            if not submit:
+                return statuses
+            # Samples the test server already accepted exactly as they are staged now are not sent again
+            todo = {idx: mf for idx, mf in staged.items() if live or not promotable(mf, logs)[0]}
+            statuses.update({idx: "submitted" for idx in staged if idx not in todo})
+            if todo:
+                results = submit_manifests(list(todo.values()), jar, user, pwd, live, logs, "genome",
+                                           batch=bool(webin_batch), wait=wait, jobs=int(jobs), byte_budget=byte_budget,
+                                           limit=limit)
+                for idx, res in zip(todo, results):
+                    if res.get("locked") or webin_throttled(res):
+                        del statuses[idx]  # not the row's fault: retried on the next round
+                    else:
+                        statuses[idx] = "submitted" if res["returncode"] == 0 else "failed"
+            return statuses
+
+        file_cols_of = lambda df: [c for c in ("FLATFILE", "FASTA", "AGP", "CHR_MAP") if c in df.columns]
+        watch_sheet(table_path, sub_dir, ("SAMPLE", "ASSEMBLYNAME"), file_cols_of, _row_inputs, process,
+                    settle=float(watch_settle), poll=float(watch_poll))
+        return
 
     manifests = []
     if table_path:
@@ -439,6 +1135,12 @@ def main():
             submission_dir=sub_dir,
             default_level=default_level,
             default_mingaplength=default_mingap,
+            default_chr_rule=chr_rule,
+            generate_agp=bool(generate_agp),
+            wait=wait,
+            lint=lint,
+            threads=int(threads),
+            byte_budget=byte_budget,
         )
 
     if submit:
@@ -447,14 +1149,25 @@ def main():
         logs = prepare_logs_dir(args.logs_dir)
         if not manifests:
             # discover all manifests under submission_dir
-            manifests = sorted(
-                glob.glob(os.path.join(sub_dir, "*", "manifest.txt"))
-            )
+            manifests = discover_manifests(sub_dir)
             if not manifests:
                 sys.exit("No manifests found; run with -c your.xlsx first.")
-        submit_manifests(manifests, jar, user, pwd, live, logs)
+        submit_manifests(manifests, jar, user, pwd, live, logs, "genome", batch=bool(webin_batch), wait=wait,
+                         jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+
+    # Drop store objects left behind by deleted or re-staged samples
+    if args.gc_store:
+        gc_store(sub_dir)
+
+    # Samples, bytes and failures per status, from the catalog
+    if args.report:
+        cat = Catalog.existing(sub_dir)
+        if cat is None:
+            sys.exit(f"No catalog in {sub_dir}; stage with -c TABLE first.")
+        with cat:
+            cat.report()
 
-    if not table_path and not submit:
+    if not table_path and not submit and not args.gc_store and not args.report:
         p.print_help()
 
 if __name__ == "__main__":
@@ -0,0 +1,432 @@
+# Standard libraries
+import os
+import sys
+import argparse
+import json
+import time
+import random
+import shutil
+import platform
+import subprocess
+import importlib.util
+import multiprocessing as mp
+from queue import Empty
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Benchmark scale presets (sizes in MB of uncompressed data)
+SCALES = {
+    "small":  {"fastq_mb": 20,   "fasta_mb": 20,   "genbank_records": 50,   "sheet_rows": 10000},
+    "medium": {"fastq_mb": 500,  "fasta_mb": 200,  "genbank_records": 500,  "sheet_rows": 100000},
+    "large":  {"fastq_mb": 4096, "fasta_mb": 2048, "genbank_records": 2000, "sheet_rows": 100000},
+}
+
+BIOSAMPLE_FIELDS = [
+    "isolate", "organism", "taxon_id", "bio_material", "specimen_voucher",
+    "collected_by", "collection date", "country", "region", "locality",
+    "latitude", "longitude", "altitude", "plant structure",
+    "plant developmental stage", "plant growth medium", "isolation and growth condition"
+]
+RUNS_FIELDS = [
+    "STUDY", "SAMPLE", "NAME", "INSTRUMENT", "INSERT_SIZE", "LIBRARY_NAME",
+    "LIBRARY_SOURCE", "LIBRARY_SELECTION", "LIBRARY_STRATEGY", "DESCRIPTION", "FASTQ1", "FASTQ2"
+]
+
+
+def load_script(name: str):
+    """
+    Import biosamples/biosamples.py, runs/runs.py or analysis/analysis.py as a module.
+    """
+    path = os.path.join(ROOT, name, f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data generators (deterministic for a given seed)
+# ---------------------------------------------------------------------------
+
+def _dna(rng, n: int) -> str:
+    return "".join(rng.choices("ACGT", k=n))
+
+def gen_fastq_pair(out_dir: str, size_mb: int, seed: int = 1, read_len: int = 150) -> tuple:
+    """
+    Write R1/R2 FASTQ files of roughly `size_mb` MB each. A pool of reads is
+    generated once and cycled with unique names, so large sizes stay fast to produce.
+    """
+    rng = random.Random(seed)
+    pool = [(_dna(rng, read_len), "".join(rng.choices("FFFF:,", k=read_len))) for _ in range(2000)]
+    target = size_mb * 1024 * 1024
+    paths = []
+    for mate in (1, 2):
+        path = os.path.join(out_dir, f"bench_R{mate}.fastq")
+        written, i = 0, 0
+        with open(path, "w") as fh:
+            while written < target:
+                seq, qual = pool[(i * 7 + mate) % len(pool)]
+                rec = f"@bench:{i} {mate}:N:0:1\n{seq}\n+\n{qual}\n"
+                fh.write(rec)
+                written += len(rec)
+                i += 1
+        paths.append(path)
+    return tuple(paths)
+
+def gen_fasta(out_dir: str, size_mb: int, seed: int = 2, n_seqs: int = 20, gap: int = 100,
+              gaps_per_seq: int = 10, width: int = 60) -> str:
+    """
+    Multi-sequence FASTA of roughly `size_mb` MB with `gaps_per_seq` planted N-runs
+    of `gap` bases per sequence.
+    """
+    rng = random.Random(seed)
+    seq_len = max(size_mb * 1024 * 1024 // n_seqs, gap * (gaps_per_seq + 1) * 2)
+    chunk = _dna(rng, 1 << 16)
+    path = os.path.join(out_dir, "bench_assembly.fasta")
+    with open(path, "w") as fh:
+        for s in range(n_seqs):
+            fh.write(f">scaffold_{s + 1}\n")
+            col = 0
+
+            def put(piece):
+                # stream `piece` out wrapped at `width` columns
+                nonlocal col
+                while piece:
+                    take = width - col
+                    fh.write(piece[:take])
+                    col += len(piece[:take])
+                    piece = piece[take:]
+                    if col == width:
+                        fh.write("\n")
+                        col = 0
+
+            bounds = [seq_len * (k + 1) // (gaps_per_seq + 1) for k in range(gaps_per_seq)] + [seq_len]
+            pos = 0
+            for k, end in enumerate(bounds):
+                while pos < end - (gap if k < gaps_per_seq else 0):
+                    n = min(4096, end - (gap if k < gaps_per_seq else 0) - pos)
+                    off = rng.randrange(len(chunk) - n)
+                    put(chunk[off:off + n])
+                    pos += n
+                if k < gaps_per_seq:
+                    put("N" * gap)
+                    pos += gap
+            if col:
+                fh.write("\n")
+    return path
+
+def gen_genbank(out_dir: str, n_records: int, seed: int = 3, seq_len: int = 20000) -> str:
+    """
+    GenBank flatfile with `n_records` plain records (source + one gene feature each).
+    """
+    rng = random.Random(seed)
+    path = os.path.join(out_dir, "bench_annotation.gb")
+    with open(path, "w") as fh:
+        for r in range(n_records):
+            name = f"BENCH{r + 1:05d}"
+            seq = _dna(rng, seq_len).lower()
+            fh.write(f"LOCUS       {name:<16}{seq_len:>12} bp    DNA     linear   PLN 01-JAN-2024\n")
+            fh.write(f"DEFINITION  Synthetic benchmark record {r + 1}.\n")
+            fh.write(f"ACCESSION   {name}\nVERSION     {name}.1\n")
+            fh.write("SOURCE      Bellis perennis\n  ORGANISM  Bellis perennis\n")
+            fh.write("FEATURES             Location/Qualifiers\n")
+            fh.write(f"     source          1..{seq_len}\n")
+            fh.write('                     /organism="Bellis perennis"\n')
+            fh.write('                     /mol_type="genomic DNA"\n')
+            fh.write(f"     gene            101..{seq_len - 100}\n")
+            fh.write(f'                     /gene="bench{r + 1}"\n')
+            fh.write("ORIGIN\n")
+            for i in range(0, seq_len, 60):
+                blocks = " ".join(seq[j:j + 10] for j in range(i, min(i + 60, seq_len), 10))
+                fh.write(f"{i + 1:>9} {blocks}\n")
+            fh.write("//\n")
+    return path
+
+def gen_biosample_sheet(out_dir: str, n_rows: int, seed: int = 4, xlsx: bool = False) -> str:
+    """
+    BiosampleList sheet with `n_rows` valid ERC000037 rows (TSV, or .xlsx with openpyxl).
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        rows.append([
+            f"BENCH{i + 1:06d}", "Bellis perennis", "3062056", f"herb:B{i + 1}", f"V{i + 1}",
+            "Bench Collector", f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1990, 2024)}",
+            "Germany", "Berlin", "Dahlem", f"{rng.uniform(47, 55):.4f}", f"{rng.uniform(6, 15):.4f}",
+            str(rng.randint(0, 1500)), "leaf", "adult", "" if i % 3 else "soil", "wild",
+        ])
+    if xlsx:
+        import openpyxl
+        path = os.path.join(out_dir, "bench_BiosampleList.xlsx")
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("DATA")
+        ws.append(BIOSAMPLE_FIELDS)
+        for r in rows:
+            ws.append(r)
+        wb.save(path)
+        return path
+    path = os.path.join(out_dir, "bench_BiosampleList.tsv")
+    with open(path, "w") as fh:
+        fh.write("\t".join(BIOSAMPLE_FIELDS) + "\n")
+        for r in rows:
+            fh.write("\t".join(r) + "\n")
+    return path
+
+def gen_runs_sheet(out_dir: str, r1: str, r2: str, n_rows: int = 1) -> str:
+    """
+    ExperimentList TSV with `n_rows` rows pointing at the same FASTQ pair.
+    """
+    path = os.path.join(out_dir, "bench_ExperimentList.tsv")
+    with open(path, "w") as fh:
+        fh.write("\t".join(RUNS_FIELDS) + "\n")
+        for i in range(n_rows):
+            fh.write("\t".join([
+                "PRJEB00000", f"BENCHS{i + 1}", f"bench_exp_{i + 1}", "Illumina NovaSeq 6000", "350",
+                f"lib{i + 1}", "GENOMIC", "RANDOM", "WGS", "benchmark", r1, r2,
+            ]) + "\n")
+    return path
+
+def generate(data_dir: str, scale: dict, seed: int = 0) -> dict:
+    """
+    Generate (or reuse) every input for the given scale; returns name -> path.
+    A manifest.json in data_dir remembers the scale so inputs are only rebuilt when it changes.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    stamp_path = os.path.join(data_dir, "manifest.json")
+    stamp = {"scale": scale, "seed": seed}
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as fh:
+            saved = json.load(fh)
+        if saved.get("stamp") == stamp and all(os.path.exists(p) for p in saved["files"].values()):
+            return saved["files"]
+
+    print(f"Generating synthetic inputs in {data_dir} …")
+    files = {}
+    files["fastq_r1"], files["fastq_r2"] = gen_fastq_pair(data_dir, scale["fastq_mb"], seed + 1)
+    files["fasta"] = gen_fasta(data_dir, scale["fasta_mb"], seed + 2)
+    files["genbank"] = gen_genbank(data_dir, scale["genbank_records"], seed + 3)
+    files["biosample_tsv"] = gen_biosample_sheet(data_dir, scale["sheet_rows"], seed + 4)
+    try:
+        files["biosample_xlsx"] = gen_biosample_sheet(data_dir, scale["sheet_rows"], seed + 4, xlsx=True)
+    except ImportError:
+        print("  openpyxl not installed; skipping the .xlsx sheet")
+    files["runs_tsv"] = gen_runs_sheet(data_dir, files["fastq_r1"], files["fastq_r2"])
+    with open(stamp_path, "w") as fh:
+        json.dump({"stamp": stamp, "files": files}, fh, indent=2)
+    return files
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks: each returns the number of input bytes it processed
+# ---------------------------------------------------------------------------
+
+def bench_runs_convert(files, work):
+    runs = load_script("runs")
+    runs.convert_manifests(files["runs_tsv"], os.path.join(work, "submission"))
+    return os.path.getsize(files["fastq_r1"]) + os.path.getsize(files["fastq_r2"])
+
+def bench_has_n_gaps(files, work):
+    analysis = load_script("analysis")
+    analysis.has_n_gaps(files["fasta"], 50)
+    return os.path.getsize(files["fasta"])
+
+def bench_stage_file(files, work):
+    analysis = load_script("analysis")
+    analysis.stage_file(files["fasta"], work, mode="cmp")
+    return os.path.getsize(files["fasta"])
+
+def bench_seq_index(files, work):
+    analysis = load_script("analysis")
+    analysis.build_seq_index(files["fasta"])
+    return os.path.getsize(files["fasta"])
+
+def bench_generate_agp(files, work):
+    analysis = load_script("analysis")
+    analysis.write_agp_from_gaps(files["fasta"], work, 50)
+    return os.path.getsize(files["fasta"])
+
+def bench_genbank_to_embl(files, work):
+    from Bio import SeqIO
+    out = os.path.join(work, "bench.embl")
+    SeqIO.write(SeqIO.parse(files["genbank"], "genbank"), out, "embl")
+    return os.path.getsize(files["genbank"])
+
+def bench_excel_to_xml_tsv(files, work):
+    biosamples = load_script("biosamples")
+    biosamples.excel_to_xml(files["biosample_tsv"], os.path.join(work, "biosamples.xml"))
+    return os.path.getsize(files["biosample_tsv"])
+
+def bench_excel_to_xml_xlsx(files, work):
+    biosamples = load_script("biosamples")
+    import enflora  # on sys.path once a script is loaded
+    enflora.TABLE_CACHE_DIR = None  # measure the parse, not the cache
+    biosamples.excel_to_xml(files["biosample_xlsx"], os.path.join(work, "biosamples.xml"))
+    return os.path.getsize(files["biosample_xlsx"])
+
+BENCHMARKS = {
+    "runs.convert_manifests": (bench_runs_convert, ("fastq_r1", "fastq_r2", "runs_tsv")),
+    "analysis.has_n_gaps": (bench_has_n_gaps, ("fasta",)),
+    "analysis.stage_file": (bench_stage_file, ("fasta",)),
+    "analysis.build_seq_index": (bench_seq_index, ("fasta",)),
+    "analysis.write_agp_from_gaps": (bench_generate_agp, ("fasta",)),
+    "analysis.genbank_to_embl": (bench_genbank_to_embl, ("genbank",)),
+    "biosamples.excel_to_xml[tsv]": (bench_excel_to_xml_tsv, ("biosample_tsv",)),
+    "biosamples.excel_to_xml[xlsx]": (bench_excel_to_xml_xlsx, ("biosample_xlsx",)),
+}
+
+
+def _child(fn, files, work, queue):
+    import resource
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            t0 = time.perf_counter()
+            nbytes = fn(files, work)
+            secs = time.perf_counter() - t0
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        queue.put({"seconds": secs, "bytes": nbytes, "peak_rss_mb": round(rss_mb, 1)})
+    except ImportError as exc:
+        queue.put({"skipped": str(exc)})
+    except BaseException as exc:  # includes the scripts' sys.exit()
+        queue.put({"error": f"{type(exc).__name__}: {exc}"})
+
+CHILD_POLL = 1.0  # seconds between checks that a benchmark process is still alive
+
+def run_one(name, files, work_root, repeat):
+    """
+    Run one benchmark `repeat` times, each in a fresh process (clean peak RSS); keep the fastest.
+    """
+    fn, needs = BENCHMARKS[name]
+    if any(k not in files for k in needs):
+        return {"skipped": "input not generated"}
+    best = None
+    for _ in range(repeat):
+        work = os.path.join(work_root, name.replace("[", "_").replace("]", ""))
+        shutil.rmtree(work, ignore_errors=True)
+        os.makedirs(work)
+        queue = mp.Queue()
+        proc = mp.Process(target=_child, args=(fn, files, work, queue))
+        proc.start()
+        res = None
+        while res is None:
+            try:
+                res = queue.get(timeout=CHILD_POLL)
+            except Empty:
+                if proc.is_alive():
+                    continue
+                try:  # the result may have been flushed just as it exited
+                    res = queue.get(timeout=CHILD_POLL)
+                except Empty:  # killed (e.g. by the OOM killer) before reporting
+                    res = {"error": f"benchmark process died with exit code {proc.exitcode}"}
+        proc.join()
+        shutil.rmtree(work, ignore_errors=True)
+        if "seconds" not in res:
+            return res
+        if best is None or res["seconds"] < best["seconds"]:
+            best = res
+    best["mb_s"] = round(best["bytes"] / 1e6 / best["seconds"], 2) if best["seconds"] > 0 else None
+    best["seconds"] = round(best["seconds"], 4)
+    return best
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def compare(base_path: str, new_path: str, tolerance: float) -> int:
+    """
+    Print per-benchmark time/memory ratios of new vs base; returns the number of
+    benchmarks that got slower by more than `tolerance` (fraction).
+    """
+    with open(base_path) as fh:
+        base = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+    print(f"base: {base['meta']['revision']}  new: {new['meta']['revision']}")
+    print(f"{'benchmark':<34}{'base s':>10}{'new s':>10}{'time':>9}{'base MB':>10}{'new MB':>10}")
+    regressions = 0
+    for name, b in base["results"].items():
+        n = new["results"].get(name)
+        if not n or "seconds" not in b or "seconds" not in n:
+            print(f"{name:<34}{'(not comparable)':>30}")
+            continue
+        ratio = n["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{name:<34}{b['seconds']:>10.3f}{n['seconds']:>10.3f}{ratio:>8.2f}x"
+              f"{b['peak_rss_mb']:>10.1f}{n['peak_rss_mb']:>10.1f}{flag}")
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="bench.py → synthetic inputs + throughput/memory benchmarks of the submission hot paths")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    g = sub.add_parser("generate", help="Only generate the synthetic inputs")
+    r = sub.add_parser("run", help="Generate inputs if needed, run benchmarks, write a JSON baseline")
+    for sp in (g, r):
+        sp.add_argument("--scale", choices=sorted(SCALES), default="small",
+                        help="Size preset (default=small)")
+        sp.add_argument("--data_dir", default="bench_data",
+                        help="Where synthetic inputs are kept between runs (default=bench_data/)")
+        sp.add_argument("--seed", type=int, default=0, help="Random seed for the generators")
+        for key in SCALES["small"]:
+            sp.add_argument(f"--{key}", type=int, help=f"Override the preset's {key}")
+    r.add_argument("-o", "--output", help="Baseline JSON to write (default=bench_<revision>.json)")
+    r.add_argument("-k", "--only", action="append", metavar="NAME",
+                   help="Run only benchmarks whose name contains NAME (repeatable)")
+    r.add_argument("--repeat", type=int, default=1, help="Runs per benchmark, fastest kept (default=1)")
+
+    c = sub.add_parser("compare", help="Compare two baseline JSON files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--tolerance", type=float, default=0.10,
+                   help="Relative slowdown reported as a regression (default=0.10)")
+
+    args = p.parse_args()
+
+    if args.cmd == "compare":
+        sys.exit(1 if compare(args.base, args.new, args.tolerance) else 0)
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    files = generate(os.path.abspath(args.data_dir), scale, args.seed)
+    if args.cmd == "generate":
+        return
+
+    names = [n for n in BENCHMARKS if not args.only or any(k in n for k in args.only)]
+    work_root = os.path.join(os.path.abspath(args.data_dir), "work")
+    results = {}
+    for name in names:
+        print(f"→ {name} …", end=" ", flush=True)
+        res = run_one(name, files, work_root, max(1, args.repeat))
+        results[name] = res
+        if "seconds" in res:
+            print(f"{res['seconds']:.3f}s  {res['mb_s']} MB/s  peak {res['peak_rss_mb']} MB")
+        else:
+            print(res.get("skipped") or res.get("error"))
+
+    revision = _git_rev()
+    out = args.output or f"bench_{revision}.json"
+    meta = {
+        "revision": revision, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(), "scale": scale, "seed": args.seed,
+    }
+    with open(out, "w") as fh:
+        json.dump({"meta": meta, "results": results}, fh, indent=2)
+    print(f"Baseline written → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-# Downloadable libraries
-import pandas as pd
-import yaml
+# Downloadable libraries (pandas, yaml) are imported lazily where needed,
+# so --help and submit-only runs start fast.
 
 # Standard libraries
 import xml.etree.ElementTree as ET
-import xml.dom.minidom as minidom
 import argparse  # Manage arguments
 import sys
 import os        # Paths, folders, etc
@@ -13,89 +11,245 @@ import subprocess  # For curl
 import re       # For date pattern matching
 import tempfile
 import shlex
+import json
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional
+
+# Code shared with the other scripts lives in ../enflora.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+import enflora
+from enflora import (
+    AdaptiveConcurrency, init_metrics, _isnull, load_config, load_table, stage, start_profile, TsvTable,
+)
 
-def load_config(cfg_path: str = "../config.yaml") -> dict:
-    """
-    Return a dict with the YAML content or an empty dict if the file is absent.
-    """
-    if os.path.exists(cfg_path):
-        with open(cfg_path, "r") as fh:
-            return yaml.safe_load(fh) or {}
-    return {}
 
 # Default ENA endpoints
 TEST_ENDPOINT = "https://wwwdev.ebi.ac.uk/ena/submit/drop-box/submit/"
 LIVE_ENDPOINT = "https://www.ebi.ac.uk/ena/submit/drop-box/submit/"
 
-def load_table(path: str, case: str = "lower"):
-    ext = os.path.splitext(path)[1].lower()
-    if ext in {".xlsx", ".xls"}:
-        df = pd.read_excel(path, sheet_name=0)
-    elif ext in {".tsv", ".tab", ".txt"}:
-        df = pd.read_csv(path, sep="\t")
+
+# --- Sample checklists ---
+# Definitions live in checklists/ as JSON (our own format, see checklists/ERC000037.json)
+# or as ENA checklist XML (https://www.ebi.ac.uk/ena/browser/api/xml/<ERC…>).
+CHECKLIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checklists")
+DEFAULT_CHECKLIST = "ERC000037"
+# Columns that fill the <SAMPLE> element itself, unless a checklist says otherwise
+SAMPLE_COLUMNS = {"alias": "isolate", "title": "organism", "taxon_id": "taxon_id"}
+# Checklist fields whose cells are converted to ISO dates before validation
+DATE_FIELDS = {"collection date"}
+# Violations printed to the console; all of them go to <output>_errors.txt
+MAX_PRINTED_ERRORS = 50
+
+def to_iso_date(raw) -> str:
+    """
+    Excel dates, 'YYYY' and German 'DD.MM.YYYY' → ISO; anything else passes through.
+    """
+    if isinstance(raw, datetime.datetime):
+        return raw.strftime("%Y-%m-%d")
+    text = str(raw).strip()
+    if re.fullmatch(r"\d{4}", text):
+        return text
+    try:
+        return datetime.datetime.strptime(text, "%d.%m.%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return text
+
+def _cell_text(val) -> str:
+    return "" if _isnull(val) else str(val).strip()
+
+def _table_columns(df) -> dict:
+    """
+    {column: [cell, …]} for a TsvTable or a pandas DataFrame.
+    """
+    if isinstance(df, TsvTable):
+        cols = list(zip(*df.rows)) if df.rows else [()] * len(df.columns)
+        return {c: list(v) for c, v in zip(df.columns, cols)}
+    return {c: df[c].tolist() for c in df.columns}
+
+class ChecklistField:
+    """
+    One checklist attribute: the column(s) feeding it and its compiled checks.
+    """
+    def __init__(self, name, column=None, columns=None, mandatory="optional", units=None,
+                 regex=None, values=None, default=None, join=", "):
+        self.name = name
+        self.columns = [c.lower() for c in (columns or [column or name])]
+        self.mandatory = mandatory
+        self.units = units
+        self.regex = re.compile(regex) if regex else None
+        self.values = {v.lower(): v for v in values} if values else None
+        self.default = default
+        self.join = join
+
+    def column_values(self, cols: dict, n: int) -> list:
+        """
+        The attribute value for every row, built from whole columns at once.
+        """
+        convert = to_iso_date if self.name in DATE_FIELDS else _cell_text
+        parts = [[convert(v) if not _isnull(v) else "" for v in cols[c]] if c in cols else [""] * n
+                 for c in self.columns]
+        vals = parts[0] if len(parts) == 1 else [self.join.join(p for p in ps if p) for ps in zip(*parts)]
+        if self.default:
+            vals = [v or self.default for v in vals]
+        if self.values:
+            vals = [self.values.get(v.lower(), v) for v in vals]  # canonical spelling
+        return vals
+
+    def violations(self, vals: list) -> list:
+        """
+        [(row index, message), …] for empty mandatory cells and values failing the regex/vocabulary.
+        """
+        label = self.columns[0] if len(self.columns) == 1 else self.name
+        bad = []
+        if self.mandatory == "mandatory":
+            bad += [(i, f"Mandatory field '{label}' is empty") for i, v in enumerate(vals) if not v]
+        if self.regex:
+            match = self.regex.fullmatch
+            bad += [(i, f"'{label}' value '{v}' does not match {self.regex.pattern}")
+                    for i, v in enumerate(vals) if v and not match(v)]
+        if self.values:
+            allowed = self.values
+            bad += [(i, f"'{label}' value '{v}' is not one of: {', '.join(sorted(allowed.values()))}")
+                    for i, v in enumerate(vals) if v and v.lower() not in allowed]
+        return bad
+
+class Checklist:
+    """
+    A compiled sample checklist: <SAMPLE> columns plus attribute fields, in emission order.
+    """
+    def __init__(self, accession, fields, sample=None, name=""):
+        self.accession = accession
+        self.name = name
+        self.sample = {**SAMPLE_COLUMNS, **{k: v.lower() for k, v in (sample or {}).items()}}
+        self.fields = [ChecklistField(**f) for f in fields]
+
+    def required_columns(self) -> list:
+        cols = list(self.sample.values())
+        cols += [c for f in self.fields if f.mandatory == "mandatory" and not f.default for c in f.columns]
+        return list(dict.fromkeys(cols))
+
+    def used_columns(self) -> set:
+        return set(self.sample.values()) | {c for f in self.fields for c in f.columns}
+
+    def check(self, df):
+        """
+        Validate the whole table column by column.
+        Returns ({SAMPLE key: values}, {field name: values}, [(row index, message), …]).
+        """
+        cols = _table_columns(df)
+        n = len(df)
+        missing = [c for c in self.required_columns() if c not in cols]
+        if missing:
+            sys.exit(f"Missing columns for checklist {self.accession}: {', '.join(missing)}")
+        errors = []
+        core = {}
+        for key, col in self.sample.items():
+            core[key] = [_cell_text(v) for v in cols[col]]
+            errors += [(i, f"Mandatory field '{col}' is empty") for i, v in enumerate(core[key]) if not v]
+        attrs = {}
+        for f in self.fields:
+            attrs[f.name] = f.column_values(cols, n)
+            errors += f.violations(attrs[f.name])
+        errors.sort(key=lambda e: e[0])
+        return core, attrs, errors
+
+def _read_checklist_xml(path: str) -> dict:
+    """
+    Field definitions from an ENA checklist XML (CHECKLIST_SET/CHECKLIST/…/FIELD).
+    """
+    root = ET.parse(path).getroot()
+    cl = root if root.tag == "CHECKLIST" else root.find(".//CHECKLIST")
+    if cl is None:
+        sys.exit(f"{path}: no <CHECKLIST> element")
+    fields = []
+    for fe in cl.iter("FIELD"):
+        values = [v.text.strip() for v in fe.iterfind(".//TEXT_CHOICE_FIELD/TEXT_VALUE/VALUE") if v.text]
+        fields.append({
+            "name": fe.findtext("NAME", "").strip(),
+            "mandatory": fe.findtext("MANDATORY", "optional").strip(),
+            "units": fe.findtext("UNITS/UNIT"),
+            "regex": fe.findtext(".//TEXT_FIELD/REGEX_VALUE"),
+            "values": values or None,
+        })
+    # Fields already written into <SAMPLE> are not repeated as attributes
+    fields = [f for f in fields if f["name"] and f["name"] not in ("organism", "taxon_id")]
+    return {"accession": cl.get("accession") or cl.findtext("IDENTIFIERS/PRIMARY_ID"),
+            "name": cl.findtext("DESCRIPTOR/NAME", ""), "fields": fields}
+
+@functools.lru_cache(maxsize=None)
+def _compile_checklist(path: str, mtime_ns: int) -> Checklist:
+    if path.lower().endswith(".xml"):
+        spec = _read_checklist_xml(path)
     else:
-        sys.exit(f"Unsupported table extension '{ext}'. Use .xlsx/.xls or .tsv/.tab/.txt")
-    df.columns = df.columns.str.strip()
-    if case == "upper":
-        df.columns = df.columns.str.upper()
-    elif case == "lower":
-        df.columns = df.columns.str.lower()
-    return df
-
-
-def excel_to_xml(table_file, output_xml="biosamples.xml"):
-    # Expected fields (in the expected order)
-    expected_fields = [
-        "isolate", "organism", "taxon_id", "bio_material", "specimen_voucher",
-        "collected_by", "collection date", "country", "region", "locality",
-        "latitude", "longitude", "altitude", "plant structure",
-        "plant developmental stage", "plant growth medium", "isolation and growth condition"
-    ]
-    
-    # Define mandatory attributes mapping
-    mandatory = [
-        "taxon_id",
-        "isolate",
-        "organism",
-        "collection date",
-        "latitude",           # becomes geographic location (latitude)
-        "longitude",          # becomes geographic location (longitude)
-        "plant structure",
-        "country",            # becomes geographic location (country and/or sea)
-        "plant developmental stage",
-        "plant growth medium",
-        "isolation and growth condition",
-        "bio_material",
-        "altitude"
-    ]
-    
-    # Define recommended attributes (will skip if empty)
-    recommended = [
-        "region",             # part of geographic location (region and locality)
-        "locality",           # part of geographic location (region and locality)
-        "collected_by",
-        "specimen_voucher"
-    ]
-    
-    # Read the first sheet of the excel file
-    # try:
-    #     df = pd.read_excel(table_file, sheet_name=0)
-    # except Exception as e:
-    #     sys.exit(f"Error reading Excel file: {e}")
-    
+        with open(path) as fh:
+            spec = json.load(fh)
+    try:
+        return Checklist(**spec)
+    except (TypeError, re.error) as exc:
+        sys.exit(f"Invalid checklist {path}: {exc}")
+
+def load_checklist(spec: Optional[str] = None) -> Checklist:
+    """
+    Checklist from a file path, or an accession looked up as checklists/<ACC>.json|.xml.
+    Compiled once per file version and cached for the rest of the process.
+    """
+    spec = spec or DEFAULT_CHECKLIST
+    path = spec if os.path.isfile(spec) else None
+    for ext in (".json", ".xml"):
+        if not path and os.path.isfile(os.path.join(CHECKLIST_DIR, spec + ext)):
+            path = os.path.join(CHECKLIST_DIR, spec + ext)
+    if not path:
+        known = sorted(os.path.splitext(f)[0] for f in os.listdir(CHECKLIST_DIR)) if os.path.isdir(CHECKLIST_DIR) else []
+        sys.exit(f"Checklist '{spec}' not found (file path, or one of: {', '.join(known) or 'none'})")
+    path = os.path.abspath(path)
+    return _compile_checklist(path, os.stat(path).st_mtime_ns)
+
+def report_violations(errors: list, df_len: int, checklist: Checklist, report_path: str):
+    """
+    Write every violation to `report_path`, print the first few, and stop.
+    """
+    lines = [f"Sample number {i + 1}: {msg}" for i, msg in errors]
+    with open(report_path, "w", encoding="utf-8") as fh:
+        fh.write("\n".join(lines) + "\n")
+    for line in lines[:MAX_PRINTED_ERRORS]:
+        print(f"Error: {line}")
+    if len(lines) > MAX_PRINTED_ERRORS:
+        print(f"… and {len(lines) - MAX_PRINTED_ERRORS} more")
+    rows = len({i for i, _ in errors})
+    sys.exit(f"{len(errors)} checklist {checklist.accession} violation(s) in {rows} of {df_len} samples; "
+             f"full list in {report_path}")
+
+
+def excel_to_xml(table_file, output_xml="biosamples.xml", checklist=None, skip_aliases=None):
+    """
+    Validate the table against `checklist` (path/accession/Checklist, default ERC000037)
+    and write one <SAMPLE> per row with the checklist's attributes. Rows whose alias is
+    in `skip_aliases` (already accessioned, e.g. on a pipeline resume) are left out.
+    """
+    if not isinstance(checklist, Checklist):
+        checklist = load_checklist(checklist)
+
     try:
         df = load_table(table_file, case="lower")
     except Exception as e:
         sys.exit(f"Error reading table: {e}")
-    
-    # Verify that all expected columns are present
-    missing_cols = [col for col in expected_fields if col not in df.columns]
-    if missing_cols:
-        sys.exit(f"Missing expected columns in Excel file: {', '.join(missing_cols)}")
-    
-    # Any extra columns beyond expected_fields?
-    extra_fields = [col for col in df.columns if col not in expected_fields]
-    
+
+    # Whole-column validation; every violation is collected before stopping
+    with stage("checklist", rows=len(df), checklist=checklist.accession) as rec:
+        core, attrs, errors = checklist.check(df)
+        rec["violations"] = len(errors)
+    if errors:
+        report_violations(errors, len(df), checklist, os.path.splitext(output_xml)[0] + "_errors.txt")
+
+    # Any extra columns from the table become attributes too
+    cols = _table_columns(df)
+    used = checklist.used_columns()
+    extra = {c: [_cell_text(v) for v in vals] for c, vals in cols.items() if c not in used}
+
     # Create the root XML element
     root = ET.Element("SAMPLE_SET")
     
@@ -108,86 +262,36 @@ def excel_to_xml(table_file, output_xml="biosamples.xml"):
             ET.SubElement(attr_elem, "UNITS").text = units
     
     # Process each row/sample
-    for index, row in df.iterrows():
-        row_number = index + 1
-
-        # Default plant growth medium if blank
-        pgm = row["plant growth medium"]
-        if pd.isnull(pgm) or str(pgm).strip() == "":
-            row["plant growth medium"] = "soil"
-
-        # Check mandatory fields are not empty
-        for field in mandatory:
-            cell_value = row[field]
-            if pd.isnull(cell_value) or str(cell_value).strip() == "":
-                sys.exit(f"Error: Mandatory field '{field}' is empty for sample number {row_number}")
-
-        # Convert the date to ISO format (allow only year, or DD.MM.YYYY)
-        raw_date = row["collection date"]
-        date_str = None
-        # If it's a datetime object
-        if isinstance(raw_date, datetime.datetime):
-            date_str = raw_date.strftime("%Y-%m-%d")
-        else:
-            raw_text = str(raw_date).strip()
-            # Year-only
-            if re.fullmatch(r"\d{4}", raw_text):
-                date_str = raw_text
-            else:
-                # Try German DD.MM.YYYY
-                try:
-                    date_obj = datetime.datetime.strptime(raw_text, "%d.%m.%Y")
-                    date_str = date_obj.strftime("%Y-%m-%d")
-                except Exception:
-                    # Fallback: pass through original text
-                    date_str = raw_text
-
+    for i in range(len(df)):
+        if skip_aliases and core["alias"][i] in skip_aliases:
+            continue
         # Build the <SAMPLE> element
         sample = ET.SubElement(root, "SAMPLE", attrib={
-            "alias": str(row["isolate"]),
+            "alias": core["alias"][i],
             "center_name": ""
         })
-        ET.SubElement(sample, "TITLE").text = str(row["organism"])
+        ET.SubElement(sample, "TITLE").text = core["title"][i]
         sample_name = ET.SubElement(sample, "SAMPLE_NAME")
-        ET.SubElement(sample_name, "TAXON_ID").text = str(row["taxon_id"])
+        ET.SubElement(sample_name, "TAXON_ID").text = core["taxon_id"][i]
         
         sample_attributes = ET.SubElement(sample, "SAMPLE_ATTRIBUTES")
         
-        # Always-added attributes
-        add_attribute(sample_attributes, "bio_material", row["bio_material"])
-        add_attribute(sample_attributes, "collection date", date_str)
-        add_attribute(sample_attributes, "geographic location (country and/or sea)", row["country"])
-        add_attribute(sample_attributes, "geographic location (latitude)", row["latitude"], "DD")
-        add_attribute(sample_attributes, "geographic location (longitude)", row["longitude"], "DD")
-        add_attribute(sample_attributes, "altitude", row["altitude"], "m")
-        add_attribute(sample_attributes, "plant structure", row["plant structure"])
-        add_attribute(sample_attributes, "plant developmental stage", row["plant developmental stage"])
-        add_attribute(sample_attributes, "plant growth medium", row["plant growth medium"])
-        add_attribute(sample_attributes, "isolation and growth condition", row["isolation and growth condition"])
-        
-        # Recommended (only if non-empty)
-        loc = str(row["locality"]).strip() if not pd.isnull(row["locality"]) else ""
-        reg = str(row["region"]).strip() if not pd.isnull(row["region"]) else ""
-        combined = f"{loc}, {reg}" if loc and reg else loc or reg
-        if combined:
-            add_attribute(sample_attributes, "geographic location (region and locality)", combined)
-        if pd.notnull(row["collected_by"]) and str(row["collected_by"]).strip():
-            add_attribute(sample_attributes, "collected_by", row["collected_by"])
-        if pd.notnull(row["specimen_voucher"]) and str(row["specimen_voucher"]).strip():
-            add_attribute(sample_attributes, "specimen_voucher", row["specimen_voucher"])
+        # Checklist attributes in checklist order (mandatory ones are never empty here)
+        for field in checklist.fields:
+            val = attrs[field.name][i]
+            if val:
+                add_attribute(sample_attributes, field.name, val, field.units)
         
-        # Any extra columns from the Excel become recommended too
-        for field in extra_fields:
-            val = row[field]
-            if pd.notnull(val) and str(val).strip():
-                add_attribute(sample_attributes, field, val)
+        for field, vals in extra.items():
+            if vals[i]:
+                add_attribute(sample_attributes, field, vals[i])
 
         # Always include ENA-CHECKLIST
-        add_attribute(sample_attributes, "ENA-CHECKLIST", "ERC000037")
+        add_attribute(sample_attributes, "ENA-CHECKLIST", checklist.accession)
 
     # Pretty-print and write out
-    rough = ET.tostring(root, encoding="utf-8")
-    pretty = minidom.parseString(rough).toprettyxml(indent="  ")
+    ET.indent(root, space="  ")  # same layout as minidom's toprettyxml, without a second DOM
+    pretty = '<?xml version="1.0" ?>\n' + ET.tostring(root, encoding="unicode") + "\n"
     try:
         with open(output_xml, "w", encoding="utf-8") as f:
             f.write(pretty)
@@ -227,38 +331,150 @@ def prepare_logs_dir(logs_dir="logs"):
     return logs_dir
 
 
-# Uses the test submission as default, just in case
-def submit_data(username, password, logs_dir="logs", url=TEST_ENDPOINT):
+# curl exit codes (cannot connect, time-out, connection dropped) and HTTP statuses that mean the
+# network or ENA is overloaded; a chunk failing this way counts as throttled and is sent again
+CURL_THROTTLED = {6, 7, 28, 35, 52, 55, 56}
+HTTP_THROTTLED = {429, 500, 502, 503, 504}
+CHUNK_ATTEMPTS = 3
+
+def _curl_command(netrc_path, sample_xml, receipt_file, url, submission_file="submission.xml"):
+    return [
+        "curl",
+        "--netrc-file", netrc_path,              # <— no -u flag
+        "-F", f"SUBMISSION=@{submission_file}",
+        "-F", f"SAMPLE=@{sample_xml}",
+        url,
+        "-o", receipt_file
+    ]
+
+def read_receipt(receipt_file):
+    """
+    (success, [(accession, alias), …]) from a drop-box receipt; accession is None for rejected samples.
+    """
+    root = ET.parse(receipt_file).getroot()
+    records = [(samp.attrib.get("accession"), samp.attrib.get("alias")) for samp in root.findall("SAMPLE")]
+    return root.attrib.get("success", "false"), records
+
+def write_accessions(records, url):
+    out_file = os.path.join(os.path.dirname(__file__), 'biosample_accessions.txt')
+    write_mode = "a+" if os.path.exists(out_file) else "w+"
+    with open(out_file, write_mode) as out:
+        out.seek(0)
+        existing = {l.strip() for l in out if l.strip()}
+        if not existing:
+            out.write("accession\talias\n")
+        for acc, alias in records:
+            line = f"{acc}\t{alias}"
+            if line not in existing:
+                if url != LIVE_ENDPOINT:
+                    line += " (test)"
+                out.write(line + "\n")
+    print(f"Accessions written to {out_file}")
+
+def submit_chunks(netrc_path, logs_dir, timestamp, url, chunk_size, limit=None):
+    """
+    POST biosamples.xml in chunks of `chunk_size` samples, limit.limit chunks at a time
+    (AdaptiveConcurrency). Throttled chunks count against the limit and are sent again,
+    up to CHUNK_ATTEMPTS times. Returns the records of all receipts.
+    """
+    limit = limit or AdaptiveConcurrency(label="biosamples")
+    root = ET.parse("biosamples.xml").getroot()
+    samples = list(root)
+    chunks = [samples[i:i + chunk_size] for i in range(0, len(samples), chunk_size)]
+    print(f"→ Submitting {len(samples)} samples in {len(chunks)} chunk(s) of up to {chunk_size}, "
+          f"{limit.limit} at a time (between {limit.lo} and {limit.hi})")
+    records, attempts, running = [], {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for i, chunk in enumerate(chunks, 1):
+            part = ET.Element(root.tag, root.attrib)
+            part.extend(chunk)
+            paths[i] = os.path.join(tmp, f"biosamples_{i:04d}.xml")
+            ET.ElementTree(part).write(paths[i], encoding="UTF-8", xml_declaration=True)
+
+        def post(i, delay):
+            time.sleep(delay)
+            receipt = os.path.join(logs_dir, f"biosample_receipt_{timestamp}_{i:04d}.xml")
+            cmd = _curl_command(netrc_path, paths[i], receipt, url) + ["-w", "%{http_code}"]
+            if limit.max_mbps:  # each transfer gets its share of the cap
+                cmd[1:1] = ["--limit-rate", str(int(limit.max_mbps * 1e6 / limit.limit))]
+            t0 = time.time()
+            with stage("curl", row=i, bytes_in=os.path.getsize(paths[i])) as rec:
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                http = int(result.stdout.strip() or 0) if result.stdout.strip().isdigit() else 0
+                rec["returncode"] = result.returncode
+                rec["http_code"] = http
+                rec["bytes_out"] = os.path.getsize(receipt) if os.path.exists(receipt) else 0
+            return result, http, receipt, time.time() - t0
+
+        pending = list(paths)
+        with ThreadPoolExecutor(max_workers=limit.hi) as pool:
+            while pending or running:
+                while pending and len(running) < limit.limit:
+                    i = pending.pop(0)
+                    attempts[i] = attempts.get(i, 0) + 1
+                    running[pool.submit(post, i, limit.reserve(os.path.getsize(paths[i])))] = i
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i = running.pop(fut)
+                    result, http, receipt, secs = fut.result()
+                    throttled = result.returncode in CURL_THROTTLED or http in HTTP_THROTTLED
+                    limit.observe(os.path.getsize(paths[i]), secs, not throttled)
+                    tag = f"[chunk {i}/{len(chunks)}]"
+                    if throttled and attempts[i] < CHUNK_ATTEMPTS:
+                        print(f"{tag} throttled (curl exit {result.returncode}, HTTP {http}), sending again")
+                        pending.append(i)
+                        continue
+                    try:
+                        success, recs = read_receipt(receipt)
+                    except (OSError, ET.ParseError):
+                        print(f"{tag} FAILED (curl exit {result.returncode}, HTTP {http}) {result.stderr.strip()}")
+                        continue
+                    records.extend(recs)
+                    print(f"{tag} success={success}, {sum(1 for acc, _ in recs if acc)}/{len(recs)} accessioned → {receipt}")
+    return records
+
+# Uses the test submission as default, just in case.
+# Returns [(accession, alias), …] from the receipt(s) (accession is None for rejected samples).
+# With `chunk_size` the samples go in several POSTs, run in parallel under `limit`.
+def submit_data(username, password, logs_dir="logs", url=TEST_ENDPOINT, chunk_size=0, limit=None):
     # Build submission and receipt filenames
     submission_file = "submission.xml"
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     receipt_file = os.path.join(logs_dir, f"biosample_receipt_{timestamp}.xml")
+    records = []
 
     # create a temporary netrc file for curl authentication
     if "://" in url:
         host = url.split("://", 1)[1].split("/", 1)[0]
     else:
         host = url.split("/", 1)[0]
+    host = re.sub(r":\d+$", "", host)  # netrc matches on the host name only, not host:port
 
     with tempfile.NamedTemporaryFile("w", delete=False) as tf:
         tf.write(f"machine {host}\nlogin {username}\npassword {password}\n")
     netrc_path = tf.name
     os.chmod(netrc_path, 0o600)
 
+    if chunk_size:
+        try:
+            records = submit_chunks(netrc_path, logs_dir, timestamp, url, chunk_size, limit)
+        finally:
+            os.remove(netrc_path)
+        write_accessions(records, url)
+        return records
+
     try:
-        curl_command = [
-            "curl",
-            "--netrc-file", netrc_path,              # <— no -u flag
-            "-F", f"SUBMISSION=@{submission_file}",
-            "-F", f"SAMPLE=@biosamples.xml",
-            url,
-            "-o", receipt_file
-        ]
+        curl_command = _curl_command(netrc_path, "biosamples.xml", receipt_file, url, submission_file)
 
         # 3) print *safe* command (no secrets anywhere)
         print("→ Running:", " ".join(shlex.quote(a) for a in curl_command))
 
-        result = subprocess.run(curl_command, capture_output=True, text=True)
+        xml_bytes = sum(os.path.getsize(f) for f in (submission_file, "biosamples.xml") if os.path.exists(f))
+        with stage("curl", bytes_in=xml_bytes) as rec:
+            result = subprocess.run(curl_command, capture_output=True, text=True)
+            rec["returncode"] = result.returncode
+            rec["bytes_out"] = os.path.getsize(receipt_file) if os.path.exists(receipt_file) else 0
     finally:
         os.remove(netrc_path)                        # ensure cleanup
     
@@ -272,37 +488,14 @@ def submit_data(username, password, logs_dir="logs", url=TEST_ENDPOINT):
     # Parse receipt XML, to look for accession codes, alias, and whether success or not
     if os.path.exists(receipt_file):
         try:
-            tree = ET.parse(receipt_file)
-            root = tree.getroot()
-            success = root.attrib.get('success', 'false')
+            success, records = read_receipt(receipt_file)
             print(f"Submission success: {success}")
-
-            # Extract sample accession & alias
-            records = []
-            for samp in root.findall('SAMPLE'):
-                acc = samp.attrib.get('accession')
-                alias = samp.attrib.get('alias')
-                records.append((acc, alias))
-
-            # Write to text file
-            out_file = os.path.join(os.path.dirname(__file__), 'biosample_accessions.txt')
-            write_mode = "a+" if os.path.exists(out_file) else "w+"
-            with open(out_file, write_mode) as out:
-                out.seek(0)
-                existing = {l.strip() for l in out if l.strip()}
-                if not existing:
-                    out.write("accession\talias\n")
-                for acc, alias in records:
-                    line = f"{acc}\t{alias}"
-                    if line not in existing:
-                        if url == TEST_ENDPOINT:
-                            line += " (test)"
-                        out.write(line + "\n")
-            print(f"Accessions written to {out_file}")
+            write_accessions(records, url)
         except Exception as e:
             print(f"Error parsing receipt XML: {e}")
     else:
         print(f"Receipt file not found: {receipt_file}")
+    return records
 
 
 def load_credentials(file_path):
@@ -345,9 +538,39 @@ def main():
     parser.add_argument("--live", action="store_true",
                         help="Submit to the live ENA endpoint instead of test (DEV) endpoint")
 
+    parser.add_argument("--endpoint",
+                        help="Submit to this URL instead of the ENA test/live endpoint (e.g. a local ../mock_ena server)")
+
+    parser.add_argument("--checklist",
+                        help="ENA sample checklist: accession in checklists/ (e.g. ERC000037) or a .json/.xml file (default: ERC000037)")
+
+    parser.add_argument("--chunk_size", type=int, default=0,
+                        help="Submit in chunks of this many samples, several POSTs at a time (default: 0, one POST)")
+
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Chunks posted at the same time (default: 1)")
+
+    parser.add_argument("--min_jobs", type=int, default=1,
+                        help="Lower bound for adaptive concurrency (with --max_jobs, default: 1)")
+
+    parser.add_argument("--max_jobs", type=int, default=0,
+                        help="Adapt the chunks at a time between --min_jobs and this, from throughput and throttling (default: 0, fixed --jobs)")
+
+    parser.add_argument("--max_mbps", type=float, default=0,
+                        help="Cap on the total upload rate in MB/s (default: 0, no cap)")
+
     parser.add_argument("--logs_dir", default="logs",
                         help="Directory to store submission logs (default: logs)")
 
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and dump stats to logs/metrics/")
+
+    parser.add_argument("--table_cache", metavar="DIR",
+                        help="Cache dir for parsed Excel sheets (default: ~/.cache/enflora/tables)")
+
+    parser.add_argument("--no_table_cache", action="store_true",
+                        help="Always re-parse Excel sheets instead of using the cache")
+
     args = parser.parse_args()
 
     cfg = load_config(args.config)
@@ -371,11 +594,29 @@ def main():
     live = cfg.get("live")
     if not live:
         live = args.live
+
+    # Per-stage metrics under logs/metrics/, and optional cProfile of the whole run
+    init_metrics(args.logs_dir, "biosamples")
+    if args.profile:
+        start_profile(args.logs_dir, "biosamples")
+
+    # Parsed Excel cache directory (table_cache: False disables it)
+    if cfg.get("table_cache") is False or args.no_table_cache:
+        enflora.TABLE_CACHE_DIR = None
+    elif cfg.get("table_cache") or args.table_cache:
+        enflora.TABLE_CACHE_DIR = cfg.get("table_cache") or args.table_cache
     
+    # Sample checklist the table is validated against and whose attributes are written
+    checklist = cfg.get("checklist")
+    if not checklist:
+        checklist = args.checklist
+
     # if excel_path:
     #     excel_to_xml(excel_path)
     if table_path:
-        excel_to_xml(table_path)
+        with stage("build_xml") as rec:
+            excel_to_xml(table_path, checklist=checklist)
+            rec["bytes_out"] = os.path.getsize("biosamples.xml")
 
     if submit:
         # Load or override credentials
@@ -386,9 +627,29 @@ def main():
 
         create_submission_xml()
         logs = prepare_logs_dir(args.logs_dir)
-        endpoint = LIVE_ENDPOINT if live else TEST_ENDPOINT
+        endpoint = cfg.get("endpoint")
+        if not endpoint:
+            endpoint = args.endpoint or (LIVE_ENDPOINT if live else TEST_ENDPOINT)
         print(f"Using endpoint: {endpoint}")
-        submit_data(user, pw, logs, endpoint)
+        # Chunked submission: chunks posted in parallel, adaptively between min_jobs and max_jobs
+        chunk_size = cfg.get("biosample_chunk")
+        if not chunk_size:
+            chunk_size = args.chunk_size
+        jobs = cfg.get("jobs")
+        if not jobs:
+            jobs = args.jobs
+        max_jobs = cfg.get("max_jobs")
+        if not max_jobs:
+            max_jobs = args.max_jobs
+        min_jobs = cfg.get("min_jobs")
+        if not min_jobs:
+            min_jobs = args.min_jobs
+        max_mbps = cfg.get("max_mbps")
+        if not max_mbps:
+            max_mbps = args.max_mbps
+        limit = AdaptiveConcurrency(lo=min_jobs if max_jobs else jobs, hi=max_jobs or jobs, start=jobs,
+                                    max_mbps=max_mbps, label="biosamples")
+        submit_data(user, pw, logs, endpoint, chunk_size=int(chunk_size), limit=limit)
 
     if not table_path and not submit:
         parser.print_help()
@@ -0,0 +1,1687 @@
+"""
+Code shared by biosamples/biosamples.py, runs/runs.py and analysis/analysis.py:
+config, metrics, sheet reading, sample locks, largest-first scheduling, the staging
+store and catalog, watch mode, the --plan estimator and Webin-CLI submission.
+
+The scripts put this folder on sys.path and import from here, so each of them still
+runs on its own (`cd runs && python runs.py …`) as well as from pipeline.py.
+"""
+# Downloadable libraries (pandas, yaml, openpyxl) are imported lazily where needed
+
+# Standard libraries
+import os
+import sys
+import re
+import glob
+import gzip
+import errno
+import select
+import socket
+import zlib
+import json
+import hashlib
+import time
+import threading
+import subprocess
+import atexit
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Optional
+
+def load_config(cfg_path: str = "../config.yaml") -> dict:
+    """
+    Return a dict with the YAML content or an empty dict if the file is absent.
+    """
+    if os.path.exists(cfg_path):
+        import yaml  # lazy: keeps start-up cheap
+        with open(cfg_path, "r") as fh:
+            return yaml.safe_load(fh) or {}
+    return {}
+
+# Per-stage metrics: one JSON record per stage call, appended to the file opened by init_metrics();
+# only running totals per stage stay in memory
+_METRICS = {"fh": None, "totals": {}, "lock": threading.Lock()}
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = resource.getrusage(who).ru_maxrss  # KiB on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def init_metrics(logs_dir: str, script: str) -> str:
+    """
+    Write per-stage metrics to <logs_dir>/metrics/<script>_<timestamp>.jsonl.
+    A per-stage summary is printed and appended when the run ends.
+    """
+    metrics_dir = os.path.join(logs_dir, "metrics")
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{script}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl")
+    _METRICS["fh"] = open(path, "a")
+    atexit.register(_metrics_summary)
+    return path
+
+@contextmanager
+def stage(name: str, row=None, bytes_in: int = 0, **extra):
+    """
+    Time one stage and record wall time, bytes in/out, MB/s and peak RSS.
+    The yielded dict can be updated inside the block (e.g. rec["bytes_out"]).
+    """
+    rec = {"stage": name, "row": row, "bytes_in": bytes_in, "bytes_out": 0, **extra}
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        secs = time.perf_counter() - t0
+        moved = max(rec["bytes_in"] or 0, rec["bytes_out"] or 0)
+        rec["seconds"] = round(secs, 4)
+        rec["mb_s"] = round(moved / 1e6 / secs, 2) if moved and secs > 0 else None
+        rec["peak_rss_mb"] = _peak_rss_mb()
+        with _METRICS["lock"]:
+            t = _METRICS["totals"].setdefault(name, {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0})
+            t["calls"] += 1
+            t["seconds"] += rec["seconds"]
+            t["bytes_in"] += rec["bytes_in"] or 0
+            t["bytes_out"] += rec["bytes_out"] or 0
+            if _METRICS["fh"]:
+                _METRICS["fh"].write(json.dumps(rec, default=str) + "\n")
+                _METRICS["fh"].flush()
+
+def _metrics_summary():
+    totals = _METRICS["totals"]
+    if totals:
+        print("\n--- Stage summary ---")
+        print(f"{'stage':<20}{'calls':>7}{'seconds':>11}{'MB in':>11}{'MB out':>11}{'MB/s':>9}")
+        for name, t in sorted(totals.items(), key=lambda kv: -kv[1]["seconds"]):
+            moved = max(t["bytes_in"], t["bytes_out"])
+            rate = f"{moved / 1e6 / t['seconds']:.1f}" if moved and t["seconds"] > 0 else "-"
+            print(f"{name:<20}{t['calls']:>7}{t['seconds']:>11.2f}{t['bytes_in'] / 1e6:>11.1f}"
+                  f"{t['bytes_out'] / 1e6:>11.1f}{rate:>9}")
+        print(f"Peak RSS: {_peak_rss_mb()} MB (child processes: {_peak_rss_mb(children=True)} MB)")
+    fh = _METRICS["fh"]
+    if fh:
+        fh.write(json.dumps({"summary": totals, "peak_rss_mb": _peak_rss_mb(),
+                             "children_peak_rss_mb": _peak_rss_mb(children=True)}) + "\n")
+        fh.close()
+        _METRICS["fh"] = None
+
+def start_profile(logs_dir: str, script: str):
+    """
+    Profile the rest of the run with cProfile; stats are dumped to
+    <logs_dir>/metrics/<script>_<timestamp>.prof and the top entries printed at exit.
+    """
+    import cProfile
+
+    prof = cProfile.Profile()
+    path = os.path.join(logs_dir, "metrics", f"{script}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.prof")
+
+    def _dump():
+        prof.disable()
+        import pstats
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prof.dump_stats(path)
+        print(f"\n--- Profile (top 25 by cumulative time), full stats → {path} ---")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(25)
+
+    atexit.register(_dump)
+    prof.enable()
+
+# Cell values pandas.read_csv treats as missing by default
+_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+def _isnull(val) -> bool:
+    """
+    pandas-free isnull() for a table cell (None, NaN, NaT).
+    """
+    return val is None or val != val
+
+class TsvTable:
+    """
+    Minimal DataFrame stand-in for TSV sheets: `columns` plus `iterrows()`
+    yielding (index, {column: value}). Missing cells are NaN as with pandas;
+    other values are kept as the strings found in the file.
+    """
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def iterrows(self):
+        for idx, values in enumerate(self.rows):
+            yield idx, dict(zip(self.columns, values))
+
+def _name_columns(header) -> list:
+    """
+    Name header cells the way pandas does: empty -> 'Unnamed: i', repeats -> 'A.1', 'A.2'.
+    """
+    columns, seen = [], {}
+    for i, col in enumerate(header):
+        col = col or f"Unnamed: {i}"
+        if col in seen:
+            seen[col] += 1
+            col = f"{col}.{seen[col]}"
+        else:
+            seen[col] = 0
+        columns.append(col)
+    return columns
+
+def read_tsv(path: str) -> TsvTable:
+    """
+    Read a TSV sheet with the csv module, without importing pandas.
+    """
+    import csv
+    nan = float("nan")
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.reader(fh, delimiter="\t")
+        header = next(reader, None)
+        if header is None:
+            sys.exit(f"Empty table: {path}")
+        columns = _name_columns(header)
+        rows = []
+        for lineno, rec in enumerate(reader, start=2):
+            if not rec:
+                continue  # blank line
+            if len(rec) > len(columns):
+                sys.exit(f"{path}, line {lineno}: expected {len(columns)} fields, saw {len(rec)}")
+            rec += [""] * (len(columns) - len(rec))
+            rows.append([nan if v in _NA_VALUES else v for v in rec])
+    return TsvTable(columns, rows)
+
+# Rows per chunk when a TSV sheet is streamed (--stream)
+TSV_CHUNK_ROWS = 10000
+
+class TsvStream:
+    """
+    TsvTable look-alike that keeps no rows: every iterrows() re-reads the file,
+    TSV_CHUNK_ROWS rows at a time, so memory does not grow with the sheet.
+    """
+    def __init__(self, path: str, chunk_rows: int = TSV_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        import csv
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            header = next(csv.reader(fh, delimiter="\t"), None)
+        if header is None:
+            sys.exit(f"Empty table: {path}")
+        self.columns = _name_columns(header)
+
+    def chunks(self):
+        import csv
+        nan = float("nan")
+        width = len(self.columns)
+        with open(self.path, newline="", encoding="utf-8-sig") as fh:
+            reader = csv.reader(fh, delimiter="\t")
+            next(reader)
+            chunk = []
+            for lineno, rec in enumerate(reader, start=2):
+                if not rec:
+                    continue  # blank line
+                if len(rec) > width:
+                    sys.exit(f"{self.path}, line {lineno}: expected {width} fields, saw {len(rec)}")
+                rec += [""] * (width - len(rec))
+                chunk.append([nan if v in _NA_VALUES else v for v in rec])
+                if len(chunk) >= self.chunk_rows:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def iterrows(self):
+        idx = 0
+        for chunk in self.chunks():
+            for values in chunk:
+                yield idx, dict(zip(self.columns, values))
+                idx += 1
+
+# Parsed Excel sheets are cached here, shared by biosamples.py, runs.py and analysis.py.
+# None disables the cache.
+TABLE_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "enflora", "tables")
+
+def read_xlsx(path: str, sheet=0) -> TsvTable:
+    """
+    Stream one .xlsx sheet through openpyxl in read-only mode into a TsvTable.
+    Trailing empty rows/columns are dropped and headers named like pandas does.
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        sys.exit("Error: reading .xlsx tables requires openpyxl (pip install openpyxl)")
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        ws.reset_dimensions()  # don't trust the stored sheet size
+        raw = [list(r) for r in ws.iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+    nan = float("nan")
+    empty = lambda v: v is None or (isinstance(v, str) and v in _NA_VALUES)
+    rows = [[nan if empty(v) else v for v in r] for r in raw]
+    while rows and all(_isnull(v) for v in rows[-1]):
+        rows.pop()
+    if not rows:
+        sys.exit(f"Empty table: {path}")
+    width = max(max((i + 1 for i, v in enumerate(r) if not _isnull(v)), default=0) for r in rows)
+    rows = [(r + [nan] * width)[:width] for r in rows]
+    header = ["" if _isnull(v) else str(v) for v in rows[0]]
+    return TsvTable(_name_columns(header), rows[1:])
+
+def load_xlsx_cached(path: str, sheet=0) -> TsvTable:
+    """
+    read_xlsx() through the on-disk cache in TABLE_CACHE_DIR.
+
+    Entries are keyed by absolute path + sheet and store the workbook's size and
+    mtime, so an edited workbook is re-parsed and its entry replaced automatically.
+    """
+    if not TABLE_CACHE_DIR:
+        return read_xlsx(path, sheet)
+    import hashlib
+    import pickle
+
+    src = os.path.abspath(path)
+    st = os.stat(src)
+    stamp = (st.st_size, st.st_mtime_ns, sheet)
+    key = hashlib.sha1(f"{src}\0{sheet}".encode()).hexdigest()
+    entry = os.path.join(TABLE_CACHE_DIR, key + ".pkl")
+    try:
+        with open(entry, "rb") as fh:
+            cached_stamp, columns, rows = pickle.load(fh)
+        if cached_stamp == stamp:
+            return TsvTable(columns, rows)
+    except Exception:
+        pass  # missing or unreadable entry: just re-parse
+
+    table = read_xlsx(src, sheet)
+    try:
+        os.makedirs(TABLE_CACHE_DIR, exist_ok=True)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump((stamp, table.columns, table.rows), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)  # atomic: concurrent jobs never read a partial entry
+    except OSError as exc:
+        print(f"  Could not cache parsed table {entry}: {exc}")
+    return table
+
+def load_table(path: str, case: str = "upper", sheet=0, stream: bool = False):
+    """
+    Load a sheet. With `stream`, a TSV sheet comes back as a TsvStream that is read
+    chunk by chunk on each pass instead of being held in memory (Excel sheets are
+    always loaded whole).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in {".xlsx", ".xls", ".tsv", ".tab", ".txt"}:
+        sys.exit(f"Unsupported table extension '{ext}'. Use .xlsx/.xls or .tsv/.tab/.txt")
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    with stage("load_table", bytes_in=size, file=os.path.basename(path)) as rec:
+        if stream and ext in {".tsv", ".tab", ".txt"}:
+            df = TsvStream(path)
+            rec["bytes_in"] = 0  # only the header was read
+        elif ext == ".xlsx":
+            df = load_xlsx_cached(path, sheet)
+        elif ext == ".xls":
+            import pandas as pd  # lazy: only legacy .xls sheets need pandas (+ xlrd)
+            df = pd.read_excel(path, sheet_name=sheet)
+        else:
+            df = read_tsv(path)
+        rec["rows"] = None if isinstance(df, TsvStream) else len(df)
+    columns = [str(c).strip() for c in df.columns]
+    if case == "upper":
+        columns = [c.upper() for c in columns]
+    elif case == "lower":
+        columns = [c.lower() for c in columns]
+    df.columns = columns
+    return df
+
+class SampleLock:
+    """
+    Advisory lock on one sample folder (see sample_lock for where the file goes), so several jobs can
+    stage or submit from a shared submission/ and logs/ tree without clobbering each other.
+
+    Uses POSIX fcntl locks (lockf, which NFS forwards to its lock manager). Where those are
+    unavailable it falls back to an exclusively created `<lock>.excl` file holding host and
+    PID, taken over once its holder has died (same host) or after STALE_AFTER seconds; an
+    empty or unreadable holder file is judged by its age alone.
+    Use as `with SampleLock(path, wait) as got:`; `got` is False if `wait` is off and
+    another job holds the lock.
+    """
+    STALE_AFTER = 24 * 3600
+    POLL = 2.0
+
+    def __init__(self, path: str, wait: bool = True):
+        self.path = path
+        self.excl_path = path + ".excl"  # never the lockf file, which acquire() creates first
+        self.wait = wait
+        self.fh = None
+        self.excl = False
+
+    def _holder(self) -> str:
+        return f"{socket.gethostname()} {os.getpid()} {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+
+    def acquire(self) -> bool:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        try:
+            import fcntl
+            fh = open(self.path, "a+")
+        except ImportError:
+            return self._acquire_excl()
+        try:
+            fcntl.lockf(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as exc:
+            if exc.errno not in (errno.EACCES, errno.EAGAIN):
+                fh.close()  # e.g. ENOLCK: no lock manager on this filesystem
+                return self._acquire_excl()
+            if not self.wait:
+                fh.close()
+                return False
+            fh.seek(0)
+            print(f"  Waiting for {self.path} (held by {fh.read().strip() or 'another job'}) …")
+            fcntl.lockf(fh, fcntl.LOCK_EX)
+        fh.seek(0)
+        fh.truncate()
+        fh.write(self._holder())
+        fh.flush()
+        self.fh = fh
+        return True
+
+    def _stale(self) -> bool:
+        try:
+            with open(self.excl_path) as fh:
+                fields = fh.read().split()
+        except OSError:
+            fields = []
+        if len(fields) >= 2 and fields[0] == socket.gethostname() and fields[1].isdigit():
+            try:
+                os.kill(int(fields[1]), 0)
+                return False
+            except ProcessLookupError:
+                return True
+            except OSError:
+                pass  # e.g. EPERM: alive, but another user's process
+        # holder on another host, or the file is empty/garbled (crash between create and write)
+        try:
+            return time.time() - os.path.getmtime(self.excl_path) > self.STALE_AFTER
+        except OSError:
+            return False
+
+    def _acquire_excl(self) -> bool:
+        announced = False
+        while True:
+            try:
+                fd = os.open(self.excl_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if self._stale():
+                    try:
+                        os.remove(self.excl_path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not self.wait:
+                    return False
+                if not announced:
+                    print(f"  Waiting for {self.excl_path} …")
+                    announced = True
+                time.sleep(self.POLL)
+                continue
+            with os.fdopen(fd, "w") as fh:
+                fh.write(self._holder())
+            self.excl = True
+            return True
+
+    def release(self):
+        if self.fh:
+            self.fh.close()  # drops the fcntl lock; the file stays for the next job
+            self.fh = None
+        elif self.excl:
+            try:
+                os.remove(self.excl_path)
+            except FileNotFoundError:
+                pass
+            self.excl = False
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+# Sample lock files go in a hidden folder, so submission/ and logs/ only list samples
+LOCK_DIR = ".locks"
+
+def sample_lock(folder: str, wait: bool = True) -> SampleLock:
+    """
+    SampleLock for a sample folder, on <parent>/.locks/<name>.lock.
+    """
+    folder = os.path.abspath(folder)
+    return SampleLock(os.path.join(os.path.dirname(folder), LOCK_DIR, os.path.basename(folder) + ".lock"), wait)
+
+# --- Largest-first (LPT) scheduling of staging and submission work ---
+def _timed(work, item, delay: float = 0.0):
+    if delay:
+        time.sleep(delay)
+    t0 = time.time()
+    return work(item), time.time() - t0
+
+def _fit_cost(done: list) -> tuple:
+    """
+    Least-squares fit of seconds = t0 + k * bytes over [(bytes, seconds), …]; returns (t0, k).
+    """
+    n = len(done)
+    mb = sum(b for b, _ in done) / n
+    ms = sum(s for _, s in done) / n
+    var = sum((b - mb) ** 2 for b, _ in done)
+    k = max(0.0, sum((b - mb) * (s - ms) for b, s in done) / var) if var else 0.0
+    return max(0.0, ms - k * mb), k
+
+def _simulate_makespan(sizes, workers: int, t0: float, k: float, byte_budget: int = 0) -> float:
+    """
+    Replay run_largest_first()'s dispatch of `sizes` (in the given order) onto `workers`
+    under `byte_budget`, each item taking t0 + k * bytes; returns the finishing time.
+    """
+    pending, running, now = list(sizes), [], 0.0
+    while pending or running:
+        for b in list(pending):
+            if len(running) >= workers:
+                break
+            if byte_budget and running and sum(r for _, r in running) + b > byte_budget:
+                continue
+            pending.remove(b)
+            running.append((now + t0 + k * b, b))
+        running.sort()
+        now = running.pop(0)[0]
+    return now
+
+def makespan_report(label: str, done: list, sheet_sizes: list, workers: int, elapsed: float,
+                    byte_budget: int = 0) -> dict:
+    """
+    Compare the actual wall time with the makespan predicted from input sizes, for
+    largest-first and for sheet order. `done` is [(bytes, seconds), …] per finished item.
+    """
+    if not done:
+        return {}
+    t0, k = _fit_cost(done)
+    lpt = _simulate_makespan(sorted(sheet_sizes, reverse=True), workers, t0, k, byte_budget)
+    sheet = _simulate_makespan(sheet_sizes, workers, t0, k, byte_budget)
+    print(f"→ {label}: {len(done)} item(s) on {workers} worker(s) took {elapsed:.1f}s; "
+          f"predicted {lpt:.1f}s largest-first, {sheet:.1f}s in sheet order")
+    return {"predicted_s": round(lpt, 2), "sheet_order_s": round(sheet, 2), "actual_s": round(elapsed, 2)}
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on concurrent transfers, kept between `lo` and `hi`. After every window
+    of `limit` finished transfers: halve if any was throttled, step down if their total
+    rate (bytes over the span from the first start to the last end) exceeded `max_mbps`
+    or fell clearly below the previous window's, else add one.
+    reserve() paces starts so the average rate stays within `max_mbps` (0 = no cap).
+    Every decision is recorded as a "concurrency" metrics stage; changes are printed.
+    """
+    def __init__(self, lo: int = 1, hi: int = 1, start: Optional[int] = None, max_mbps: float = 0.0,
+                 label: str = "upload"):
+        self.lo = max(1, int(lo))
+        self.hi = max(self.lo, int(hi))
+        self.limit = min(self.hi, max(self.lo, int(start or self.lo)))
+        self.max_mbps = float(max_mbps or 0)
+        self.label = label
+        self.lock = threading.Lock()
+        self.window = []              # (bytes, seconds, ok, end) finished since the last decision
+        self.prev_mbps = 0.0
+        self.next_start = 0.0
+
+    def reserve(self, nbytes: int) -> float:
+        """
+        Seconds to wait before starting a transfer of `nbytes` under the bandwidth cap.
+        """
+        if not self.max_mbps:
+            return 0.0
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_start)
+            self.next_start = start + nbytes / (self.max_mbps * 1e6)
+            return start - now
+
+    def observe(self, nbytes: int, seconds: float, ok: bool = True):
+        with self.lock:
+            self.window.append((nbytes, seconds, ok, time.time()))
+            if len(self.window) >= self.limit:
+                self._decide()
+
+    def _decide(self):
+        moved = sum(b for b, _, _, _ in self.window)
+        throttled = sum(1 for _, _, ok, _ in self.window if not ok)
+        span = max(e for *_, e in self.window) - min(e - s for _, s, _, e in self.window)
+        total = moved / 1e6 / max(span, 1e-6)
+        each = sum(b / 1e6 / s for b, s, _, _ in self.window if s > 0) / len(self.window)
+        old = self.limit
+        if throttled:
+            self.limit, reason = max(self.lo, old // 2), f"{throttled} throttled"
+        elif self.max_mbps and total > self.max_mbps:
+            self.limit, reason = max(self.lo, old - 1), f"above the {self.max_mbps:g} MB/s cap"
+        elif total < 0.8 * self.prev_mbps:
+            self.limit, reason = max(self.lo, old - 1), "throughput fell"
+        else:
+            self.limit, reason = min(self.hi, old + 1), "clean window"
+        if self.limit != old:
+            print(f"→ {self.label} concurrency {old} → {self.limit}: {len(self.window)} transfer(s), "
+                  f"{total:.1f} MB/s total, {each:.1f} MB/s each ({reason})")
+        with stage("concurrency", label=self.label, old=old, new=self.limit, reason=reason,
+                   transfers=len(self.window), throttled=throttled, window_bytes=moved,
+                   total_mb_s=round(total, 2), each_mb_s=round(each, 2)):
+            pass
+        self.prev_mbps = total
+        self.window = []
+
+def run_largest_first(items: list, size_of, work, workers: int = 1, byte_budget: int = 0, label: str = "work",
+                      limit: Optional[AdaptiveConcurrency] = None, ok=None) -> list:
+    """
+    Run work(item) for all items on `workers` threads, largest first. With `byte_budget`,
+    an item only starts while the bytes in flight stay within it (smaller items may go
+    ahead; an item larger than the budget runs alone). Returns results in `items` order.
+
+    With `limit` the number of threads follows limit.limit instead, starts are paced
+    under its bandwidth cap and each finished item is reported to it; ok(result)
+    False marks a throttled item.
+    """
+    if limit:
+        workers = limit.hi
+    sizes = [size_of(it) for it in items]
+    pending = sorted(range(len(items)), key=lambda i: sizes[i], reverse=True)
+    results = [None] * len(items)
+    done, running, inflight = [], {}, 0
+    start = time.time()
+    with stage(f"schedule_{label}", bytes_in=sum(sizes), files=len(items), workers=workers) as rec, \
+         ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for i in list(pending):
+                if len(running) >= (limit.limit if limit else workers):
+                    break
+                if byte_budget and running and inflight + sizes[i] > byte_budget:
+                    continue
+                pending.remove(i)
+                inflight += sizes[i]
+                running[pool.submit(_timed, work, items[i], limit.reserve(sizes[i]) if limit else 0.0)] = i
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i = running.pop(fut)
+                inflight -= sizes[i]
+                results[i], secs = fut.result()
+                done.append((sizes[i], secs))
+                if limit:
+                    limit.observe(sizes[i], secs, ok(results[i]) if ok else True)
+        rec.update(makespan_report(label, done, sizes, limit.limit if limit else max(1, workers),
+                                   time.time() - start, byte_budget))
+    return results
+
+# --- Content-addressed staging store: <submission_dir>/.objects/ ---
+# Each distinct input is gzipped once into .objects/<sha256 of its content>.gz and hard-linked
+# (symlinked across filesystems) into every sample folder that uses it. Next to each object,
+# <digest>.md5 holds its MD5 and <digest>.refs the sample files linking to it (one per line,
+# appended); .objects/sources/<sha1 of path|size|mtime> names the object a source produced.
+# Each operation touches only these small files; --gc_store is the only one rewriting them.
+STORE_DIR = ".objects"
+STORE_SOURCES = "sources"
+
+# POSIX locks do not exclude threads of the same process, hence the extra threading.Lock
+_STORE_THREAD_LOCK = threading.Lock()
+
+@contextmanager
+def _store_lock(store: str):
+    """
+    Held while objects are added or linked (a few small files each) and for the whole of
+    gc_store, so no object is deleted between being looked up and linked.
+    """
+    with _STORE_THREAD_LOCK, SampleLock(os.path.join(store, "store.lock")):
+        yield
+
+def _source_path(store: str, src_key: str) -> str:
+    return os.path.join(store, STORE_SOURCES, hashlib.sha1(src_key.encode()).hexdigest())
+
+def _write_small(path: str, text: str):
+    tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+def _store_lookup(store: str, src_key: str) -> Optional[str]:
+    try:
+        with open(_source_path(store, src_key)) as fh:
+            digest = fh.read().split("\t", 1)[0]
+    except FileNotFoundError:
+        return None
+    if not digest or not os.path.exists(os.path.join(store, digest + ".gz")):
+        return None
+    return digest
+
+def _store_md5(store: str, digest: str) -> Optional[str]:
+    try:
+        with open(os.path.join(store, digest + ".md5")) as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+class _HashingWriter:
+    """
+    Write-only file wrapper feeding everything written through it to the hash `h`.
+    """
+    def __init__(self, fh, h):
+        self.fh = fh
+        self.h = h
+
+    def write(self, data) -> int:
+        self.h.update(data)
+        return self.fh.write(data)
+
+    def flush(self):
+        self.fh.flush()
+
+def _store_put(store: str, f_in, src_key: str, name: str, compress: bool = True, row=None, bytes_in: int = 0) -> str:
+    """
+    Copy the stream `f_in` into the store, gzipped on the way unless `compress` is off
+    (input already .gz). Returns the digest: sha256 of what was read from `f_in`.
+    The MD5 of the stored object, as Webin-CLI will compute it, goes into <digest>.md5.
+    """
+    # Write outside the lock; a race between two jobs only costs a second compression
+    tmp = os.path.join(store, f".{name}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp")
+    h = hashlib.sha256()
+    md5 = hashlib.md5()
+    with stage("compress" if compress else "copy", row=row, bytes_in=bytes_in, file=name) as rec:
+        with open(tmp, "wb") as raw:
+            out = _HashingWriter(raw, md5)
+            f_out = gzip.GzipFile("", "wb", compresslevel=6, fileobj=out, mtime=0) if compress else out
+            for chunk in iter(lambda: f_in.read(1024 * 1024), b""):  # 1 MiB chunks
+                h.update(chunk)
+                f_out.write(chunk)
+            if compress:
+                f_out.close()
+        rec["bytes_out"] = os.path.getsize(tmp)
+    digest = h.hexdigest()
+    obj = os.path.join(store, digest + ".gz")
+    os.makedirs(os.path.join(store, STORE_SOURCES), exist_ok=True)
+    with _store_lock(store):
+        if os.path.exists(obj):
+            os.remove(tmp)  # same content already stored under another path
+        else:
+            os.replace(tmp, obj)
+            _write_small(obj[:-3] + ".md5", md5.hexdigest() + "\n")
+        _write_small(_source_path(store, src_key), f"{digest}\t{src_key}\n")
+    return digest
+
+def _store_link(store: str, digest: str, dst: str, submission_dir: str):
+    """
+    Hard-link (or symlink) a stored object to `dst` and record the reference.
+    """
+    obj = os.path.join(store, digest + ".gz")
+    ref = os.path.relpath(dst, submission_dir)
+    with _store_lock(store):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(obj, dst)
+        except OSError:
+            os.symlink(os.path.abspath(obj), dst)
+        with open(obj[:-3] + ".refs", "a+") as fh:
+            fh.seek(0)
+            if ref not in fh.read().splitlines():
+                fh.write(ref + "\n")
+
+def stage_compressed(src: str, samp_dir: str, submission_dir: str, row=None) -> str:
+    """
+    gzip `src` into `samp_dir` as <basename>.gz through the store, compressing it only the
+    first time this content is seen. Returns the staged file name.
+    """
+    store = os.path.join(submission_dir, STORE_DIR)
+    os.makedirs(store, exist_ok=True)
+    st = os.stat(src)
+    src_key = f"{os.path.realpath(src)}|{st.st_size}|{st.st_mtime_ns}"
+    gz_name = os.path.basename(src) + ".gz"
+
+    digest = _store_lookup(store, src_key)
+    if not digest:
+        with open(src, "rb") as f_in:
+            digest = _store_put(store, f_in, src_key, gz_name, row=row, bytes_in=st.st_size)
+    _store_link(store, digest, os.path.join(samp_dir, gz_name), submission_dir)
+    return gz_name
+
+def prestage_inputs(paths, submission_dir: str, threads: int = 4, byte_budget: int = 0):
+    """
+    Compress every distinct uncompressed input into the store before the rows are
+    staged, `threads` at a time and largest first, so the row loop only links.
+    """
+    store = os.path.join(submission_dir, STORE_DIR)
+    os.makedirs(store, exist_ok=True)
+    def src_key(path):
+        st = os.stat(path)
+        return f"{os.path.realpath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    todo = [p for p in dict.fromkeys(paths) if not _store_lookup(store, src_key(p))]
+    if not todo:
+        return
+    print(f"→ Compressing {len(todo)} input(s) into {store} ({threads} at a time, largest first)")
+    def put(path):
+        with open(path, "rb") as f_in:
+            return _store_put(store, f_in, src_key(path), os.path.basename(path) + ".gz",
+                              bytes_in=os.path.getsize(path))
+    run_largest_first(todo, os.path.getsize, put, workers=threads, byte_budget=byte_budget, label="compress")
+
+def gc_store(submission_dir: str):
+    """
+    Drop store objects that no sample file links to any more (sample folder deleted,
+    input re-staged with new content) and forget the sources that produced them.
+
+    Objects the catalog lists for a staged sample are kept without checking their links;
+    only the others (and every object, without a catalog) are checked file by file.
+    """
+    store = os.path.join(submission_dir, STORE_DIR)
+    if not os.path.isdir(store):
+        print(f"→ No store under {submission_dir}, nothing to clean")
+        return
+    cataloged = set()
+    cat = Catalog.existing(submission_dir)
+    if cat:
+        with cat:
+            cat.manifests()  # forgets deleted samples
+            cataloged = cat.digests()
+    removed = freed = 0
+    with _store_lock(store):
+        kept = set()
+        for name in sorted(os.listdir(store)):
+            if not name.endswith(".gz") or name.startswith("."):
+                continue
+            digest = name[:-3]
+            obj = os.path.join(store, name)
+            if digest in cataloged:
+                kept.add(digest)
+                continue
+            refs_path = os.path.join(store, digest + ".refs")
+            try:
+                with open(refs_path) as fh:
+                    refs = fh.read().splitlines()
+            except FileNotFoundError:
+                refs = []
+            live = []
+            for ref in refs:
+                path = os.path.join(submission_dir, ref)
+                if os.path.exists(path) and os.path.samefile(path, obj):
+                    live.append(ref)
+            if live:
+                kept.add(digest)
+                if live != refs:
+                    _write_small(refs_path, "".join(r + "\n" for r in live))
+                continue
+            freed += os.path.getsize(obj)
+            os.remove(obj)
+            removed += 1
+            for extra in (refs_path, os.path.join(store, digest + ".md5")):
+                if os.path.exists(extra):
+                    os.remove(extra)
+        sources = os.path.join(store, STORE_SOURCES)
+        for entry in (os.scandir(sources) if os.path.isdir(sources) else []):
+            with open(entry.path) as fh:
+                if fh.read().split("\t", 1)[0] not in kept:
+                    os.remove(entry.path)
+    print(f"→ Store {store}: removed {removed} unused object(s), freed {freed / 1e6:.1f} MB, {len(kept)} kept")
+
+# --- Submission catalog: <submission_dir>/.catalog.sqlite ---
+# convert_manifests records each staged sample here (manifest, staged files with size, store digest
+# and MD5, status); submission, --report and --gc_store read it instead of walking submission/.
+CATALOG = ".catalog.sqlite"
+
+class Catalog:
+    """
+    SQLite index of the samples staged under one submission folder, shared by all jobs
+    using that folder. Use as `with Catalog(dir) as cat:`; Catalog.existing(dir) is None
+    where no catalog was made yet. One instance may be used from several threads.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS samples (
+            sample_id TEXT PRIMARY KEY, row INTEGER, manifest TEXT NOT NULL, bytes INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL, status TEXT NOT NULL, accessions TEXT,
+            staged_at TEXT NOT NULL, updated_at TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS files (
+            sample_id TEXT NOT NULL, name TEXT NOT NULL, field TEXT NOT NULL, size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL, dev INTEGER NOT NULL, ino INTEGER NOT NULL, digest TEXT, md5 TEXT,
+            PRIMARY KEY (sample_id, name));
+        CREATE INDEX IF NOT EXISTS files_inode ON files (dev, ino);
+    """
+
+    def __init__(self, submission_dir: str):
+        import sqlite3  # lazy: only staging and submission need it
+        os.makedirs(submission_dir, exist_ok=True)
+        self.submission_dir = submission_dir
+        self.path = os.path.join(submission_dir, CATALOG)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=120, check_same_thread=False)
+        self.db.executescript(self.SCHEMA)
+
+    @classmethod
+    def existing(cls, submission_dir: str):
+        return cls(submission_dir) if os.path.exists(os.path.join(submission_dir, CATALOG)) else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def add_sample(self, sample_id: str, row: int, mf: str):
+        """
+        Record a sample from its manifest.txt, one stat per staged file. Its status
+        and accessions are kept unless the manifest or a staged file changed.
+        """
+        samp_dir = os.path.dirname(mf)
+        with open(mf, "rb") as fh:
+            text = fh.read()
+        h = hashlib.sha256(text)
+        files = []
+        for line in text.decode().splitlines():
+            field, _, name = line.partition("\t")
+            if field in DATA_FIELDS:
+                name = name.strip()
+                st = os.stat(os.path.join(samp_dir, name))
+                files.append((sample_id, name, field, st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino))
+                h.update(f"{name}|{st.st_size}|{st.st_mtime_ns}|{st.st_ino}".encode())
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        # One short transaction per sample, so other jobs sharing the folder are never locked out
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM files WHERE sample_id = ?", (sample_id,))
+            self.db.executemany("INSERT INTO files (sample_id, name, field, size, mtime_ns, dev, ino) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+            self.db.execute(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?, 'staged', NULL, ?, ?) ON CONFLICT (sample_id) DO UPDATE SET "
+                "row = excluded.row, manifest = excluded.manifest, bytes = excluded.bytes, "
+                "status = CASE WHEN fingerprint = excluded.fingerprint THEN status ELSE 'staged' END, "
+                "accessions = CASE WHEN fingerprint = excluded.fingerprint THEN accessions END, "
+                "staged_at = CASE WHEN fingerprint = excluded.fingerprint THEN staged_at ELSE excluded.staged_at END, "
+                "fingerprint = excluded.fingerprint, updated_at = excluded.updated_at",
+                (sample_id, row, os.path.relpath(mf, self.submission_dir), sum(f[3] for f in files),
+                 h.hexdigest(), now, now))
+
+    def link_store(self, store: str):
+        """
+        Fill in the store digest and MD5 of the staged files that are links to store objects.
+        """
+        if not os.path.isdir(store):
+            return
+        objs = []
+        for entry in os.scandir(store):
+            if entry.name.endswith(".gz") and not entry.name.startswith("."):
+                st = entry.stat()
+                objs.append((entry.name[:-3], _store_md5(store, entry.name[:-3]), st.st_dev, st.st_ino))
+        with self.lock, self.db:
+            self.db.executemany("UPDATE files SET digest = ?, md5 = ? WHERE dev = ? AND ino = ?", objs)
+
+    def set_status(self, sample_id: str, status: str, accessions: Optional[dict] = None):
+        with self.lock, self.db:
+            self.db.execute("UPDATE samples SET status = ?, accessions = ?, updated_at = ? WHERE sample_id = ?",
+                            (status, json.dumps(accessions) if accessions else None,
+                             time.strftime("%Y-%m-%d %H:%M:%S"), sample_id))
+
+    def manifests(self) -> list:
+        """
+        Manifest paths of all cataloged samples; samples whose manifest.txt is gone are forgotten.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT sample_id, manifest FROM samples ORDER BY sample_id").fetchall()
+        found, gone = [], []
+        for sample_id, rel in rows:
+            mf = os.path.join(self.submission_dir, rel)
+            if os.path.exists(mf):
+                found.append(mf)
+            else:
+                gone.append((sample_id,))
+        if gone:
+            print(f"→ {len(gone)} sample folder(s) gone from {self.submission_dir}, dropped from the catalog")
+            with self.lock, self.db:
+                self.db.executemany("DELETE FROM files WHERE sample_id = ?", gone)
+                self.db.executemany("DELETE FROM samples WHERE sample_id = ?", gone)
+        return found
+
+    def sizes(self) -> dict:
+        """
+        {absolute manifest path: staged bytes} as recorded at staging time.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT manifest, bytes FROM samples").fetchall()
+        return {os.path.abspath(os.path.join(self.submission_dir, rel)): n for rel, n in rows}
+
+    def digests(self) -> set:
+        """
+        Store objects that cataloged samples link to (call manifests() first to drop deleted samples).
+        """
+        with self.lock:
+            return {d for (d,) in self.db.execute("SELECT DISTINCT digest FROM files WHERE digest IS NOT NULL")}
+
+    def report(self):
+        with self.lock:
+            by_status = self.db.execute("SELECT status, COUNT(*), SUM(bytes) FROM samples "
+                                        "GROUP BY status ORDER BY status").fetchall()
+            n_files, n_md5 = self.db.execute("SELECT COUNT(*), COUNT(md5) FROM files").fetchone()
+            failed = self.db.execute("SELECT sample_id, updated_at FROM samples WHERE status = 'failed' "
+                                     "ORDER BY sample_id").fetchall()
+        print(f"→ Catalog {self.path}: {sum(n for _, n, _ in by_status)} sample(s), "
+              f"{n_files} staged file(s), {n_md5} with a recorded MD5")
+        for status, n, nbytes in by_status:
+            print(f"  {status:<10}{n:>8} sample(s){_fmt_bytes(nbytes or 0):>12}")
+        for sample_id, when in failed[:20]:
+            print(f"  failed: {sample_id} ({when})")
+        if len(failed) > 20:
+            print(f"  … and {len(failed) - 20} more failed")
+
+def record_status(submission_dir: str, sample_id: str, status: str, accessions: Optional[dict] = None):
+    """
+    Set a sample's status in its submission folder's catalog, if there is one. A catalog
+    still locked by another job after Catalog's timeout is only warned about: the
+    submission itself went through and its receipt is in the logs.
+    """
+    import sqlite3
+    try:
+        cat = Catalog.existing(submission_dir)
+        if cat:
+            with cat:
+                cat.set_status(sample_id, status, accessions)
+    except sqlite3.OperationalError as exc:
+        print(f"  Could not record {sample_id} as {status} in the catalog: {exc}")
+
+def discover_manifests(submission_dir: str) -> list:
+    """
+    Staged manifests: from the catalog when convert_manifests made one, else by
+    listing <submission_dir>/*/manifest.txt.
+    """
+    cat = Catalog.existing(submission_dir)
+    if cat is None:
+        return sorted(glob.glob(os.path.join(submission_dir, "*", "manifest.txt")))
+    with cat:
+        return cat.manifests()
+
+def catalog_sizes(manifests) -> dict:
+    """
+    {absolute manifest path: staged bytes} from the catalogs of the manifests' submission folders.
+    """
+    sizes = {}
+    for sub_dir in {os.path.dirname(os.path.dirname(os.path.abspath(mf))) for mf in manifests}:
+        cat = Catalog.existing(sub_dir)
+        if cat:
+            with cat:
+                sizes.update(cat.sizes())
+    return sizes
+
+# --- Watch mode (--watch): stage and submit rows as their data arrive ---
+WATCH_STATE = ".watch.json"  # under the submission folder: row → fingerprint and status of its last round
+WATCH_SETTLE = 30.0          # seconds an input must keep its size and mtime before its row is staged
+WATCH_POLL = 60.0            # seconds between re-scans without inotify (and as a heartbeat with it)
+
+class DirWatcher:
+    """
+    Sleep until something changes in the watched folders: inotify through libc on
+    Linux (no extra package), otherwise just the timeout, i.e. polling.
+    """
+    # IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE; not IN_MODIFY,
+    # which fires on every write of a file being copied in
+    _MASK = 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+    def __init__(self):
+        self.fd = None
+        self.dirs = set()
+        try:
+            import ctypes
+            import ctypes.util
+            self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd >= 0:
+            self.fd = fd
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self.fd is not None else "polling"
+
+    def add(self, paths):
+        """
+        Watch the folder of each path, or its nearest existing parent until it is created.
+        """
+        if self.fd is None:
+            return
+        for path in paths:
+            d = os.path.dirname(os.path.abspath(path))
+            while d not in self.dirs and not os.path.isdir(d) and os.path.dirname(d) != d:
+                d = os.path.dirname(d)
+            if d not in self.dirs and self.libc.inotify_add_watch(self.fd, os.fsencode(d), self._MASK) >= 0:
+                self.dirs.add(d)
+
+    def wait(self, timeout: float):
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            time.sleep(1.0)  # let a burst of events (a copy, an editor's save) arrive together
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+def _watch_round(process, rows: list) -> dict:
+    """
+    process(rows), or row by row when one of them stops it, so one bad row does not
+    hold back the others; rows that stop it get status "error".
+    """
+    try:
+        return process(rows)
+    except SystemExit as exc:
+        if len(rows) == 1:
+            print(f"[Row {rows[0] + 1}] not staged: {exc.code}")
+            return {rows[0]: "error"}
+    statuses = {}
+    for idx in rows:
+        statuses.update(_watch_round(process, [idx]))
+    return statuses
+
+def watch_sheet(table_file, submission_dir, key_cols, file_cols_of, row_inputs, process, settle=WATCH_SETTLE,
+                poll=WATCH_POLL):
+    """
+    Keep submission_dir in step with a sheet whose rows and data keep arriving, until Ctrl-C.
+
+    Whenever the sheet or a folder holding its inputs changes (inotify, else every
+    `poll` s) the sheet is re-read and each row fingerprinted from its values and the
+    size and mtime of its inputs, row_inputs(row, file_cols_of(sheet)). process(rows)
+    gets the 0-based rows that are new or changed since their last round, once all
+    their inputs exist and have kept size and mtime for `settle` s, and returns
+    {row: status}. Rows are told apart by key_cols,
+    so inserting or reordering rows does not redo the others. Fingerprints and statuses
+    are kept in <submission_dir>/WATCH_STATE, so a restarted watch resumes.
+    """
+    state_path = os.path.join(submission_dir, WATCH_STATE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as fh:
+            state = json.load(fh)
+    watcher = DirWatcher()
+    watcher.add([table_file])
+    seen = {}  # path → (size, mtime_ns, time first seen with them)
+    reported = None
+    print(f"→ Watching {table_file} and its input folders ({watcher.mode}, inputs settle for {settle:g}s); Ctrl-C to stop")
+
+    def settling(path, now):
+        # seconds until path counts as complete: 0 once settled, None while missing
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_size, st.st_mtime_ns)
+        if seen.get(path, (None, None))[:2] != stamp:
+            seen[path] = (*stamp, min(now, st.st_mtime))  # untouched for `settle` s already: complete
+        return max(0.0, seen[path][2] + settle - now)
+
+    try:
+        while True:
+            now = time.time()
+            timeout = poll
+            left = settling(table_file, now)
+            if left == 0:
+                df = load_table(table_file, case="upper")
+                file_cols = file_cols_of(df)
+                ready, waiting, keys = {}, 0, defaultdict(int)
+                for idx, row in df.iterrows():
+                    key = "\t".join(str(row.get(c)).strip() for c in key_cols)
+                    keys[key] += 1
+                    if keys[key] > 1:
+                        key += f"\t#{keys[key]}"
+                    inputs = row_inputs(row, file_cols)
+                    watcher.add(inputs)
+                    lefts = [settling(p, now) for p in inputs]
+                    if None in lefts or any(lefts):
+                        waiting += 1
+                        timeout = min([timeout] + [l for l in lefts if l])
+                        continue
+                    fp = hashlib.sha256(json.dumps(
+                        [[c, str(row.get(c))] for c in df.columns] + [[p, *seen[p][:2]] for p in inputs]
+                    ).encode()).hexdigest()
+                    if state.get(key, {}).get("fingerprint") != fp:
+                        ready[idx] = (key, fp)
+                if ready:
+                    print(f"→ {len(ready)} new or changed row(s) ready" + (f", {waiting} waiting for inputs" if waiting else ""))
+                    for idx, status in _watch_round(process, sorted(ready)).items():
+                        key, fp = ready[idx]
+                        state[key] = {"fingerprint": fp, "status": status, "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+                    os.makedirs(submission_dir, exist_ok=True)
+                    with open(state_path + ".tmp", "w") as fh:
+                        json.dump(state, fh, indent=1)
+                    os.replace(state_path + ".tmp", state_path)
+                    reported = None
+                elif waiting != reported:
+                    print(f"→ Up to date; {waiting} row(s) waiting for inputs to arrive or settle" if waiting
+                          else "→ Up to date; waiting for new rows")
+                    reported = waiting
+            elif left:
+                timeout = min(timeout, left)
+            watcher.wait(timeout)
+    except KeyboardInterrupt:
+        print("\n→ Watch stopped")
+
+# --- Dry-run planner (--plan) ---
+PLAN_SAMPLE_BYTES = 8 * 1024 * 1024   # bytes read from each measured input
+PLAN_MAX_MEASURED = 16                # inputs measured; the rest reuse the mean of their file type
+WEBIN_CALL_SECONDS = 20               # Webin-CLI start-up + login + submission per manifest
+
+def measure_input(path: str, sample_bytes: int = PLAN_SAMPLE_BYTES) -> dict:
+    """
+    Time gzip, gunzip and MD5 on the first `sample_bytes` of `path`, in memory.
+
+    ratio is compressed/uncompressed size; for an input that is already gzipped the
+    sample is decompressed instead, so ratio and the rates describe its contents.
+    """
+    with open(path, "rb") as fh:
+        data = fh.read(sample_bytes)
+    if not data:
+        return {"ratio": 1.0, "gzip_mb_s": None, "gunzip_mb_s": None, "md5_mb_s": None}
+    t0 = time.perf_counter()
+    hashlib.md5(data).digest()
+    md5_s = time.perf_counter() - t0
+    if data[:2] == b"\x1f\x8b":
+        d = zlib.decompressobj(31)
+        t0 = time.perf_counter()
+        raw = d.decompress(data)
+        gunzip_s = time.perf_counter() - t0
+        comp_len, raw_len, gzip_s = len(data), len(raw), None
+    else:
+        c = zlib.compressobj(6, zlib.DEFLATED, 31)
+        t0 = time.perf_counter()
+        comp = c.compress(data) + c.flush()
+        gzip_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        zlib.decompress(comp, 31)
+        gunzip_s = time.perf_counter() - t0
+        comp_len, raw_len = len(comp), len(data)
+    rate = lambda n, s: n / 1e6 / s if s else None
+    return {
+        "ratio": comp_len / raw_len if raw_len else 1.0,
+        "gzip_mb_s": rate(raw_len, gzip_s),
+        "gunzip_mb_s": rate(raw_len, gunzip_s),
+        "md5_mb_s": rate(len(data), md5_s),
+    }
+
+def _file_kind(path: str) -> str:
+    """
+    File type used to share measurements: extension, plus .gz if compressed (e.g. '.fastq.gz').
+    """
+    low = path.lower()
+    gz = low.endswith(".gz")
+    return os.path.splitext(low[:-3] if gz else low)[1] + (".gz" if gz else "")
+
+def plan_submission(samples: list, upload_mbps: float = 20.0) -> dict:
+    """
+    Predict staging, checksum and upload cost without writing anything.
+
+    `samples` is [(sample_id, [(path, compress), …]), …] where compress says whether
+    staging gzips the file (else it is linked/copied as is).
+    """
+    paths = sorted({p for _, files in samples for p, _ in files})
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        sys.exit(f"File not found: {missing[0]}" + (f" (and {len(missing) - 1} more)" if len(missing) > 1 else ""))
+    sizes = {p: os.path.getsize(p) for p in paths}
+
+    # Measure a spread of inputs; the others reuse the averages of their file type
+    step = max(1, len(paths) // PLAN_MAX_MEASURED)
+    measured = {p: measure_input(p) for p in paths[::step][:PLAN_MAX_MEASURED]}
+    def mean(key, kind=None):
+        vals = [m[key] for p, m in measured.items() if m[key] and (kind is None or _file_kind(p) == kind)]
+        return sum(vals) / len(vals) if vals else (mean(key) if kind else None)
+    def stats(p):
+        if p in measured:
+            return measured[p]
+        kind = _file_kind(p)
+        return {k: mean(k, kind) for k in ("ratio", "gzip_mb_s", "gunzip_mb_s", "md5_mb_s")}
+
+    rows = []
+    stored = set()  # inputs already compressed into the store by an earlier row
+    for sample_id, files in samples:
+        r = {"sample": sample_id, "files": len(files), "input": 0, "staged": 0, "upload": 0,
+             "compress_s": 0.0, "checksum_s": 0.0, "upload_s": 0.0}
+        for p, compress in files:
+            s, size = stats(p), sizes[p]
+            r["input"] += size
+            if compress:
+                out = int(size * (s["ratio"] or 1.0))
+                if p not in stored:  # later rows only hard-link the stored object
+                    stored.add(p)
+                    r["staged"] += out
+                    r["compress_s"] += size / 1e6 / s["gzip_mb_s"] if s["gzip_mb_s"] else 0.0
+            else:
+                out = size  # linked (runs) or copied (analysis) unchanged
+            r["upload"] += out
+            r["checksum_s"] += out / 1e6 / s["md5_mb_s"] if s["md5_mb_s"] else 0.0
+        r["upload_s"] = r["upload"] / 1e6 / upload_mbps if upload_mbps else 0.0
+        r["total_s"] = r["compress_s"] + r["checksum_s"] + r["upload_s"] + WEBIN_CALL_SECONDS
+        rows.append(r)
+
+    totals = {k: sum(r[k] for r in rows) for k in ("files", "input", "staged", "upload",
+                                                    "compress_s", "checksum_s", "upload_s", "total_s")}
+    return {"rows": rows, "totals": totals, "measured": measured, "upload_mbps": upload_mbps,
+            "largest_input": max(sizes.values(), default=0)}
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1000 or unit == "TB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1000
+
+def _fmt_secs(s: float) -> str:
+    s = int(round(s))
+    d, s = divmod(s, 86400)
+    return f"{d}-{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+
+def suggest_slurm(plan: dict, mem_gb: int = 4) -> dict:
+    """
+    Slurm resources for running the whole sheet in one job: 1.5x the predicted time
+    (at least 30 min), memory for the Webin-CLI JVM, scratch for the staged files.
+    """
+    t = max(plan["totals"]["total_s"] * 1.5, 1800)
+    return {"time": _fmt_secs(t), "mem": f"{mem_gb}G", "cpus-per-task": 1,
+            "scratch": _fmt_bytes(plan["totals"]["staged"] * 1.1 + 1e9)}
+
+def print_plan(plan: dict, slurm: dict):
+    print(f"\n--- Plan ({len(plan['rows'])} manifests, upload at {plan['upload_mbps']:g} MB/s) ---")
+    print(f"{'sample':<24}{'files':>6}{'input':>11}{'staged':>11}{'upload':>11}"
+          f"{'gzip':>10}{'md5':>10}{'upload':>10}{'total':>12}")
+    for r in plan["rows"] + [{"sample": "TOTAL", **plan["totals"]}]:
+        print(f"{str(r['sample'])[:23]:<24}{r['files']:>6}{_fmt_bytes(r['input']):>11}{_fmt_bytes(r['staged']):>11}"
+              f"{_fmt_bytes(r['upload']):>11}{r['compress_s']:>9.0f}s{r['checksum_s']:>9.0f}s"
+              f"{r['upload_s']:>9.0f}s{_fmt_secs(r['total_s']):>12}")
+    print(f"\nMeasured {len(plan['measured'])} input(s) on this node:")
+    for p, m in plan["measured"].items():
+        gz = f"{m['gzip_mb_s']:.0f}" if m["gzip_mb_s"] else "-"
+        md5 = f"{m['md5_mb_s']:.0f}" if m["md5_mb_s"] else "-"
+        print(f"  {os.path.basename(p)}: ratio {m['ratio']:.2f}, gzip {gz} MB/s, md5 {md5} MB/s")
+    print(f"\nStaged into submission/: {_fmt_bytes(plan['totals']['staged'])} new data, "
+          f"{_fmt_bytes(plan['totals']['upload'])} to upload (Webin-CLI start-up counted as {WEBIN_CALL_SECONDS}s per manifest)")
+    print("Suggested Slurm resources:")
+    print(f"  #SBATCH --time={slurm['time']}")
+    print(f"  #SBATCH --mem={slurm['mem']}")
+    print(f"  #SBATCH --cpus-per-task={slurm['cpus-per-task']}")
+    print(f"  scratch/quota for submission/: {slurm['scratch']}")
+
+def webin_cmd(jar):
+    """
+    Command prefix that runs Webin-CLI: `java -jar <jar>`, or the current Python
+    for a .py stand-in such as ../mock_ena/fake_webin_cli.py.
+    """
+    if jar.endswith(".py"):
+        return [sys.executable, jar]
+    return ["java", "-jar", jar]
+
+def drop_cached_validation(log_subdir: str, context: str):
+    """
+    Delete stale validate.json files inside logs/<sample_id>/<context>/*/
+
+    Removing these forces Webin-CLI to recalculate MD5s on the next run, without throwing away the whole log directory.
+    """
+    pattern = os.path.join(log_subdir, context, "*", "validate.json")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+            print(f"  Removed cached validation → {path}")
+        except OSError as exc:
+            print(f"  Could not remove {path}: {exc}")
+
+def staged_bytes(samp_dir: str) -> int:
+    """
+    Total size of the data files staged in a sample folder (symlinks followed, manifest excluded).
+    """
+    total = 0
+    for entry in os.scandir(samp_dir):
+        if entry.name != "manifest.txt" and entry.is_file():
+            total += entry.stat().st_size
+    return total
+
+# Written to logs/<sample_id>/ after a successful test submission, for --promote; a live one adds "promoted"
+TEST_RECORD = "test_submission.json"
+
+def sample_fingerprint(mf: str) -> dict:
+    """
+    Cheap identity of a staged sample: hash of manifest.txt plus size, mtime and
+    inode of each data file it lists. No data file is read.
+    """
+    inp = os.path.dirname(mf)
+    with open(mf, "rb") as fh:
+        text = fh.read()
+    files = {}
+    for line in text.decode().splitlines():
+        field, _, name = line.partition("\t")
+        if field in DATA_FIELDS:
+            st = os.stat(os.path.join(inp, name.strip()))
+            files[name.strip()] = [st.st_size, st.st_mtime_ns, st.st_ino]
+    return {"manifest": hashlib.sha256(text).hexdigest(), "files": files}
+
+def promotable(mf: str, logs_dir: str):
+    """
+    (True, record) if the sample passed the test server and is staged exactly as it was
+    then; otherwise (False, reason).
+    """
+    path = os.path.join(logs_dir, os.path.basename(os.path.dirname(mf)), TEST_RECORD)
+    try:
+        with open(path) as fh:
+            record = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return False, "no successful test submission recorded"
+    if "promoted" in record:
+        return False, f"already submitted live ({' '.join(record['promoted'].values()) or 'no accession reported'})"
+    try:
+        fp = sample_fingerprint(mf)
+    except FileNotFoundError as exc:
+        return False, f"staged file missing: {exc.filename}"
+    if fp != record["fingerprint"]:
+        return False, f"staged files changed since the test submission of {record['date']}; submit to test again"
+    return True, record
+
+# Manifest fields whose files Webin-CLI uploads (reads, then genome)
+DATA_FIELDS = {"FASTQ", "BAM", "CRAM", "FASTA", "FLATFILE", "AGP", "CHROMOSOME_LIST", "UNLOCALISED_LIST"}
+_ACCESSION_RE = re.compile(r"The following (\w+) accession was assigned to the submission: (\S+)")
+_UPLOAD_RE = re.compile(r"Uploading file: (\S+)")
+_PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)\s?%")
+
+def new_webin_result() -> dict:
+    return {"returncode": None, "accessions": {}, "errors": [], "uploaded": 0, "progress": None}
+
+# Webin-CLI errors meaning the network or ENA is overloaded, not that the submission is wrong
+_THROTTLE_RE = re.compile(r"timed? ?out|connection (reset|refused|closed)|broken pipe|temporarily unavailable"
+                          r"|service unavailable|too many (requests|connections)|\b(429|502|503|504)\b", re.I)
+
+def webin_throttled(res: dict) -> bool:
+    return res["returncode"] not in (0, None) and any(_THROTTLE_RE.search(e) for e in res["errors"])
+
+def parse_webin_line(result: dict, line: str, n_files: int) -> bool:
+    """
+    Update `result` from one line of Webin-CLI output; True if the upload progress changed.
+    """
+    msg = line.strip()
+    if msg.startswith("ERROR"):
+        result["errors"].append(msg.split(":", 1)[-1].strip())
+    for kind, acc in _ACCESSION_RE.findall(msg):
+        result["accessions"][kind.lower()] = acc
+    progress = result["progress"]
+    if _UPLOAD_RE.search(msg):
+        result["uploaded"] += 1
+        progress = f"{result['uploaded']}/{n_files} files"
+    else:
+        pct = _PERCENT_RE.search(msg)
+        if pct and "upload" in msg.lower():
+            progress = f"{result['uploaded']}/{n_files} files, {pct.group(1)}%"
+    if progress == result["progress"]:
+        return False
+    result["progress"] = progress
+    return True
+
+def run_webin(cmd, safe_cmd, log_path: str, n_files: int, on_progress=None) -> dict:
+    """
+    Run Webin-CLI, streaming its output line by line into `log_path` (appended, one
+    header per call) instead of buffering it. Lines are parsed as they arrive for
+    upload progress, ERROR lines and the assigned accession(s); `on_progress(text)`
+    is called whenever the upload progress changes.
+
+    Returns {"returncode", "accessions": {type: accession}, "errors": [...], "uploaded", "progress"}.
+    """
+    result = new_webin_result()
+    with open(log_path, "a") as log:
+        log.write(f"### {time.strftime('%Y-%m-%d %H:%M:%S')} {' '.join(safe_cmd)}\n")
+        log.flush()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, bufsize=1, errors="replace")
+        for line in proc.stdout:
+            log.write(line)
+            log.flush()
+            if parse_webin_line(result, line, n_files) and on_progress:
+                on_progress(result["progress"])
+        result["returncode"] = proc.wait()
+        log.write(f"### exit code {result['returncode']}\n")
+    return result
+
+WEBIN_BATCH_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "webin_batch", "WebinBatch.java")
+
+class WebinBatch:
+    """
+    One long-lived Webin-CLI process that runs manifests sent on its stdin
+    (../webin_batch/WebinBatch.java on a real jar, `--batch` for a .py stand-in),
+    so JVM start-up is paid once per batch. `alive` is False when this jar cannot
+    be driven that way or the process died; callers then use one process per manifest.
+    """
+    TAIL_POLL = 0.5  # seconds between reads of the running call's log
+
+    def __init__(self, jar):
+        if jar.endswith(".py"):
+            cmd = [sys.executable, jar, "--batch"]
+        else:
+            cmd = ["java", "-cp", jar, os.path.normpath(WEBIN_BATCH_LAUNCHER)]
+        self.alive = False
+        self.warned = False
+        self.proc = None
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         text=True, bufsize=1, errors="replace")
+            first = self.proc.stdout.readline().strip()
+        except OSError as exc:
+            first = str(exc)
+        if first == "@@READY":
+            self.alive = True
+            print(f"→ Webin-CLI batch mode: one JVM for all manifests ({' '.join(cmd)})")
+        else:
+            print(f"→ Webin-CLI batch mode unavailable ({first or 'launcher exited'}); one process per manifest")
+            self.close()
+
+    def run(self, args, safe_cmd, log_path: str, n_files: int, on_progress=None) -> Optional[dict]:
+        """
+        Run one Webin-CLI call in the batch process; its output is appended to `log_path`,
+        which is tailed while the call runs, so ERROR lines, accessions and upload progress
+        (`on_progress(text)`) are picked up as they are written. None if the batch process
+        is gone, or if an argument holds a tab or line break, which the line protocol cannot
+        carry (the caller then runs that call in its own process).
+        """
+        if not self.alive:
+            return None
+        if any(c in arg for arg in [log_path] + args for c in "\t\r\n"):
+            if not self.warned:
+                print("  A Webin-CLI argument (e.g. the password) holds a tab or line break; "
+                      "submitting without the batch process")
+                self.warned = True
+            return None
+        with open(log_path, "a") as log:
+            log.write(f"### {time.strftime('%Y-%m-%d %H:%M:%S')} [batch] {' '.join(safe_cmd)}\n")
+            start = log.tell()
+        result = new_webin_result()
+        partial = ""
+
+        def tail(fh):
+            nonlocal partial
+            lines = (partial + fh.read()).splitlines(keepends=True)
+            partial = lines.pop() if lines and lines[-1] == lines[-1].rstrip("\r\n") else ""
+            for line in lines:
+                if parse_webin_line(result, line, n_files) and on_progress:
+                    on_progress(result["progress"])
+
+        try:
+            self.proc.stdin.write("\t".join([os.path.abspath(log_path)] + args) + "\n")
+            self.proc.stdin.flush()
+            with open(log_path, errors="replace") as fh:
+                fh.seek(start)
+                while True:
+                    # the launcher writes nothing but "@@EXIT <code>" on stdout while a call runs
+                    ready, _, _ = select.select([self.proc.stdout], [], [], self.TAIL_POLL)
+                    tail(fh)
+                    if not ready:
+                        continue
+                    line = self.proc.stdout.readline()
+                    if not line:
+                        raise BrokenPipeError("launcher exited")
+                    if line.startswith("@@EXIT "):
+                        code = int(line.split()[1])
+                        break
+                tail(fh)
+        except (OSError, ValueError) as exc:
+            print(f"  Webin-CLI batch process stopped ({exc}); continuing with one process per manifest")
+            self.close()
+            return None
+        if partial:
+            parse_webin_line(result, partial, n_files)
+        result["returncode"] = code
+        with open(log_path, "a") as log:
+            log.write(f"### exit code {code}\n")
+        return result
+
+    def close(self):
+        self.alive = False
+        if self.proc and self.proc.poll() is None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=30)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+
+def submit_manifest(mf, jar, user, pwd, live, logs_dir, context, batch=None, wait=True, promote=False,
+                    progress=True) -> dict:
+    """
+    Submit one manifest via Webin-CLI (`context` reads or genome) and return run_webin()'s result.
+
+    The full Webin-CLI output goes to <logs_dir>/<sample_id>/webin-cli.log; the
+    console gets one status line per sample. With a live `batch` (WebinBatch) the
+    call runs in its long-lived process instead of a fresh `java -jar`.
+
+    The sample's submission and log folders are locked for the duration (SampleLock);
+    if another job holds them and `wait` is off, nothing runs and the result has "locked".
+
+    A successful submission is recorded in <logs_dir>/<sample_id>/test_submission.json (live: "promoted");
+    the outcome also goes into the submission folder's catalog.
+    With `promote` (live) Webin-CLI's cached validation is kept instead of being dropped.
+    `progress` off suppresses the in-place upload line (parallel submissions).
+    """
+    inp = os.path.dirname(mf)
+    sample_id = os.path.basename(inp)
+    log_subdir = os.path.join(logs_dir, sample_id)
+    os.makedirs(log_subdir, exist_ok=True)
+    held = []
+    for lock in (sample_lock(inp, wait), sample_lock(log_subdir, wait)):
+        if not lock.acquire():
+            for h in held:
+                h.release()
+            print(f"[{sample_id}] {context}: SKIPPED, claimed by another job")
+            return {**new_webin_result(), "locked": True}
+        held.append(lock)
+    try:
+        if not promote:
+            drop_cached_validation(log_subdir, context)
+        fingerprint = sample_fingerprint(mf)
+        args = [
+            "-context", context,
+            "-manifest", mf,
+            "-inputDir", inp,
+            "-outputDir", log_subdir,
+            "-submit",
+            "-username", user,
+            "-password", pwd
+        ]
+        if not live:
+            args.insert(args.index("-submit"), "-test")
+        cmd = webin_cmd(jar) + args
+        #print(f"→ Running: {' '.join(cmd)}")
+
+        # redact user and password in the printed command
+        safe_cmd = [
+            ("******" if c in (user, pwd) else c)       # replace secrets
+            for c in cmd
+        ]
+        log_path = os.path.join(log_subdir, "webin-cli.log")
+        n_files = sum(1 for line in open(mf) if line.split("\t", 1)[0] in DATA_FIELDS)
+        with stage("webin_cli", row=sample_id, bytes_in=staged_bytes(inp)) as rec:
+            # live progress, rewritten in place on a terminal
+            show = (lambda text: print(f"\r[{sample_id}] {context}: uploading {text}", end="", flush=True)) \
+                if progress and sys.stdout.isatty() else None
+            res = batch.run(args, safe_cmd, log_path, n_files, on_progress=show) if batch else None
+            if res is None:
+                res = run_webin(cmd, safe_cmd, log_path, n_files, on_progress=show)
+            if show and res["progress"]:
+                print("\r\033[K", end="")
+            rec["returncode"] = res["returncode"]
+            rec["accessions"] = res["accessions"]
+            rec["child_peak_rss_mb"] = _peak_rss_mb(children=True)
+        if res["returncode"] == 0:
+            accs = " ".join(res["accessions"].values()) or "no accession reported"
+            print(f"[{sample_id}] {context}: OK {accs} ({rec['seconds']:.1f}s) → {log_path}")
+            record_path = os.path.join(log_subdir, TEST_RECORD)
+            try:
+                with open(record_path) as fh:
+                    record = json.load(fh)
+            except (FileNotFoundError, ValueError):
+                record = {}
+            if not live or not record:
+                # a test resubmission refreshes the record but keeps "promoted"
+                record.update({"date": time.strftime("%Y-%m-%d %H:%M:%S"), "fingerprint": fingerprint,
+                               "accessions": {} if live else res["accessions"]})
+            if live:
+                # every live success is recorded, with or without --promote, so it is never promoted again
+                record["promoted"] = res["accessions"]
+            with open(record_path + ".tmp", "w") as fh:
+                json.dump(record, fh, indent=1)
+            os.replace(record_path + ".tmp", record_path)
+        else:
+            first = res["errors"][0] if res["errors"] else "see log"
+            print(
+                  f"[{sample_id}] {context}: FAILED (exit {res['returncode']}, {len(res['errors'])} errors: {first}) → {log_path}")
+        record_status(os.path.dirname(inp), sample_id,
+                      ("live_ok" if live else "test_ok") if res["returncode"] == 0 else "failed", res["accessions"])
+        return res
+    finally:
+        for h in held:
+            h.release()
+
+def submit_manifests(manifests, jar, user, pwd, live, logs_dir, context, batch=False, wait=True, promote=False,
+                     jobs=1, byte_budget=0, limit=None):
+    """
+    Submit manifests largest sample first, `jobs` at a time (one at a time through a
+    WebinBatch JVM) and with at most `byte_budget` staged bytes uploading at once.
+    With `limit` (AdaptiveConcurrency) the number at a time adapts to throughput and
+    throttling instead of `jobs`. Returns submit_manifest()'s results in `manifests` order.
+    """
+    runner = WebinBatch(jar) if batch and len(manifests) > 1 else None
+    jobs = 1 if runner else max(1, jobs)
+    sizes = catalog_sizes(manifests)
+    if runner and limit:
+        limit = AdaptiveConcurrency(1, 1, max_mbps=limit.max_mbps, label=limit.label)
+    try:
+        return run_largest_first(
+            manifests, lambda mf: sizes.get(os.path.abspath(mf)) or staged_bytes(os.path.dirname(mf)),
+            lambda mf: submit_manifest(mf, jar, user, pwd, live, logs_dir, context, batch=runner, wait=wait,
+                                       promote=promote, progress=(limit.hi if limit else jobs) == 1),
+            workers=jobs, byte_budget=byte_budget, label="submit",
+            limit=limit, ok=lambda res: not webin_throttled(res))
+    finally:
+        if runner:
+            runner.close()
+
+def promote_manifests(manifests, jar, user, pwd, logs_dir, context, batch=False, wait=True, jobs=1, byte_budget=0,
+                      limit=None):
+    """
+    Submit to live only the samples whose test submission succeeded and whose staged
+    files are unchanged since, reusing submission/ and Webin-CLI's cached checksums.
+    """
+    ready = []
+    for mf in manifests:
+        ok, why = promotable(mf, logs_dir)
+        if ok:
+            ready.append(mf)
+        else:
+            print(f"[{os.path.basename(os.path.dirname(mf))}] {context}: not promoted, {why}")
+    print(f"→ Promoting {len(ready)} of {len(manifests)} samples to the live server")
+    submit_manifests(ready, jar, user, pwd, True, logs_dir, context, batch=batch, wait=wait, promote=True,
+                     jobs=jobs, byte_budget=byte_budget, limit=limit)
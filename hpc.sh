@@ -14,7 +14,7 @@ set -euo pipefail
 # Usage: sbatch /hpc.sh
 
 ######################################################################
-# Possible objects: "biosamples", "analysis", or "runs"
+# Possible objects: "biosamples", "analysis", "runs", or "pipeline" (all three, in order)
 ena_object="analysis"
 ######################################################################
 
@@ -23,11 +23,13 @@ module purge
 module load Python/3.11.3-GCCcore-12.3.0
 module load Java/21.0.5
 
-# 1) Set / refresh project environment WITHOUT spawning a sub‑shell
+# 1) Set / refresh project environment WITHOUT spawning a sub‑shell.
+#    No pip work if env/ already matches requirements.txt; export ENFLORA_WHEELHOUSE=<dir>
+#    to install offline, and ENFLORA_ENV=<dir> to share one env between jobs/array tasks.
 python set_env.py -s -H
 
 # 2) Activate the environment created by set_env.py
-source env/bin/activate
+source "${ENFLORA_ENV:-env}/bin/activate"
 
 # Helper to run a given ena_object
 run_script() {
@@ -48,9 +50,13 @@ case "$ena_object" in
   runs)
     run_script "runs" "runs.py"
     ;;
+  pipeline)
+    echo "--- Running pipeline.py ---"
+    python pipeline.py
+    ;;
   *)
     echo "Error: Unknown script '$ena_object'."
-    echo "Usage: $0 {biosamples|analysis|runs}"
+    echo "Usage: $0 {biosamples|analysis|runs|pipeline}"
     exit 1
     ;;
 esac
@@ -37,6 +37,10 @@ ASK_CONFIRM_BEFORE_UPLOAD=true
 # pigz threads; gzip fallback is single-threaded
 GZIP_THREADS=2
 
+# Stream raw FASTQ/FASTA gzipped straight into the upload (MD5 taken on the way), so no .gz copy
+# is written next to the input. One lftp session per streamed file; -c resume is not possible for them.
+STREAM_UPLOAD=false
+
 # Directory scan extensions (case-insensitive)
 INCLUDE_EXTS=("fastq" "fq" "fasta" "fa" "gz" "bam" "cram" "sff" "fast5")
 
@@ -89,6 +93,54 @@ write_md5_file() {
   printf '%s\n' "$md5file"
 }
 
+# MD5 of STDIN, 32 lowercase hex chars
+md5_stdin() {
+  if have md5sum; then md5sum | awk '{print $1}' | lower
+  elif have md5; then md5 -q | lower
+  else echo "ERROR: need md5sum (Linux) or md5 (macOS) in PATH" >&2; exit 3
+  fi
+}
+
+is_raw() {
+  case "${1,,}" in *.fastq|*.fq|*.fasta|*.fa) return 0 ;; *) return 1 ;; esac
+}
+
+# lftp settings + login, shared by every session
+lftp_open() {
+  echo "set ftp:ssl-force true"
+  echo "set ftp:ssl-protect-data true"
+  echo "set net:max-retries 2"
+  echo "set net:reconnect-interval-base 5"
+  echo "set net:reconnect-interval-max 60"
+  echo "set cmd:fail-exit yes"
+  if [[ -n "${WEBIN_PASSWORD:-}" ]]; then
+    printf 'open -u %q,%q %s\n' "$WEBIN_USER" "$WEBIN_PASSWORD" "webin2.ebi.ac.uk"
+  else
+    printf 'open -u %q %s\n' "$WEBIN_USER" "webin2.ebi.ac.uk"
+  fi
+  printf 'mkdir -p -f %q\n' "$1"
+  printf 'cd %q\n' "$1"
+}
+
+# Gzip $1 on the fly into <remote_dir>/<name>.gz; the MD5 of the stream goes to $3/<name>.gz.md5.
+# PRINT the .md5 path.
+stream_upload() {
+  local f="$1" remote_dir="$2" tmp="$3"
+  local name; name="$(basename "$f").gz"
+  local fifo="$tmp/md5.fifo" script="$tmp/stream.lftp"
+  { lftp_open "$remote_dir"; printf 'put /dev/stdin -o %q\n' "$name"; echo "bye"; } > "$script"
+  mkfifo "$fifo"
+  md5_stdin < "$fifo" > "$tmp/$name.md5" &
+  local md5_pid=$!
+  echo "[info] Streaming $f -> ${remote_dir%/}/$name" >&2
+  if have pigz; then pigz -c -n -p "${GZIP_THREADS}" < "$f"
+  else gzip -c -n < "$f"
+  fi | tee "$fifo" | lftp -f "$script"
+  wait "$md5_pid"
+  rm -f "$fifo"
+  printf '%s\n' "$tmp/$name.md5"
+}
+
 scan_inputs() {
   declare -a found=()
   if (( ${#INPUTS[@]} == 0 )); then
@@ -133,7 +185,12 @@ main() {
 
   declare -a final_files=()
   declare -a summary_rows=()
+  declare -a streamed=()
   for f in "${to_process[@]}"; do
+    if [[ "$STREAM_UPLOAD" == "true" ]] && is_raw "$f" && [[ ! -f "${f}.gz" ]]; then
+      streamed+=("$f")                    # MD5 known only once sent
+      continue
+    fi
     data="$(compress_if_needed "$f")"     # -> prints ONLY final path
     md5p="$(write_md5_file "$data")"      # -> .md5 path
     final_files+=("$data" "$md5p")
@@ -147,6 +204,7 @@ main() {
   echo "Webin user:     $WEBIN_USER"
   echo "Remote target:  $remote_dir  (on webin2.ebi.ac.uk)"
   echo "Files to send:  ${#final_files[@]} (data + .md5)"
+  echo "Streamed:       ${#streamed[@]} raw file(s), gzipped on the fly"
   echo "Helper TSV ->   $OUT_TSV"
   echo "================================================"
   echo
@@ -156,26 +214,24 @@ main() {
     [[ "${ans,,}" == "y" || "${ans,,}" == "yes" ]] || { echo "Aborted."; exit 0; }
   fi
 
+  # Build lftp script (include the OPEN here; we call lftp -f only)
+  TMP_DIR="$(mktemp -d)"; trap 'rm -rf "$TMP_DIR"' EXIT
+  local LFTP_SCRIPT="$TMP_DIR/upload.lftp"
+
+  # Streamed files first: their .md5 files join the mput below
+  for f in "${streamed[@]}"; do
+    md5p="$(stream_upload "$f" "$remote_dir" "$TMP_DIR")"
+    final_files+=("$md5p")
+    md5=$(tr -d ' \t\r\n' < "$md5p" | lower)
+    summary_rows+=("${remote_dir%/}/$(basename "$f").gz"$'\t'"$md5")
+  done
+
   # Write helper TSV
   : > "$OUT_TSV"
   for row in "${summary_rows[@]}"; do printf "%s\n" "$row" >> "$OUT_TSV"; done
 
-  # Build lftp script (include the OPEN here; we call lftp -f only)
-  local LFTP_SCRIPT; LFTP_SCRIPT="$(mktemp)"; trap 'rm -f "$LFTP_SCRIPT"' EXIT
   {
-    echo "set ftp:ssl-force true"
-    echo "set ftp:ssl-protect-data true"
-    echo "set net:max-retries 2"
-    echo "set net:reconnect-interval-base 5"
-    echo "set net:reconnect-interval-max 60"
-    echo "set cmd:fail-exit yes"
-    if [[ -n "${WEBIN_PASSWORD:-}" ]]; then
-      printf 'open -u %q,%q %s\n' "$WEBIN_USER" "$WEBIN_PASSWORD" "webin2.ebi.ac.uk"
-    else
-      printf 'open -u %q %s\n' "$WEBIN_USER" "webin2.ebi.ac.uk"
-    fi
-    printf 'mkdir -p %q\n' "$remote_dir"
-    printf 'cd %q\n' "$remote_dir"
+    lftp_open "$remote_dir"
     echo "pwd"
     echo -n "mput -c -O ."
     for f in "${final_files[@]}"; do printf ' %q' "$f"; done
@@ -184,7 +240,7 @@ main() {
   } > "$LFTP_SCRIPT"
 
   # IMPORTANT: use -f alone (host is handled by the 'open' inside the script)
-  lftp -f "$LFTP_SCRIPT"
+  (( ${#final_files[@]} )) && lftp -f "$LFTP_SCRIPT"
 
   echo
   echo "[ok] Upload complete to: $remote_dir"
@@ -0,0 +1,225 @@
+# Standard libraries
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import datetime
+import base64
+import xml.etree.ElementTree as ET
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUBMIT_PATH = "/ena/submit/drop-box/submit/"
+
+
+class MockState:
+    """
+    Settings and counters shared by all request threads.
+    """
+    def __init__(self, args):
+        self.latency = args.latency
+        self.jitter = args.jitter
+        self.fail_rate = args.fail_rate
+        self.http_error_rate = args.http_error_rate
+        self.user = args.user
+        self.password = args.password
+        self.reject_duplicates = args.reject_duplicates
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.next_acc = args.first_accession
+        self.aliases = set()
+        self.stats = {"requests": 0, "success": 0, "rejected": 0, "http_errors": 0,
+                      "auth_failures": 0, "samples": 0, "bytes_in": 0}
+
+    def draw(self):
+        with self.lock:
+            return self.rng.random(), self.rng.random()
+
+    def accession_block(self, n):
+        with self.lock:
+            start = self.next_acc
+            self.next_acc += n
+        return range(start, start + n)
+
+    def count(self, **kw):
+        with self.lock:
+            for k, v in kw.items():
+                self.stats[k] += v
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    """
+    Return {form field name: bytes} for a multipart/form-data body (as sent by `curl -F`).
+    """
+    msg = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    fields = {}
+    if msg.is_multipart():
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name:
+                fields[name] = part.get_payload(decode=True) or b""
+    return fields
+
+
+def receipt_xml(success: bool, samples, messages, actions) -> bytes:
+    root = ET.Element("RECEIPT", attrib={
+        "receiptDate": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        "submissionFile": "submission.xml",
+        "success": "true" if success else "false",
+    })
+    for alias, acc in samples:
+        attrib = {"alias": alias, "status": "PRIVATE"}
+        if success:
+            attrib["accession"] = f"ERS{acc:07d}"
+        samp = ET.SubElement(root, "SAMPLE", attrib=attrib)
+        if success:
+            ET.SubElement(samp, "EXT_ID", attrib={"accession": f"SAMEA{acc:07d}", "type": "biosample"})
+    sub_attrib = {"alias": f"SUBMISSION-{int(time.time())}"}
+    if success and samples:
+        sub_attrib["accession"] = f"ERA{samples[0][1]:07d}"
+    ET.SubElement(root, "SUBMISSION", attrib=sub_attrib)
+    msgs = ET.SubElement(root, "MESSAGES")
+    for level, text in messages:
+        ET.SubElement(msgs, level).text = text
+    for action in actions:
+        ET.SubElement(root, "ACTIONS").text = action
+    return b'<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding="utf-8")
+
+
+class DropBoxHandler(BaseHTTPRequestHandler):
+    server_version = "ENAMock/1.0"
+    state: MockState = None
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {fmt % args}\n")
+
+    def _send(self, code, body: bytes, ctype="application/xml"):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.state.lock:
+                body = json.dumps(self.state.stats, indent=2).encode()
+            self._send(200, body, "application/json")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def _authorized(self) -> bool:
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Basic "):
+            return False
+        if self.state.user is None:
+            return True  # any credentials accepted
+        try:
+            user, _, pwd = base64.b64decode(auth[6:]).decode().partition(":")
+        except ValueError:
+            return False
+        return user == self.state.user and (self.state.password is None or pwd == self.state.password)
+
+    def do_POST(self):
+        st = self.state
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        st.count(requests=1, bytes_in=length)
+
+        if self.path.split("?")[0] != SUBMIT_PATH:
+            self._send(404, b"not found", "text/plain")
+            return
+        if not self._authorized():
+            st.count(auth_failures=1)
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", 'Basic realm="ENA"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        roll_http, roll_fail = st.draw()
+        time.sleep(max(0.0, st.latency + st.rng.uniform(-st.jitter, st.jitter)))
+        if roll_http < st.http_error_rate:
+            st.count(http_errors=1)
+            self._send(503, b"Service Temporarily Unavailable", "text/plain")
+            return
+
+        fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+        errors = []
+        aliases = []
+        actions = []
+        if "SAMPLE" not in fields:
+            errors.append("No SAMPLE XML document was found in the submission.")
+        else:
+            try:
+                for samp in ET.fromstring(fields["SAMPLE"]).iter("SAMPLE"):
+                    aliases.append(samp.attrib.get("alias", ""))
+            except ET.ParseError as exc:
+                errors.append(f"Invalid SAMPLE XML: {exc}")
+        if "SUBMISSION" in fields:
+            try:
+                for action in ET.fromstring(fields["SUBMISSION"]).iter("ACTION"):
+                    actions.extend(child.tag for child in action)
+            except ET.ParseError as exc:
+                errors.append(f"Invalid SUBMISSION XML: {exc}")
+        if st.reject_duplicates:
+            with st.lock:
+                dup = [a for a in aliases if a in st.aliases]
+                if not dup:
+                    st.aliases.update(aliases)
+            for a in dup:
+                errors.append(f'In sample, alias: "{a}". The object being added already exists in the submission account.')
+        if not errors and roll_fail < st.fail_rate:
+            errors.append("Simulated failure (--fail_rate).")
+
+        messages = [("INFO", "This submission is a TEST submission and will be discarded within 24 hours")]
+        if errors:
+            st.count(rejected=1)
+            messages = [("ERROR", e) for e in errors] + messages
+            self._send(200, receipt_xml(False, [(a, 0) for a in aliases], messages, actions))
+            return
+        accs = st.accession_block(len(aliases))
+        st.count(success=1, samples=len(aliases))
+        self._send(200, receipt_xml(True, list(zip(aliases, accs)), messages, actions))
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="ena_mock.py → local stand-in for ENA's drop-box submit endpoint")
+    p.add_argument("--host", default="127.0.0.1", help="Bind address (default=127.0.0.1)")
+    p.add_argument("--port", type=int, default=8080, help="Port (default=8080)")
+    p.add_argument("--latency", type=float, default=0.2,
+                   help="Seconds of simulated processing per request (default=0.2)")
+    p.add_argument("--jitter", type=float, default=0.1,
+                   help="Uniform +/- jitter on the latency, seconds (default=0.1)")
+    p.add_argument("--fail_rate", type=float, default=0.0,
+                   help="Fraction of submissions answered with success=\"false\" (default=0)")
+    p.add_argument("--http_error_rate", type=float, default=0.0,
+                   help="Fraction of requests answered with HTTP 503 (default=0)")
+    p.add_argument("--user", help="Only accept this Webin user (default: any Basic auth)")
+    p.add_argument("--password", help="Only accept this password (with --user)")
+    p.add_argument("--reject_duplicates", action="store_true",
+                   help="Reject sample aliases already submitted to this server, like ENA does")
+    p.add_argument("--first_accession", type=int, default=1000000,
+                   help="Number of the first fake accession (default=1000000)")
+    p.add_argument("--seed", type=int, default=0, help="Seed for latency/failure draws")
+    args = p.parse_args()
+
+    DropBoxHandler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), DropBoxHandler)
+    print(f"ENA mock drop-box on http://{args.host}:{args.port}{SUBMIT_PATH}  (stats: /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(DropBoxHandler.state.stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Drop-in stand-in for `java -jar webin-cli.jar`, for offline end-to-end and load testing.
+
+Understands the flags runs.py / analysis.py pass (-context, -manifest, -inputDir,
+-outputDir, -validate/-submit, -test, -username, -password), checks the manifest's
+files, writes validate.json / receipt.xml / webin-cli.report under -outputDir and
+prints Webin-CLI-like INFO/ERROR lines with fake accessions. Nothing leaves the machine.
+
+With --batch it mimics ../webin_batch/WebinBatch.java instead: start-up is paid once,
+then one call per stdin line "<log file>\t<arg>…", answered with "@@EXIT <code>".
+
+Behaviour is tuned through environment variables:
+  FAKE_WEBIN_STARTUP     seconds of simulated JVM start-up        (default 1.0)
+  FAKE_WEBIN_CALL        seconds of per-call overhead (login etc.)  (default 0.1)
+  FAKE_WEBIN_MBPS        simulated upload rate in MB/s, 0 = instant (default 0)
+  FAKE_WEBIN_FAIL_RATE   fraction of submissions failing validation (default 0)
+  FAKE_WEBIN_MAX_UPLOADS uploads beyond this many at once (all fake processes on the
+                         machine) fail with a connection time-out, 0 = no limit (default 0)
+"""
+# Standard libraries
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import hashlib
+import argparse
+import tempfile
+import datetime
+
+FILE_FIELDS = {"FASTQ", "BAM", "CRAM", "FASTA", "FLATFILE", "AGP", "CHROMOSOME_LIST", "UNLOCALISED_LIST"}
+ACCESSION_PREFIXES = {
+    "reads": [("experiment", "ERX"), ("run", "ERR")],
+    "genome": [("analysis", "ERZ")],
+    "transcriptome": [("analysis", "ERZ")],
+    "sequence": [("analysis", "ERZ")],
+}
+
+
+def info(msg):
+    print(f"INFO : {msg}", flush=True)
+
+def error(msg):
+    print(f"ERROR: {msg}", flush=True)
+
+def read_manifest(path: str) -> list:
+    fields = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, _, value = line.replace("\t", " ", 1).partition(" ")
+            fields.append((key.upper(), value.strip()))
+    return fields
+
+def md5sum(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def main(argv=None, startup=True):
+    p = argparse.ArgumentParser(prog="webin-cli", description="Fake Webin-CLI for offline testing")
+    p.add_argument("-context", required=True)
+    p.add_argument("-manifest", required=True)
+    p.add_argument("-inputDir", default=".")
+    p.add_argument("-outputDir", default=".")
+    p.add_argument("-validate", action="store_true")
+    p.add_argument("-submit", action="store_true")
+    p.add_argument("-test", action="store_true")
+    p.add_argument("-username")
+    p.add_argument("-password")
+    p.add_argument("-centerName")
+    args, _unknown = p.parse_known_args(argv)
+
+    if startup:
+        time.sleep(float(os.environ.get("FAKE_WEBIN_STARTUP", "1.0")))
+    time.sleep(float(os.environ.get("FAKE_WEBIN_CALL", "0.1")))
+    info("Your application version is 8.2.0 (fake)")
+    if not (args.validate or args.submit):
+        error("Either -validate or -submit must be given.")
+        return 2
+    if not args.username or not args.password:
+        error("Invalid submission account user name or password.")
+        return 2
+    if not os.path.isfile(args.manifest):
+        error(f"Manifest file not found: {args.manifest}")
+        return 2
+
+    fields = read_manifest(args.manifest)
+    values = dict(fields)
+    name = values.get("NAME") or values.get("ASSEMBLYNAME") or os.path.basename(os.path.dirname(args.manifest))
+    out_dir = os.path.join(args.outputDir, args.context, name)
+    os.makedirs(out_dir, exist_ok=True)
+    report = os.path.join(args.outputDir, "webin-cli.report")
+
+    # Validation: required fields, files present, MD5s (cached in validate.json like the real tool)
+    problems = [f"Missing manifest field: {k}" for k in ("STUDY", "SAMPLE") if k not in values]
+    files = [(k, os.path.join(args.inputDir, v)) for k, v in fields if k in FILE_FIELDS]
+    if not files:
+        problems.append("No data files in manifest.")
+    cache_path = os.path.join(out_dir, "validate.json")
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as fh:
+            cache = json.load(fh)
+    checked = {}
+    for field, path in files:
+        if not os.path.isfile(path):
+            problems.append(f"{field} file not found: {path}")
+            continue
+        st = os.stat(path)
+        key = f"{st.st_size}:{st.st_mtime_ns}"
+        prev = cache.get(path)
+        checked[path] = {"stamp": key, "md5": prev["md5"] if prev and prev["stamp"] == key else md5sum(path),
+                         "size": st.st_size}
+    rng = random.Random(zlib.crc32(f"{args.manifest}{time.time()}".encode()))
+    if not problems and rng.random() < float(os.environ.get("FAKE_WEBIN_FAIL_RATE", "0")):
+        problems.append("Simulated validation failure (FAKE_WEBIN_FAIL_RATE).")
+    with open(cache_path, "w") as fh:
+        json.dump(checked, fh, indent=1)
+
+    if problems:
+        for msg in problems:
+            error(msg)
+        with open(report, "a") as fh:
+            fh.write("\n".join(f"ERROR: {m}" for m in problems) + "\n")
+        error(f"The submission has failed validation. Please check the report file: {report}")
+        return 3
+    info("The submission has been validated successfully.")
+    if not args.submit:
+        return 0
+
+    # "Upload" at the configured rate; one marker file per running upload counts them
+    mbps = float(os.environ.get("FAKE_WEBIN_MBPS", "0"))
+    slots = int(os.environ.get("FAKE_WEBIN_MAX_UPLOADS", "0"))
+    marker = None
+    if slots:
+        uploads = os.path.join(tempfile.gettempdir(), "fake_webin_uploads")
+        os.makedirs(uploads, exist_ok=True)
+        marker = os.path.join(uploads, f"{os.getpid()}_{time.time_ns()}")
+        open(marker, "w").close()
+    try:
+        if marker and len(os.listdir(os.path.dirname(marker))) > slots:
+            error("Failed to upload files: Connection timed out (too many parallel uploads)")
+            return 4
+        for _, path in files:
+            info(f"Uploading file: {path}")
+            if mbps > 0:
+                time.sleep(checked[path]["size"] / 1e6 / mbps)
+    finally:
+        if marker:
+            os.remove(marker)
+    info("Files have been uploaded to webin2.ebi.ac.uk (fake).")
+
+    seed = zlib.crc32(f"{args.context}|{values.get('SAMPLE')}|{name}|{args.test}".encode())
+    accessions = [(kind, f"{prefix}{seed % 10_000_000:07d}")
+                  for kind, prefix in ACCESSION_PREFIXES.get(args.context, [("analysis", "ERZ")])]
+    submit_dir = os.path.join(out_dir, "submit")
+    os.makedirs(submit_dir, exist_ok=True)
+    with open(os.path.join(submit_dir, "receipt.xml"), "w") as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fh.write(f'<RECEIPT receiptDate="{datetime.datetime.now().isoformat()}" success="true">\n')
+        for kind, acc in accessions:
+            fh.write(f'  <{kind.upper()} accession="{acc}" alias="webin-{args.context}-{name}" status="PRIVATE"/>\n')
+        fh.write("</RECEIPT>\n")
+    msg = "The submission has been completed successfully. " + " ".join(
+        f"The following {kind} accession was assigned to the submission: {acc}" for kind, acc in accessions)
+    info(msg)
+    with open(report, "a") as fh:
+        fh.write(f"INFO : {msg}\n")
+    if args.test:
+        info("This was a TEST submission(s).")
+    return 0
+
+
+def batch():
+    """
+    Same line protocol as WebinBatch.java: @@READY, then one call per stdin line.
+    """
+    ctl = sys.stdout
+    time.sleep(float(os.environ.get("FAKE_WEBIN_STARTUP", "1.0")))
+    print("@@READY", file=ctl, flush=True)
+    for line in sys.stdin:
+        parts = line.rstrip("\n").split("\t")
+        if not parts[0]:
+            continue
+        with open(parts[0], "a") as log:
+            sys.stdout = log
+            try:
+                code = main(parts[1:], startup=False)
+            except SystemExit as exc:  # argparse errors
+                code = exc.code if isinstance(exc.code, int) else 2
+            finally:
+                sys.stdout = ctl
+        print(f"@@EXIT {code}", file=ctl, flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(batch() if sys.argv[1:2] == ["--batch"] else main())
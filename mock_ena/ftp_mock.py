@@ -0,0 +1,242 @@
+"""
+Local stand-in for ENA's Webin upload area (webin2.ebi.ac.uk), for testing uploads offline.
+
+Speaks enough FTP for Python's ftplib and lftp: USER/PASS, explicit TLS (AUTH TLS,
+PBSZ, PROT P) when given a certificate, PASV/EPSV, TYPE, PWD, CWD, MKD, STOR,
+SIZE, NOOP, QUIT. Uploads land under --root; --mbps and --max_uploads simulate a
+slow or busy server. Only the Python standard library is needed.
+"""
+# Standard libraries
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+
+_STATE = {"uploads": 0, "files": 0, "bytes": 0, "refused": 0, "lock": threading.Lock()}
+
+
+class FtpHandler(socketserver.StreamRequestHandler):
+    args = None
+    tls = None  # ssl.SSLContext, with --certfile
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+        self.wfile.flush()
+
+    def setup(self):
+        super().setup()
+        self.cwd = "/"
+        self.user = None
+        self.logged_in = False
+        self.protect = False
+        self.pasv = None
+
+    def local(self, name: str) -> tuple:
+        # Path under --root; '..' cannot climb out of it
+        virt = os.path.normpath(os.path.join(self.cwd, name)) if not name.startswith("/") else os.path.normpath(name)
+        return os.path.join(self.args.root, virt.lstrip("/")), virt
+
+    def handle(self):
+        self.reply("220 ENA FTP mock ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            cmd, _, arg = raw.decode(errors="replace").strip().partition(" ")
+            cmd = cmd.upper()
+            if cmd == "QUIT":
+                self.reply("221 Goodbye")
+                return
+            handler = getattr(self, f"do_{cmd}", None)
+            if handler is None:
+                self.reply(f"502 {cmd} not implemented")
+            elif not self.logged_in and cmd not in ("USER", "PASS", "AUTH", "PBSZ", "PROT", "FEAT", "SYST", "OPTS"):
+                self.reply("530 Please login with USER and PASS")
+            else:
+                handler(arg)
+
+    # --- session ---
+    def do_AUTH(self, arg):
+        if self.tls is None or arg.upper() not in ("TLS", "SSL"):
+            self.reply("502 TLS not configured (start with --certfile)")
+            return
+        self.reply("234 Proceed with negotiation")
+        self.request = self.tls.wrap_socket(self.request, server_side=True)
+        self.rfile = self.request.makefile("rb")
+        self.wfile = self.request.makefile("wb")
+
+    def do_PBSZ(self, arg):
+        self.reply("200 PBSZ=0")
+
+    def do_PROT(self, arg):
+        self.protect = arg.upper() == "P"
+        self.reply(f"200 Protection level set to {arg.upper()}")
+
+    def do_USER(self, arg):
+        self.user = arg
+        self.reply("331 Password required")
+
+    def do_PASS(self, arg):
+        if self.args.user and (self.user != self.args.user or (self.args.password and arg != self.args.password)):
+            self.reply("530 Login incorrect")
+            return
+        self.logged_in = True
+        self.reply("230 Login successful")
+
+    def do_FEAT(self, arg):
+        self.reply("211-Features:\r\n AUTH TLS\r\n PBSZ\r\n PROT\r\n EPSV\r\n SIZE\r\n211 End")
+
+    def do_SYST(self, arg):
+        self.reply("215 UNIX Type: L8")
+
+    def do_OPTS(self, arg):
+        self.reply("200 OK")
+
+    def do_NOOP(self, arg):
+        self.reply("200 OK")
+
+    def do_TYPE(self, arg):
+        self.reply(f"200 Type set to {arg}")
+
+    # --- folders ---
+    def do_PWD(self, arg):
+        self.reply(f'257 "{self.cwd}" is the current directory')
+
+    def do_CWD(self, arg):
+        path, virt = self.local(arg)
+        if not os.path.isdir(path):
+            self.reply(f"550 {arg}: No such directory")
+            return
+        self.cwd = virt
+        self.reply("250 Directory changed")
+
+    def do_MKD(self, arg):
+        path, virt = self.local(arg)
+        try:
+            os.makedirs(path)
+        except FileExistsError:
+            self.reply(f"550 {arg}: File exists")
+            return
+        self.reply(f'257 "{virt}" created')
+
+    def do_SIZE(self, arg):
+        path, _ = self.local(arg)
+        if not os.path.isfile(path):
+            self.reply(f"550 {arg}: No such file")
+            return
+        self.reply(f"213 {os.path.getsize(path)}")
+
+    # --- data connections ---
+    def _listen(self):
+        if self.pasv:
+            self.pasv.close()
+        self.pasv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.pasv.bind((self.server.server_address[0], 0))
+        self.pasv.listen(1)
+        self.pasv.settimeout(30)
+        return self.pasv.getsockname()
+
+    def do_PASV(self, arg):
+        host, port = self._listen()
+        self.reply(f"227 Entering Passive Mode ({host.replace('.', ',')},{port >> 8},{port & 255})")
+
+    def do_EPSV(self, arg):
+        _, port = self._listen()
+        self.reply(f"229 Entering Extended Passive Mode (|||{port}|)")
+
+    def do_STOR(self, arg):
+        if self.pasv is None:
+            self.reply("425 Use PASV first")
+            return
+        path, _ = self.local(arg)
+        with _STATE["lock"]:
+            busy = self.args.max_uploads and _STATE["uploads"] >= self.args.max_uploads
+            if busy:
+                _STATE["refused"] += 1
+            else:
+                _STATE["uploads"] += 1
+        if busy:
+            self.pasv.close()
+            self.pasv = None
+            self.reply("421 Too many connections, try again later")
+            return
+        try:
+            self.reply("150 Ok to send data")
+            conn, _ = self.pasv.accept()
+            if self.protect:
+                conn = self.tls.wrap_socket(conn, server_side=True)
+            received, start = 0, time.time()
+            with open(path + ".part", "wb") as out:
+                while True:
+                    data = conn.recv(256 * 1024)
+                    if not data:
+                        break
+                    out.write(data)
+                    received += len(data)
+                    if self.args.mbps:  # hold the sender back to the simulated rate
+                        time.sleep(max(0.0, received / 1e6 / self.args.mbps - (time.time() - start)))
+            if self.protect:
+                try:
+                    conn.unwrap()
+                except OSError:
+                    pass
+            conn.close()
+            os.replace(path + ".part", path)
+            with _STATE["lock"]:
+                _STATE["files"] += 1
+                _STATE["bytes"] += received
+            self.reply("226 Transfer complete")
+        except OSError as exc:
+            self.reply(f"426 Transfer aborted: {exc}")
+        finally:
+            with _STATE["lock"]:
+                _STATE["uploads"] -= 1
+            self.pasv.close()
+            self.pasv = None
+
+
+class FtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="ftp_mock.py → local stand-in for ENA's Webin FTP(S) upload area")
+    p.add_argument("--host", default="127.0.0.1", help="Bind address (default=127.0.0.1)")
+    p.add_argument("--port", type=int, default=2121, help="Port (default=2121)")
+    p.add_argument("--root", default="ftp_root", help="Folder uploads are written to (default=ftp_root/)")
+    p.add_argument("--certfile", help="PEM certificate (and key) enabling explicit TLS (AUTH TLS)")
+    p.add_argument("--keyfile", help="PEM key, if not in --certfile")
+    p.add_argument("--mbps", type=float, default=0.0, help="Simulated upload rate per transfer, MB/s (default=0, unlimited)")
+    p.add_argument("--max_uploads", type=int, default=0,
+                   help="Refuse uploads beyond this many at once with 421, 0 = no limit (default=0)")
+    p.add_argument("--user", help="Only accept this user (default: any)")
+    p.add_argument("--password", help="Only accept this password (with --user)")
+    args = p.parse_args()
+
+    os.makedirs(args.root, exist_ok=True)
+    FtpHandler.args = args
+    if args.certfile:
+        import ssl
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(args.certfile, args.keyfile)
+        FtpHandler.tls = ctx
+    server = FtpServer((args.host, args.port), FtpHandler)
+    print(f"ENA FTP mock on {args.host}:{args.port} ({'explicit TLS' if args.certfile else 'plain FTP'}) → {args.root}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps({k: v for k, v in _STATE.items() if k != "lock"}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+# Standard libraries
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+
+# Code shared by the three scripts (enflora.py, next to this file)
+import enflora
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OBJECTS = ("biosamples", "runs", "analysis")
+CONTEXTS = {"runs": "reads", "analysis": "genome"}
+
+
+def load_script(obj: str):
+    """
+    Import <obj>/<obj>.py as a module, so its functions run in this process.
+    """
+    path = os.path.join(ROOT, obj, f"{obj}.py")
+    spec = importlib.util.spec_from_file_location(f"enflora_{obj}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+@contextmanager
+def in_dir(path: str):
+    """
+    Run the block from inside an ENA object folder: config paths are relative to it.
+    """
+    prev = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(prev)
+
+def task_key(path: str) -> str:
+    """
+    Manifest path as stored in the state file: relative to the project root when inside it.
+    """
+    rel = os.path.relpath(path, ROOT)
+    return path if rel.startswith("..") else rel
+
+def resolve(path, base: str):
+    """
+    Absolute version of a config/CLI path given relative to an ENA object folder.
+    """
+    if not path:
+        return path
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base, str(path)))
+
+
+# --- Resume state -----------------------------------------------------------
+
+class PipelineState:
+    """
+    Progress of one pipeline run, saved to logs/pipeline_state.json after every step.
+
+    biosamples: {alias: accession}
+    converted: {runs|analysis: {"stamp": table + sample map fingerprint, "manifests": [...]}}
+    runs / analysis: {manifest path: {"status": done|failed|blocked, "accessions": {...}}}
+    """
+    def __init__(self, path: str, live: bool, restart: bool = False):
+        self.path = path
+        self.lock = threading.Lock()
+        data = {}
+        if not restart and os.path.exists(path):
+            with open(path) as fh:
+                data = json.load(fh)
+        if data.get("live") != bool(live):
+            data = {}  # test accessions are meaningless for a live submission and vice versa
+        self.data = {"live": bool(live), "biosamples": {}, "converted": {}, "runs": {}, "analysis": {}, **data}
+
+    def done(self, obj: str, key: str) -> bool:
+        return self.data[obj].get(key, {}).get("status") == "done"
+
+    def record(self, obj: str, key: str, status: str, accessions=None):
+        with self.lock:
+            self.data[obj][key] = {"status": status, "accessions": accessions or {}}
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.data, fh, indent=1)
+        os.replace(tmp, self.path)
+
+
+def read_accession_file(path: str, live: bool) -> dict:
+    """
+    {alias: accession} from biosamples' biosample_accessions.txt, keeping only
+    test ("(test)" suffix) or only live entries.
+    """
+    accs = {}
+    if not os.path.exists(path):
+        return accs
+    with open(path) as fh:
+        next(fh, None)  # header
+        for line in fh:
+            acc, _, alias = line.rstrip("\n").partition("\t")
+            is_test = alias.endswith(" (test)")
+            if acc and acc != "None" and is_test != bool(live):
+                accs[alias[:-len(" (test)")] if is_test else alias] = acc
+    return accs
+
+def read_manifest(path: str) -> dict:
+    fields = {}
+    with open(path) as fh:
+        for line in fh:
+            key, _, value = line.rstrip("\n").partition("\t")
+            if key:
+                fields.setdefault(key, value)
+    return fields
+
+def receipt_accessions(receipt: str) -> dict:
+    """
+    {object type: accession} from a Webin-CLI receipt.xml, e.g. {"run": "ERR…", "experiment": "ERX…"}.
+    """
+    if not os.path.exists(receipt):
+        return {}
+    try:
+        root = ET.parse(receipt).getroot()
+    except ET.ParseError:
+        return {}
+    return {el.tag.lower(): el.attrib["accession"] for el in root if el.attrib.get("accession")}
+
+def convert_stamp(table: str, sample_map: dict) -> str:
+    """
+    Fingerprint of a conversion's inputs: the table's size and mtime plus the biosample accessions used.
+    """
+    st = os.stat(table)
+    blob = json.dumps([st.st_size, st.st_mtime_ns, sorted(sample_map.items())])
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+def set_run_ref(mf: str, run_ref: str):
+    """
+    Rewrite the RUN_REF line of an analysis manifest with resolved run accessions.
+    """
+    with open(mf) as fh:
+        lines = fh.readlines()
+    with open(mf, "w") as fh:
+        for line in lines:
+            fh.write(f"RUN_REF\t{run_ref}\n" if line.startswith("RUN_REF\t") else line)
+
+
+# --- Stages -----------------------------------------------------------------
+
+def run_biosamples(bios, table: str, submit: bool, user, pwd, endpoint: str, state: PipelineState, live: bool,
+                   checklist, chunk_size: int = 0, limit=None) -> dict:
+    """
+    Build biosamples.xml from the aliases without an accession yet and submit it.
+    With `chunk_size` it is posted in chunks, in parallel under `limit`.
+    Returns {alias: accession} for all known biosamples.
+    """
+    folder = os.path.join(ROOT, "biosamples")
+    known = read_accession_file(os.path.join(folder, "biosample_accessions.txt"), live)
+    known.update(state.data["biosamples"])
+    alias_col = checklist.sample["alias"]
+    with in_dir(folder):
+        df = enflora.load_table(table, case="lower")
+        aliases = [str(row[alias_col]) for _, row in df.iterrows()]
+        pending = [a for a in aliases if a not in known]
+        if not pending:
+            print(f"→ biosamples: all {len(aliases)} already accessioned, skipping")
+            return known
+        if len(pending) < len(aliases):
+            print(f"→ biosamples: {len(aliases) - len(pending)} already accessioned, submitting the other {len(pending)}")
+        with enflora.stage("build_xml") as rec:
+            bios.excel_to_xml(table, checklist=checklist, skip_aliases=set(known))
+            rec["bytes_out"] = os.path.getsize("biosamples.xml")
+        if not submit:
+            return known
+        bios.create_submission_xml()
+        logs = bios.prepare_logs_dir(os.path.join(folder, "logs"))
+        print(f"Using endpoint: {endpoint}")
+        records = bios.submit_data(user, pwd, logs, endpoint, chunk_size=chunk_size, limit=limit)
+    new = {alias: acc for acc, alias in records if acc}
+    if not new:
+        print("→ biosamples: submission returned no accessions; dependent reads/analyses are blocked")
+    with state.lock:
+        state.data["biosamples"].update(new)
+        state.save()
+    known.update(new)
+    return known
+
+def submit_graph(tasks: list, jobs: int, state: PipelineState, aliases: set, submit_one,
+                 byte_budget: int = 0, report=None, limit=None):
+    """
+    Submit manifests concurrently once their dependencies are done, largest first.
+
+    Each task is {"obj", "key", "mf", "fields", "deps": [task keys], "bytes"}. A task is
+    blocked if its SAMPLE is still an unaccessioned biosample alias or a dependency failed.
+    With `byte_budget`, a task only starts while the staged bytes uploading stay within it
+    (a task larger than the budget runs alone). `report(done, sizes, jobs, elapsed, byte_budget)`
+    gets [(bytes, seconds), …] of the submitted tasks, for the makespan summary.
+    With `limit` (enflora.AdaptiveConcurrency) the number of tasks at a time follows limit.limit
+    instead of `jobs`, starts are paced under its bandwidth cap and a task that submit_one
+    marked t["throttled"] counts against it.
+    """
+    by_key = {t["key"]: t for t in tasks}
+    status = {t["key"]: "done" for t in tasks if state.done(t["obj"], t["key"])}
+    for key in status:
+        print(f"→ {by_key[key]['obj']}: {key} already submitted, skipping")
+    order = sorted(tasks, key=lambda t: t.get("bytes", 0), reverse=True)
+    running, started, done, inflight = {}, {}, [], 0
+    start = time.time()
+
+    def run(t, delay):
+        time.sleep(delay)
+        started[t["key"]] = time.time()
+        return submit_one(t)
+
+    with ThreadPoolExecutor(max_workers=limit.hi if limit else jobs) as pool:
+        while True:
+            for t in order:
+                key = t["key"]
+                if key in status or key in running.values():
+                    continue
+                if t["fields"].get("SAMPLE") in aliases:
+                    status[key] = "blocked"
+                elif any(status.get(d) in ("failed", "blocked", "locked") for d in t["deps"]):
+                    status[key] = "blocked"
+                elif all(status.get(d) == "done" for d in t["deps"]):
+                    if len(running) >= (limit.limit if limit else jobs) \
+                            or (byte_budget and running and inflight + t.get("bytes", 0) > byte_budget):
+                        continue
+                    inflight += t.get("bytes", 0)
+                    running[pool.submit(run, t, limit.reserve(t.get("bytes", 0)) if limit else 0.0)] = key
+                    continue
+                else:
+                    continue
+                print(f"→ {t['obj']}: {key} blocked (biosample or run not accessioned)")
+                state.record(t["obj"], key, "blocked")
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                key = running.pop(fut)
+                inflight -= by_key[key].get("bytes", 0)
+                try:
+                    status[key] = fut.result()
+                except (Exception, SystemExit) as exc:  # one broken sample (sys.exit included) must not stop the others
+                    t = by_key[key]
+                    print(f"→ {t['obj']}: {key} FAILED ({type(exc).__name__}: {exc})")
+                    state.record(t["obj"], key, "failed")
+                    status[key] = "failed"
+                done.append((by_key[key].get("bytes", 0), time.time() - started[key]))
+                if limit:
+                    limit.observe(done[-1][0], done[-1][1], not by_key[key].get("throttled"))
+    if report and done:
+        report(done, [t.get("bytes", 0) for t in tasks if t["key"] in started], limit.limit if limit else jobs,
+               time.time() - start, byte_budget)
+    return status
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="pipeline.py → biosamples, then reads and analyses, in one process with resume")
+
+    p.add_argument(
+        "--config", default=os.path.join(ROOT, "config.yaml"),
+        help="Path to YAML config file (default: config.yaml next to this script)")
+
+    p.add_argument(
+        "--stages", default=",".join(OBJECTS),
+        help="Comma-separated ENA objects to run (default=biosamples,runs,analysis)")
+
+    p.add_argument(
+        "-s", "--submit", action="store_true",
+        help="Submit, not only convert (default: submit: from config)")
+
+    p.add_argument(
+        "--live", action="store_true",
+        help="Use real submission (omit -test). Default=test")
+
+    p.add_argument(
+        "--jobs", type=int, default=4,
+        help="Webin-CLI submissions running at the same time (default=4)")
+
+    p.add_argument(
+        "--restart", action="store_true",
+        help="Ignore logs/pipeline_state.json and start from scratch")
+
+    args = p.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in OBJECTS]
+    if unknown:
+        sys.exit(f"Unknown stage(s): {', '.join(unknown)}; choose from {', '.join(OBJECTS)}")
+
+    mods = {obj: load_script(obj) for obj in OBJECTS}
+    cfg = enflora.load_config(args.config)
+    dirs = {obj: os.path.join(ROOT, obj) for obj in OBJECTS}
+
+    # Same keys and precedence as the individual scripts; paths are relative to each object folder
+    # 1. Submit
+    submit = cfg.get("submit")
+    if not submit:
+        submit = args.submit
+    # 2. live flag
+    live = bool(cfg.get("live") or args.live)
+    # 3. Credentials and JAR
+    cred_path = resolve(cfg.get("credentials") or "credentials.txt", dirs["runs"])
+    jar_path = resolve(cfg.get("jar"), dirs["runs"])
+    # 4. Concurrent submissions, and the cap on bytes being compressed or uploaded at once
+    jobs = int(cfg.get("jobs") or args.jobs)
+    byte_budget = int(float(cfg.get("max_inflight_gb") or 0) * 1e9)
+    # Adaptive concurrency between min_jobs and max_jobs, and a cap on the total upload rate
+    max_jobs = int(cfg.get("max_jobs") or 0)
+    max_mbps = float(cfg.get("max_mbps") or 0)
+    limit = None
+    if max_jobs or max_mbps:
+        limit = enflora.AdaptiveConcurrency(lo=int(cfg.get("min_jobs") or 1) if max_jobs else jobs,
+                                            hi=max_jobs or jobs, start=jobs, max_mbps=max_mbps, label="submit")
+    # 5. Biosamples endpoint
+    bios = mods["biosamples"]
+    endpoint = cfg.get("endpoint") or (bios.LIVE_ENDPOINT if live else bios.TEST_ENDPOINT)
+    # 6. Samples locked by another job: wait (default) or skip
+    wait_locked = (cfg.get("on_locked") or "wait") != "skip"
+    # 7. parsed Excel cache directory (one for all three objects), metrics
+    if cfg.get("table_cache") is False:
+        enflora.TABLE_CACHE_DIR = None
+    elif cfg.get("table_cache"):
+        enflora.TABLE_CACHE_DIR = resolve(cfg.get("table_cache"), ROOT)
+    enflora.init_metrics(os.path.join(ROOT, "logs"), "pipeline")
+
+    state = PipelineState(os.path.join(ROOT, "logs", "pipeline_state.json"), live, args.restart)
+    user = pwd = None
+    if submit:
+        user, pwd = mods["runs"].load_credentials(cred_path)
+
+    # Biosamples first: everything else needs their accessions
+    sample_map = read_accession_file(os.path.join(dirs["biosamples"], "biosample_accessions.txt"), live)
+    sample_map.update(state.data["biosamples"])
+    aliases = set()
+    if "biosamples" in stages and cfg.get("data_biosamples"):
+        with in_dir(dirs["biosamples"]):  # checklist paths are relative to biosamples/, like the table
+            checklist = bios.load_checklist(cfg.get("checklist"))
+        sample_map = run_biosamples(bios, cfg["data_biosamples"], submit, user, pwd, endpoint, state, live,
+                                    checklist, chunk_size=int(cfg.get("biosample_chunk") or 0),
+                                    limit=enflora.AdaptiveConcurrency(lo=limit.lo if limit else jobs,
+                                                                      hi=limit.hi if limit else jobs, start=jobs,
+                                                                      max_mbps=max_mbps, label="biosamples"))
+        alias_col = checklist.sample["alias"]
+        with in_dir(dirs["biosamples"]):
+            df = enflora.load_table(cfg["data_biosamples"], case="lower")
+            aliases = {str(row[alias_col]) for _, row in df.iterrows()} - set(sample_map)
+
+    # Convert reads and analyses (aliases already swapped for accessions)
+    manifests = {}
+    for obj in ("runs", "analysis"):
+        table = cfg.get(f"data_{obj}")
+        if obj not in stages or not table:
+            continue
+        mod = mods[obj]
+        sub_dir = cfg.get(f"sub_dir_{obj}") or "submission"
+        with in_dir(dirs[obj]):
+            stamp = convert_stamp(table, sample_map)
+            prev = state.data["converted"].get(obj, {})
+            if prev.get("stamp") == stamp and all(os.path.exists(mf) for mf in prev["manifests"]):
+                print(f"→ {obj}: table unchanged since last conversion, reusing {len(prev['manifests'])} manifests")
+                manifests[obj] = prev["manifests"]
+                continue
+            if obj == "runs":
+                integrity = cfg.get("integrity")
+                if integrity and integrity not in ("quick", "full"):
+                    sys.exit(f"integrity must be 'quick' or 'full', not '{integrity}'")
+                found = mod.convert_manifests(table, sub_dir, integrity=integrity,
+                                              threads=int(cfg.get("threads") or 4), sample_map=sample_map,
+                                              wait=wait_locked, byte_budget=byte_budget,
+                                              stream=bool(cfg.get("stream_table")))
+            else:
+                found = mod.convert_manifests(
+                    table,
+                    submission_dir=sub_dir,
+                    default_level=cfg.get("assembly_level") or "chromosome",
+                    default_mingaplength=cfg.get("mingaplength"),
+                    default_chr_rule=cfg.get("chr_rule"),
+                    generate_agp=bool(cfg.get("generate_agp")),
+                    sample_map=sample_map,
+                    wait=wait_locked,
+                    lint=cfg.get("lint", True) is not False,
+                    threads=int(cfg.get("threads") or 4),
+                    byte_budget=byte_budget,
+                )
+        manifests[obj] = [os.path.abspath(os.path.join(dirs[obj], mf)) for mf in found]
+        with state.lock:
+            state.data["converted"][obj] = {"stamp": stamp, "manifests": manifests[obj]}
+            state.save()
+
+    if not submit or not manifests:
+        return
+
+    # Dependency graph: a read submission needs its biosample; an analysis also
+    # needs every run it names in RUN_REF (by run NAME) from this batch
+    jar = mods["runs"].find_jar(jar_path)
+    tasks, run_keys = [], {}
+    for obj, mfs in manifests.items():
+        for mf in mfs:
+            key = task_key(mf)
+            fields = read_manifest(mf)
+            task = {"obj": obj, "key": key, "mf": mf, "fields": fields, "deps": [],
+                    "bytes": enflora.staged_bytes(os.path.dirname(mf))}
+            if obj == "runs":
+                run_keys[fields.get("NAME")] = key
+            tasks.append(task)
+    for t in tasks:
+        if t["obj"] == "analysis":
+            refs = [r.strip() for r in t["fields"].get("RUN_REF", "").split(",")]
+            t["deps"] = [run_keys[r] for r in refs if r in run_keys]
+
+    def submit_one(t):
+        obj = t["obj"]
+        if t["deps"]:
+            refs = [r.strip() for r in t["fields"]["RUN_REF"].split(",")]
+            runs_done = {name: state.data["runs"][key]["accessions"].get("run", name)
+                         for name, key in run_keys.items() if key in t["deps"]}
+            set_run_ref(t["mf"], ",".join(runs_done.get(r, r) for r in refs))
+        logs = os.path.join(dirs[obj], "logs")
+        os.makedirs(logs, exist_ok=True)
+        res = enflora.submit_manifest(t["mf"], jar, user, pwd, live, logs, CONTEXTS[obj], wait=wait_locked,
+                                      progress=(limit.hi if limit else jobs) == 1)
+        t["throttled"] = enflora.webin_throttled(res)
+        if res.get("locked"):
+            return "locked"  # another job has it; not recorded, so a rerun picks it up
+        if res["returncode"] != 0:
+            state.record(obj, t["key"], "failed")
+            return "failed"
+        # Accessions parsed from Webin-CLI's output, else from its receipt.xml
+        accessions = res["accessions"]
+        if not accessions:
+            name = t["fields"].get("NAME") or t["fields"].get("ASSEMBLYNAME")
+            sample_id = os.path.basename(os.path.dirname(t["mf"]))
+            accessions = receipt_accessions(
+                os.path.join(logs, sample_id, CONTEXTS[obj], str(name), "submit", "receipt.xml"))
+        state.record(obj, t["key"], "done", accessions)
+        return "done"
+
+    status = submit_graph(tasks, max(1, jobs), state, aliases, submit_one, byte_budget,
+                          report=lambda *a: enflora.makespan_report("submit", *a), limit=limit)
+
+    counts = {}
+    for s in status.values():
+        counts[s] = counts.get(s, 0) + 1
+    print("\n--- Pipeline ---")
+    print(", ".join(f"{n} {s}" for s, n in sorted(counts.items())))
+    print(f"State → {state.path} (rerun to resume; --restart to start over)")
+    if counts.get("failed") or counts.get("blocked") or counts.get("locked"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,263 @@
-# Downloadable libraries
-import pandas as pd
-import yaml
+# Downloadable libraries (pandas, yaml) are imported lazily where needed,
+# so --help and submit-only runs start fast.
 
 # Standard libraries
 import os
 import sys
 import argparse
 import gzip
-import subprocess
-import shutil
 import glob
+import struct
+import zlib
+import hashlib
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-def load_config(cfg_path: str = "../config.yaml") -> dict:
+# Code shared with the other scripts lives in ../enflora.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+import enflora
+from enflora import (
+    AdaptiveConcurrency, Catalog, discover_manifests, gc_store, init_metrics, _isnull, load_config,
+    load_table, plan_submission, prestage_inputs, print_plan, promotable, promote_manifests, read_tsv,
+    run_largest_first, sample_lock, stage, stage_compressed, start_profile, STORE_DIR, _store_link,
+    _store_lookup, _store_put, submit_manifests, suggest_slurm, _THROTTLE_RE, TsvStream, WATCH_POLL,
+    WATCH_SETTLE, watch_sheet, webin_throttled,
+)
+
+
+# --- Reads inside tar deliveries: 'bundle.tar::dir/sample_R1.fastq.gz' ---
+TAR_SEP = "::"
+
+def _norm_member(name: str) -> str:
+    return name[2:] if name.startswith("./") else name
+
+def split_tar_ref(value: str) -> Optional[tuple]:
     """
-    Return a dict with the YAML content or an empty dict if the file is absent.
+    (absolute archive path, member name) for 'archive.tar::member', else None.
+    """
+    archive, sep, member = value.partition(TAR_SEP)
+    if not sep:
+        return None
+    return os.path.abspath(archive.strip()), _norm_member(member.strip())
+
+def stage_tar_members(refs: dict, submission_dir: str) -> dict:
+    """
+    Stream the referenced members of each archive into the store, in one sequential pass
+    per archive (plain or compressed tar). Uncompressed members are gzipped on the way,
+    .gz members stored as they are; nothing is extracted to disk.
+
+    `refs` is {archive: {member, …}}; returns {(archive, member): (digest, staged file name)}.
+    """
+    import tarfile  # lazy: only tar references need it
+    store = os.path.join(submission_dir, STORE_DIR)
+    os.makedirs(store, exist_ok=True)
+    staged = {}
+    for archive, members in refs.items():
+        if not os.path.isfile(archive):
+            sys.exit(f"Archive not found: {archive}")
+        st = os.stat(archive)
+        stamp = f"{os.path.realpath(archive)}|{st.st_size}|{st.st_mtime_ns}"
+        todo = {}
+        for m in sorted(members):
+            name = os.path.basename(m) if m.endswith(".gz") else os.path.basename(m) + ".gz"
+            digest = _store_lookup(store, f"{stamp}{TAR_SEP}{m}")
+            if digest:
+                staged[(archive, m)] = (digest, name)
+            else:
+                todo[m] = name
+        if not todo:
+            print(f"→ {archive}: all {len(members)} member(s) already in store")
+            continue
+        print(f"→ Streaming {len(todo)} member(s) out of {archive}")
+        with stage("untar", bytes_in=st.st_size, file=os.path.basename(archive), members=len(todo)):
+            with tarfile.open(archive, "r|*") as tar:
+                for info in tar:
+                    m = _norm_member(info.name)
+                    if m not in todo or not info.isfile():
+                        continue
+                    digest = _store_put(store, tar.extractfile(info), f"{stamp}{TAR_SEP}{m}", todo[m],
+                                        compress=not m.endswith(".gz"), bytes_in=info.size)
+                    staged[(archive, m)] = (digest, todo.pop(m))
+                    if not todo:
+                        break  # rest of the archive is not needed
+        if todo:
+            sys.exit(f"{archive}: member(s) not found: {', '.join(sorted(todo))}")
+    return staged
+
+# Empty BGZF block that every complete BAM (and bgzipped file) must end with.
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+# CRAM end-of-file containers, keyed by CRAM major version.
+CRAM_EOF = {
+    2: bytes.fromhex("0b000000ffffffffffe0454f460000000001000001000606010001000100"),
+    3: bytes.fromhex("0f000000ffffffff0fe0454f4600000000010005bdd94f0001000606010001000100ee63014b"),
+}
+
+def _read_tail(fh, size, n):
+    fh.seek(max(size - n, 0))
+    return fh.read(n)
+
+def check_file_tail(path: str):
+    """
+    Constant-time integrity check of a .gz/.bam/.cram file: only the head and
+    tail are read, nothing is decompressed.
+
+    Returns None if the file looks complete, otherwise a short reason.
+    """
+    low = path.lower()
+    size = os.path.getsize(path)
+    with open(path, "rb") as fh:
+        head = fh.read(18)
+        if low.endswith(".cram"):
+            if head[:4] != b"CRAM":
+                return "not a CRAM file (bad magic)"
+            eof = CRAM_EOF.get(head[4])
+            if eof is None:
+                return None  # no known EOF container for this CRAM version
+            if _read_tail(fh, size, len(eof)) != eof:
+                return f"missing CRAM v{head[4]} EOF container (truncated?)"
+            return None
+
+        if head[:2] != b"\x1f\x8b":
+            return "not gzip/BGZF compressed (bad magic)"
+        # BAM and bgzip output: BGZF header carries a 'BC' extra subfield
+        is_bgzf = len(head) >= 14 and head[3] & 4 and head[12:14] == b"BC"
+        if low.endswith(".bam") or is_bgzf:
+            if _read_tail(fh, size, len(BGZF_EOF)) != BGZF_EOF:
+                return "missing BGZF EOF block (truncated?)"
+            return None
+
+        # Plain gzip: the last 8 bytes are CRC32 + ISIZE (uncompressed size mod 2**32)
+        if size < 20:
+            return "too small to hold a gzip member"
+        crc, isize = struct.unpack("<II", _read_tail(fh, size, 8))
+    if crc == 0 and isize == 0 and size > 64:
+        return "zeroed gzip trailer (truncated or preallocated file)"
+    # Deflate cannot expand more than ~1032:1, so while that bound is below
+    # 4 GiB the ISIZE of the last member must fall under it.
+    bound = (size - 18) * 1032
+    if bound < 2 ** 32 and isize > bound:
+        return f"implausible gzip ISIZE {isize} for {size} compressed bytes"
+    return None
+
+def check_gzip_stream(path: str):
+    """
+    Full decode of a gzip/BGZF file, verifying every member's CRC and length.
+    Returns None if the stream is intact, otherwise a short reason.
+    """
+    try:
+        with gzip.open(path, "rb") as fh:
+            while fh.read(4 * 1024 * 1024):
+                pass
+    except (OSError, EOFError, zlib.error) as exc:
+        return f"full decode failed: {exc}"
+    return None
+
+def verify_inputs(paths, full: bool = False, threads: int = 4):
+    """
+    Check all compressed inputs in bulk before anything is staged.
+
+    Every .gz/.bam/.cram gets the tail check; with `full`, gzip and BAM files
+    are additionally decoded end to end, `threads` files at a time.
+    Exits listing every broken file.
+    """
+    todo = []
+    for path in dict.fromkeys(paths):  # dedupe, keep order
+        if path.lower().endswith((".gz", ".bam", ".cram")) and os.path.isfile(path):
+            todo.append(path)
+    if not todo:
+        return
+
+    print(f"Checking integrity of {len(todo)} file(s) ({'full' if full else 'quick'})…")
+    problems = {}
+    with stage("integrity_quick", files=len(todo)):
+        for path in todo:
+            reason = check_file_tail(path)
+            if reason:
+                problems[path] = reason
+
+    if full:
+        decodable = [p for p in todo if p not in problems and not p.lower().endswith(".cram")]
+        with stage("integrity_full", bytes_in=sum(os.path.getsize(p) for p in decodable), files=len(decodable)), \
+             ThreadPoolExecutor(max_workers=max(1, threads)) as pool:  # zlib releases the GIL
+            for path, reason in zip(decodable, pool.map(check_gzip_stream, decodable)):
+                if reason:
+                    problems[path] = reason
+
+    if problems:
+        for path, reason in problems.items():
+            print(f"  [integrity] {path}: {reason}", file=sys.stderr)
+        sys.exit(f"Integrity check failed for {len(problems)} of {len(todo)} file(s)")
+    print(f"  All {len(todo)} file(s) passed.")
+
+class SampleCounter:
+    """
+    Occurrences of each sample ID so far, for the _2, _3, … folder suffixes. With
+    `on_disk` the counts live in a temporary SQLite database instead of a dict, so
+    memory stays flat however many samples a streamed sheet has.
+    """
+    def __init__(self, on_disk: bool = False):
+        self.counts = defaultdict(int)
+        self.db = None
+        if on_disk:
+            import sqlite3
+            self.db = sqlite3.connect("")  # private temporary file, deleted on close
+            self.db.execute("CREATE TABLE counts (id TEXT PRIMARY KEY, n INTEGER)")
+
+    def add(self, sample_id: str) -> int:
+        """
+        Count one more occurrence of `sample_id` and return its number (1 for the first).
+        """
+        if self.db is None:
+            self.counts[sample_id] += 1
+            return self.counts[sample_id]
+        row = self.db.execute("SELECT n FROM counts WHERE id = ?", (sample_id,)).fetchone()
+        n = row[0] + 1 if row else 1
+        self.db.execute("INSERT OR REPLACE INTO counts VALUES (?, ?)", (sample_id, n))
+        return n
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+def prepared_rows(rows, chunk_rows: int, prepare):
+    """
+    Pass `rows` on in chunks of `chunk_rows` (0 = all at once), calling prepare(chunk)
+    before the rows of each chunk are yielded.
+    """
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if chunk_rows and len(chunk) >= chunk_rows:
+            prepare(chunk)
+            yield from chunk
+            chunk = []
+    if chunk:
+        prepare(chunk)
+        yield from chunk
+
+def convert_manifests(table_file, submission_dir="submission", integrity=None, threads=4, sample_map=None, wait=True,
+                      byte_budget=0, stream=False, rows=None, staged=None, on_chunk=None):
+    """
+    Stage every row of the sheet into submission/<SAMPLE>/ and write its manifest.txt.
+
+    With `stream` a TSV sheet is read and processed TSV_CHUNK_ROWS rows at a time:
+    integrity checks and the store pre-pass run per chunk, just before that chunk is
+    staged, and sample IDs are counted on disk, so memory stays flat.
+
+    With `rows` (0-based row numbers) only those rows are staged; sample IDs are still
+    counted over the whole sheet. `staged`, if given, is filled with {row: manifest}.
+
+    With `on_chunk` the manifests are not collected: each chunk's are handed to
+    on_chunk(manifests) once the chunk is staged, and [] is returned.
     """
-    if os.path.exists(cfg_path):
-        with open(cfg_path, "r") as fh:
-            return yaml.safe_load(fh) or {}
-    return {}
-
-def load_table(path: str, case: str = "upper"):
-    ext = os.path.splitext(path)[1].lower()
-    if ext in {".xlsx", ".xls"}:
-        df = pd.read_excel(path, sheet_name=0)
-    elif ext in {".tsv", ".tab", ".txt"}:
-        df = pd.read_csv(path, sep="\t")
-    else:
-        sys.exit(f"Unsupported table extension '{ext}'. Use .xlsx/.xls or .tsv/.tab/.txt")
-    df.columns = df.columns.str.strip()
-    if case == "upper":
-        df.columns = df.columns.str.upper()
-    elif case == "lower":
-        df.columns = df.columns.str.lower()
-    return df
-
-def convert_manifests(table_file, submission_dir="submission"):
     # Load table (UPPERCASE headers expected)
-    df = load_table(table_file, case="upper")
-    sample_counts = defaultdict(int)
+    df = load_table(table_file, case="upper", stream=stream)
+    streamed = isinstance(df, TsvStream)  # Excel sheets are always loaded whole
+    sample_counts = SampleCounter(on_disk=streamed)
 
     # Required columns for raw reads submission
     required = [
@@ -56,106 +274,436 @@ def convert_manifests(table_file, submission_dir="submission"):
     if not file_cols:
         sys.exit("No file columns (BAM, CRAM, FASTQ) found in table header")
 
-    os.makedirs(submission_dir, exist_ok=True)
-    manifest_paths = []
+    # Bulk integrity check of every referenced input before any staging (per chunk when streamed)
+    selected = lambda idx: rows is None or idx in rows
+    if integrity and not streamed:
+        paths = []
+        for idx, row in df.iterrows():
+            if not selected(idx):
+                continue
+            for col in file_cols:
+                val = row.get(col)
+                if not _isnull(val) and str(val).strip().lower() != "nan":
+                    paths.append(os.path.abspath(str(val).strip()))
+        verify_inputs(paths, full=(integrity == "full"), threads=threads)
 
+    # Inputs given as archive.tar::member are streamed out of their archives first,
+    # all members of one archive in a single pass, straight into the store
+    tar_refs = defaultdict(set)
     for idx, row in df.iterrows():
-        n = idx + 1
-        # In case there are more than one objects associated with the same sample.
-        raw_id = str(row["SAMPLE"]).strip()
-        sample_counts[raw_id] += 1
-        # first occurrence → use raw_id; subsequent → raw_id_2, raw_id_3, ...
-        if sample_counts[raw_id] == 1:
-            sample_id = raw_id
-        else:
-            sample_id = f"{raw_id}_{sample_counts[raw_id]}"
-        samp_dir = os.path.join(submission_dir, sample_id)
-        os.makedirs(samp_dir, exist_ok=True)
-
-        # Collect file entries
-        entries = []
+        if not selected(idx):
+            continue
         for col in file_cols:
             val = row.get(col)
-            if pd.notnull(val) and str(val).strip().lower() != "nan":
-                entries.append((col, str(val).strip()))
-        if not entries:
-            sys.exit(f"Row {n}: no files specified in any of {', '.join(file_cols)}")
-
-
-        # Determine file type in case of paired reads, or more than one type, based on paths' extensions
-        types = set()
-        for _, rel in entries:
-            low = rel.lower()
-            if low.endswith(".bam") or low.endswith(".bam.gz"):
-                types.add("BAM")
-            elif low.endswith(".cram") or low.endswith(".cram.gz"):
-                types.add("CRAM")
-            elif low.endswith(".fastq") or low.endswith(".fq") \
-                or low.endswith(".fastq.gz") or low.endswith(".fq.gz"):
-                types.add("FASTQ")
+            if not _isnull(val) and str(val).strip().lower() != "nan":
+                ref = split_tar_ref(str(val).strip())
+                if ref:
+                    tar_refs[ref[0]].add(ref[1])
+    tar_staged = stage_tar_members(tar_refs, submission_dir) if tar_refs else {}
+
+    manifest_paths = []
+
+    def handoff():
+        if on_chunk and manifest_paths:
+            on_chunk(list(manifest_paths))
+            manifest_paths.clear()
+
+    # Per chunk (the whole sheet unless streamed): integrity checks, then the store pre-pass
+    def prepare(chunk):
+        handoff()  # the previous chunk is fully staged by now
+        values = [str(row.get(col)).strip() for idx, row in chunk if selected(idx) for col in file_cols
+                  if not _isnull(row.get(col)) and str(row.get(col)).strip().lower() != "nan"]
+        if integrity and streamed:
+            verify_inputs([os.path.abspath(v) for v in values], full=(integrity == "full"), threads=threads)
+        # Uncompressed inputs are gzipped into the store up front, in parallel and largest first
+        plain = []
+        for val in values:
+            src = os.path.abspath(val)
+            if not split_tar_ref(val) and not src.endswith(".gz") and os.path.isfile(src) \
+                    and not src.startswith(os.path.abspath(submission_dir) + os.sep):
+                plain.append(src)
+        prestage_inputs(plain, submission_dir, threads=threads, byte_budget=byte_budget)
+
+    os.makedirs(submission_dir, exist_ok=True)
+    catalog = Catalog(submission_dir)
+
+    try:
+        for idx, row in prepared_rows(df.iterrows(), df.chunk_rows if streamed else 0, prepare):
+            n = idx + 1
+            # In case there are more than one objects associated with the same sample.
+            raw_id = str(row["SAMPLE"]).strip()
+            # Biosample aliases → accessions, when called from ../pipeline.py
+            if sample_map:
+                raw_id = sample_map.get(raw_id, raw_id)
+            count = sample_counts.add(raw_id)
+            # first occurrence → use raw_id; subsequent → raw_id_2, raw_id_3, ...
+            if count == 1:
+                sample_id = raw_id
             else:
-                sys.exit(f"Row {n}: unrecognized file extension in '{rel}'")
-        if len(types) != 1:
-            sys.exit(f"Row {n}: mixed file types in one row: {types}")
-        filetype = types.pop()
-
-        # Validate counts
-        if filetype in ("BAM", "CRAM") and len(entries) != 1:
-            sys.exit(f"Row {n}: {filetype} requires exactly one file entry, got {len(entries)}")
-        if filetype == "FASTQ" and len(entries) < 1:
-            sys.exit(f"Row {n}: at least one FASTQ entry required")
-        
-        # Handling of files, check for compression too
-        compressed_files = []
-        # Handle each file: copy into samp_dir, compress if needed
-        for _, rel in entries:
-            src = os.path.abspath(rel)
-            if not os.path.exists(src):
-                sys.exit(f"Row {n}: file not found: {src}")
-            # if file is already in samp_dir, just add to manifest
-            if os.path.dirname(src) == os.path.abspath(samp_dir):
-                compressed_files.append(os.path.basename(src))
+                sample_id = f"{raw_id}_{count}"
+            if not selected(idx):
                 continue
-            # if already .gz then soft-link into samp_dir
-            if src.endswith(".gz"):
-                link_path = os.path.join(samp_dir, os.path.basename(src))
-                if not os.path.exists(link_path):
-                    try:
-                        os.symlink(src, link_path)         # relative link
-                    except OSError:
-                            raise
-                compressed_files.append(os.path.basename(link_path))
+            samp_dir = os.path.join(submission_dir, sample_id)
+            # Another job staging/submitting the same sample holds this lock
+            lock = sample_lock(samp_dir, wait=wait)
+            if not lock.acquire():
+                print(f"[Row {n}] {sample_id} is claimed by another job, skipping")
                 continue
+            try:
+                os.makedirs(samp_dir, exist_ok=True)
 
-            # if not .gz then stream-compress right into samp_dir
-            gz_name = os.path.basename(src) + ".gz"
-            dst = os.path.join(samp_dir, gz_name)
-
-            with open(src, "rb") as f_in, gzip.open(dst, "wb", compresslevel=6) as f_out:
-                shutil.copyfileobj(f_in, f_out, length=1024 * 1024)  # 1 MiB chunks
-
-            compressed_files.append(gz_name)
-
-        # Write manifest.txt
-        mf = os.path.join(samp_dir, "manifest.txt")
-        with open(mf, "w") as fh:
-            fh.write(f"STUDY\t{row['STUDY']}\n")
-            fh.write(f"SAMPLE\t{row['SAMPLE']}\n")
-            fh.write(f"NAME\t{row['NAME']}\n")
-            fh.write(f"INSTRUMENT\t{row['INSTRUMENT']}\n")
-            fh.write(f"INSERT_SIZE\t{row['INSERT_SIZE']}\n")
-            fh.write(f"LIBRARY_NAME\t{row['LIBRARY_NAME']}\n")
-            fh.write(f"LIBRARY_SOURCE\t{row['LIBRARY_SOURCE']}\n")
-            fh.write(f"LIBRARY_SELECTION\t{row['LIBRARY_SELECTION']}\n")
-            fh.write(f"LIBRARY_STRATEGY\t{row['LIBRARY_STRATEGY']}\n")
-            fh.write(f"DESCRIPTION\t{row['DESCRIPTION']}\n")
-            for fn in compressed_files:
-                fh.write(f"{filetype}\t{fn}\n")
-        print(f"[Row {n}] Wrote manifest → {mf}")
-        manifest_paths.append(mf)
+                # Collect file entries
+                entries = []
+                for col in file_cols:
+                    val = row.get(col)
+                    if not _isnull(val) and str(val).strip().lower() != "nan":
+                        entries.append((col, str(val).strip()))
+                if not entries:
+                    sys.exit(f"Row {n}: no files specified in any of {', '.join(file_cols)}")
 
+
+                # Determine file type in case of paired reads, or more than one type, based on paths' extensions
+                types = set()
+                for _, rel in entries:
+                    low = rel.lower()
+                    if low.endswith(".bam") or low.endswith(".bam.gz"):
+                        types.add("BAM")
+                    elif low.endswith(".cram") or low.endswith(".cram.gz"):
+                        types.add("CRAM")
+                    elif low.endswith(".fastq") or low.endswith(".fq") \
+                        or low.endswith(".fastq.gz") or low.endswith(".fq.gz"):
+                        types.add("FASTQ")
+                    else:
+                        sys.exit(f"Row {n}: unrecognized file extension in '{rel}'")
+                if len(types) != 1:
+                    sys.exit(f"Row {n}: mixed file types in one row: {types}")
+                filetype = types.pop()
+
+                # Validate counts
+                if filetype in ("BAM", "CRAM") and len(entries) != 1:
+                    sys.exit(f"Row {n}: {filetype} requires exactly one file entry, got {len(entries)}")
+                if filetype == "FASTQ" and len(entries) < 1:
+                    sys.exit(f"Row {n}: at least one FASTQ entry required")
+        
+                # Handling of files, check for compression too
+                compressed_files = []
+                # Handle each file: copy into samp_dir, compress if needed
+                for _, rel in entries:
+                    # tar member: already in the store, just link it
+                    ref = split_tar_ref(rel)
+                    if ref:
+                        digest, name = tar_staged[ref]
+                        _store_link(os.path.join(submission_dir, STORE_DIR), digest, os.path.join(samp_dir, name), submission_dir)
+                        compressed_files.append(name)
+                        continue
+                    src = os.path.abspath(rel)
+                    if not os.path.exists(src):
+                        sys.exit(f"Row {n}: file not found: {src}")
+                    # if file is already in samp_dir, just add to manifest
+                    if os.path.dirname(src) == os.path.abspath(samp_dir):
+                        compressed_files.append(os.path.basename(src))
+                        continue
+                    # if already .gz then soft-link into samp_dir
+                    if src.endswith(".gz"):
+                        link_path = os.path.join(samp_dir, os.path.basename(src))
+                        if not os.path.exists(link_path):
+                            try:
+                                os.symlink(src, link_path)         # relative link
+                            except OSError:
+                                    raise
+                        compressed_files.append(os.path.basename(link_path))
+                        continue
+
+                    # if not .gz then compress once into the store and link into samp_dir
+                    gz_name = stage_compressed(src, samp_dir, submission_dir, row=n)
+                    compressed_files.append(gz_name)
+
+                # Write manifest.txt
+                mf = os.path.join(samp_dir, "manifest.txt")
+                with open(mf, "w") as fh:
+                    fh.write(f"STUDY\t{row['STUDY']}\n")
+                    fh.write(f"SAMPLE\t{raw_id}\n")
+                    fh.write(f"NAME\t{row['NAME']}\n")
+                    fh.write(f"INSTRUMENT\t{row['INSTRUMENT']}\n")
+                    fh.write(f"INSERT_SIZE\t{row['INSERT_SIZE']}\n")
+                    fh.write(f"LIBRARY_NAME\t{row['LIBRARY_NAME']}\n")
+                    fh.write(f"LIBRARY_SOURCE\t{row['LIBRARY_SOURCE']}\n")
+                    fh.write(f"LIBRARY_SELECTION\t{row['LIBRARY_SELECTION']}\n")
+                    fh.write(f"LIBRARY_STRATEGY\t{row['LIBRARY_STRATEGY']}\n")
+                    fh.write(f"DESCRIPTION\t{row['DESCRIPTION']}\n")
+                    for fn in compressed_files:
+                        fh.write(f"{filetype}\t{fn}\n")
+                print(f"[Row {n}] Wrote manifest → {mf}")
+                catalog.add_sample(sample_id, n, mf)
+                manifest_paths.append(mf)
+                if staged is not None:
+                    staged[idx] = mf
+            finally:
+                lock.release()
+
+        handoff()
+        catalog.link_store(os.path.join(submission_dir, STORE_DIR))
+    finally:
+        sample_counts.close()
+        catalog.close()
     return manifest_paths
 
+
+def _row_inputs(row, file_cols) -> list:
+    """
+    Absolute paths of the files a row reads (the archive for archive.tar::member).
+    """
+    paths = []
+    for col in file_cols:
+        val = row.get(col)
+        if not _isnull(val) and str(val).strip().lower() != "nan":
+            ref = split_tar_ref(str(val).strip())
+            paths.append(os.path.abspath(ref[0] if ref else str(val).strip()))
+    return paths
+
+
+# --- Zero-disk upload (--ftp_upload): gzip + MD5 in memory, streamed into the FTPS upload area ---
+FTP_HOST = "webin2.ebi.ac.uk"
+FTP_CHUNK = 1024 * 1024    # bytes read from an input per step
+FTP_QUEUE_CHUNKS = 16      # compressed pieces buffered between compression and the transfer
+FTP_TIMEOUT = 120          # seconds without progress before a connection counts as dead
+FTP_TSV_COLUMNS = ["SAMPLE", "NAME", "LOCAL", "SOURCE_SIZE", "SOURCE_MTIME_NS", "REMOTE_PATH", "MD5", "BYTES"]
+
+class GzipPipe:
+    """
+    Read-only stream of `src`, gzipped on the fly (as is with `compress` off) by a
+    producer thread. Pieces go through a queue of at most FTP_QUEUE_CHUNKS, so memory
+    stays bounded and compression waits whenever the transfer falls behind; read()
+    returns one piece at a time. `md5` and `size` describe the stream sent and are
+    final once read() returned b"".
+    """
+    def __init__(self, src: str, compress: bool = True, chunk: int = FTP_CHUNK, depth: int = FTP_QUEUE_CHUNKS):
+        import queue
+        self.md5 = hashlib.md5()
+        self.size = 0
+        self.eof = False
+        self.queue = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._produce, args=(src, compress, chunk), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        import queue
+        while not self.stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue  # backpressure: the transfer has not caught up yet
+
+    def _emit(self, data: bytes):
+        self.md5.update(data)
+        self.size += len(data)
+        self._put(data)
+
+    def _produce(self, src: str, compress: bool, chunk: int):
+        try:
+            # gzip container with mtime 0 and no file name, like `gzip -n`
+            z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+            with open(src, "rb") as fh:
+                for data in iter(lambda: fh.read(chunk), b""):
+                    if self.stop.is_set():
+                        return
+                    out = z.compress(data) if z else data
+                    if out:
+                        self._emit(out)
+            if z:
+                self._emit(z.flush())
+            self._put(None)
+        except OSError as exc:
+            self._put(exc)
+
+    def read(self, n: int = -1) -> bytes:
+        if self.eof:
+            return b""
+        item = self.queue.get()
+        if item is None:
+            self.eof = True
+            return b""
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+
+def ftp_connect(host: str, user: str, pwd: str, tls: bool = True):
+    """
+    Logged-in ftplib connection to host[:port], with TLS on control and data (FTPS) unless `tls` is off.
+    """
+    import ftplib  # lazy: only --ftp_upload needs it
+    name, _, port = host.partition(":")
+    ftp = ftplib.FTP_TLS(timeout=FTP_TIMEOUT) if tls else ftplib.FTP(timeout=FTP_TIMEOUT)
+    ftp.connect(name, int(port or 21))
+    ftp.login(user, pwd)  # FTP_TLS secures the control connection first
+    if tls:
+        ftp.prot_p()
+    return ftp
+
+def ftp_upload_file(src: str, remote_dir: str, host: str, user: str, pwd: str, tls: bool = True,
+                    label: str = "") -> dict:
+    """
+    Send one input to the upload area without writing anything locally: raw FASTQ is
+    gzipped and MD5-summed in memory on its way into the transfer, .gz/BAM/CRAM go as
+    they are. Returns {"remote", "md5", "bytes", "error", "throttled"}.
+    """
+    import ftplib
+    compress = src.lower().endswith((".fastq", ".fq"))
+    name = os.path.basename(src) + (".gz" if compress else "")
+    res = {"remote": f"{remote_dir.strip('/')}/{name}" if remote_dir.strip("/") else name,
+           "md5": None, "bytes": 0, "error": None, "throttled": False}
+    pipe = None
+    with stage("ftp_upload", row=label, bytes_in=os.path.getsize(src), file=name) as rec:
+        try:
+            ftp = ftp_connect(host, user, pwd, tls)
+            try:
+                for part in remote_dir.strip("/").split("/") if remote_dir.strip("/") else []:
+                    try:
+                        ftp.cwd(part)
+                    except ftplib.error_perm:
+                        ftp.mkd(part)
+                        ftp.cwd(part)
+                pipe = GzipPipe(src, compress=compress)
+                ftp.storbinary(f"STOR {name}", pipe, blocksize=FTP_CHUNK)
+            finally:
+                try:
+                    ftp.quit()
+                except (OSError, EOFError, ftplib.Error):
+                    ftp.close()
+            res["md5"] = pipe.md5.hexdigest()
+            res["bytes"] = pipe.size
+        except (OSError, EOFError, ftplib.Error) as exc:
+            res["error"] = str(exc) or type(exc).__name__
+            res["throttled"] = isinstance(exc, (TimeoutError, ConnectionError, ftplib.error_temp)) \
+                or bool(_THROTTLE_RE.search(res["error"]))
+        finally:
+            if pipe:
+                pipe.close()
+        rec["bytes_out"] = res["bytes"]
+    if res["error"]:
+        print(f"[{label}] ftp: FAILED {name} ({res['error']})")
+    else:
+        print(f"[{label}] ftp: OK {res['remote']} md5 {res['md5']} ({res['bytes'] / 1e6:.1f} MB, {rec['seconds']:.1f}s)")
+    return res
+
+def ftp_upload_table(table_file, host: str, remote_dir: str, user: str, pwd: str, tsv_path: str, tls: bool = True,
+                     jobs: int = 1, byte_budget: int = 0, limit=None):
+    """
+    Upload every file of the sheet straight to the FTP(S) area, largest first and `jobs`
+    at a time, with no staging copy, and write `tsv_path`: one line per file with the
+    remote path and MD5 to fill into ENA's reads template. Files listed there from an
+    earlier run with unchanged size and mtime are not sent again.
+    """
+    df = load_table(table_file, case="upper")
+    if "SAMPLE" not in df.columns:
+        sys.exit("Missing columns in table: SAMPLE")
+    file_cols = [c for c in df.columns if c.upper() in ("BAM", "CRAM") or c.upper().startswith("FASTQ")]
+    if not file_cols:
+        sys.exit("No file columns (BAM, CRAM, FASTQ) found in table header")
+
+    owners = {}  # input → (SAMPLE, NAME) of the first row using it
+    in_tar = 0
+    for idx, row in df.iterrows():
+        for col in file_cols:
+            val = row.get(col)
+            if _isnull(val) or str(val).strip().lower() == "nan":
+                continue
+            if split_tar_ref(str(val).strip()):
+                in_tar += 1
+                continue
+            src = os.path.abspath(str(val).strip())
+            if not os.path.isfile(src):
+                sys.exit(f"Row {idx + 1}: file not found: {src}")
+            owners.setdefault(src, (str(row["SAMPLE"]).strip(), str(row.get("NAME", "")).strip()))
+    if in_tar:
+        print(f"Note: {in_tar} archive member(s) (archive.tar::member) are not uploaded by --ftp_upload")
+    # All uploads share one remote folder, so file names must not clash
+    remote_names = defaultdict(list)
+    for src in owners:
+        remote_names[os.path.basename(src) + (".gz" if src.lower().endswith((".fastq", ".fq")) else "")].append(src)
+    clashes = {n: s for n, s in remote_names.items() if len(s) > 1}
+    if clashes:
+        name, srcs = next(iter(clashes.items()))
+        sys.exit(f"{len(clashes)} remote file name(s) used by more than one input, e.g. {name}: {', '.join(srcs)}")
+
+    done = {}
+    if os.path.exists(tsv_path):
+        for _, prev in read_tsv(tsv_path).iterrows():
+            done[prev["LOCAL"]] = prev
+    todo, kept = [], []
+    for src in owners:
+        st = os.stat(src)
+        prev = done.get(src)
+        if prev is not None and str(prev["SOURCE_SIZE"]) == str(st.st_size) \
+                and str(prev["SOURCE_MTIME_NS"]) == str(st.st_mtime_ns):
+            kept.append(prev)
+        else:
+            todo.append(src)
+    print(f"→ Streaming {len(todo)} file(s) to {host}:/{remote_dir.strip('/')} ({'FTPS' if tls else 'plain FTP'}), "
+          f"{len(kept)} already uploaded")
+    results = run_largest_first(
+        todo, os.path.getsize,
+        lambda src: ftp_upload_file(src, remote_dir, host, user, pwd, tls, label=owners[src][0]),
+        workers=jobs, byte_budget=byte_budget, label="ftp_upload", limit=limit,
+        ok=lambda res: not res["throttled"]) if todo else []
+
+    lines = [[str(prev[c]) for c in FTP_TSV_COLUMNS] for prev in kept]
+    failed = 0
+    for src, res in zip(todo, results):
+        if res["error"]:
+            failed += 1
+            continue
+        st = os.stat(src)
+        lines.append([*owners[src], src, str(st.st_size), str(st.st_mtime_ns), res["remote"], res["md5"], str(res["bytes"])])
+    os.makedirs(os.path.dirname(os.path.abspath(tsv_path)), exist_ok=True)
+    with open(tsv_path + ".tmp", "w") as fh:
+        fh.write("\t".join(FTP_TSV_COLUMNS) + "\n")
+        for line in sorted(lines):
+            fh.write("\t".join(line) + "\n")
+    os.replace(tsv_path + ".tmp", tsv_path)
+    print(f"→ {len(todo) - failed} uploaded, {len(kept)} kept, {failed} failed; remote paths and MD5s → {tsv_path}")
+    if failed:
+        print("  Run again to retry the failed files.")
+
+
+def plan_inputs(table_file) -> list:
+    """
+    [(sample_id, [(path, compress), …]), …] for --plan, following convert_manifests'
+    rules (.gz inputs are linked, others gzipped) without writing anything.
+    """
+    df = load_table(table_file, case="upper")
+    if "SAMPLE" not in df.columns:
+        sys.exit("Missing columns in table: SAMPLE")
+    file_cols = [c for c in df.columns if c.upper() in ("BAM", "CRAM") or c.upper().startswith("FASTQ")]
+    if not file_cols:
+        sys.exit("No file columns (BAM, CRAM, FASTQ) found in table header")
+    sample_counts = defaultdict(int)
+    samples = []
+    in_tar = 0
+    for _, row in df.iterrows():
+        raw_id = str(row["SAMPLE"]).strip()
+        sample_counts[raw_id] += 1
+        sample_id = raw_id if sample_counts[raw_id] == 1 else f"{raw_id}_{sample_counts[raw_id]}"
+        files = []
+        for col in file_cols:
+            val = row.get(col)
+            if not _isnull(val) and str(val).strip().lower() != "nan":
+                if split_tar_ref(str(val).strip()):
+                    in_tar += 1
+                    continue
+                src = os.path.abspath(str(val).strip())
+                files.append((src, not src.endswith(".gz")))
+        samples.append((sample_id, files))
+    if in_tar:
+        print(f"Note: {in_tar} archive member(s) (archive.tar::member) are not included in the estimate")
+    return samples
+
 def prepare_logs_dir(logs_dir="logs"):
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
@@ -182,56 +730,6 @@ def find_jar(jar_arg):
         return webin[0]
     sys.exit("Auto-detect failed; pass --jar /path/to/webin-cli.jar")
 
-def drop_cached_validation(log_subdir: str):
-    """
-    Delete stale validate.json files inside logs/<sample_id>/reads/*/
-
-    Removing these forces Webin-CLI to recalculate MD5s on the next run, without throwing away the whole log directory.
-    """
-    pattern = os.path.join(log_subdir, "reads", "*", "validate.json")
-    for path in glob.glob(pattern):
-        try:
-            os.remove(path)
-            print(f"  Removed cached validation → {path}")
-        except OSError as exc:
-            print(f"  Could not remove {path}: {exc}")
-
-def submit_manifests(manifests, jar, user, pwd, live, logs_dir):
-    for mf in manifests:
-        inp = os.path.dirname(mf)
-        sample_id = os.path.basename(inp)
-        log_subdir = os.path.join(logs_dir, sample_id)
-        os.makedirs(log_subdir, exist_ok=True)
-        drop_cached_validation(log_subdir)
-        cmd = [
-            "java", "-jar", jar,
-            "-context", "reads",
-            "-manifest", mf,
-            "-inputDir", inp,
-            "-outputDir", log_subdir,
-            "-submit",
-            "-username", user,
-            "-password", pwd
-        ]
-        if not live:
-            cmd.insert(cmd.index("-submit"), "-test")
-        #print(f"→ Running: {' '.join(cmd)}")
-
-        # redact user and password in the printed command
-        safe_cmd = [
-            ("******" if c in (user, pwd) else c)       # replace secrets
-            for c in cmd
-        ]
-        print(f"→ Running: {' '.join(safe_cmd)}")
-
-        res = subprocess.run(cmd, capture_output=True, text=True)
-        print(f"  Return code: {res.returncode}")
-        if res.stdout:
-            print(res.stdout)
-        if res.stderr:
-            print(res.stderr, file=sys.stderr)
-    
-    # remove compressed files?
 
 def main():
     p = argparse.ArgumentParser(
@@ -267,6 +765,110 @@ def main():
     p.add_argument(
         "--logs_dir", default="logs",
         help="Where Webin-CLI writes its receipts")
+
+    p.add_argument(
+        "--integrity", choices=["quick", "full"],
+        help="Check .gz/.bam/.cram inputs before staging: 'quick' reads only file tails, 'full' also decodes gzip/BAM")
+
+    p.add_argument(
+        "--threads", type=int, default=4,
+        help="Worker threads for parallel work such as full integrity checks (default=4)")
+
+    p.add_argument(
+        "--on_locked", choices=["wait", "skip"], default="wait",
+        help="When another job is staging/submitting the same sample: wait for it (default) or skip the sample")
+
+    p.add_argument(
+        "--plan", action="store_true",
+        help="Dry run: estimate staged bytes, compression/checksum/upload time and Slurm resources for TABLE, then exit")
+
+    p.add_argument(
+        "--plan_mbps", type=float, default=20.0,
+        help="Upload bandwidth assumed by --plan, in MB/s (default=20)")
+
+    p.add_argument(
+        "--webin_batch", action="store_true",
+        help="Run all manifests in one long-lived Webin-CLI JVM (../webin_batch/WebinBatch.java); falls back to one java -jar per manifest")
+
+    p.add_argument(
+        "--jobs", type=int, default=1,
+        help="Webin-CLI submissions running at once, largest sample first (default=1; 1 with --webin_batch)")
+
+    p.add_argument(
+        "--min_jobs", type=int, default=1,
+        help="Lower bound for adaptive concurrency (with --max_jobs, default=1)")
+
+    p.add_argument(
+        "--max_jobs", type=int, default=0,
+        help="Adapt the number of parallel submissions between --min_jobs and this, from throughput and throttling (default=0, fixed --jobs)")
+
+    p.add_argument(
+        "--max_mbps", type=float, default=0,
+        help="Cap on the total upload rate in MB/s, e.g. on a shared login node (default=0, no cap)")
+
+    p.add_argument(
+        "--max_inflight_gb", type=float, default=0,
+        help="Cap on GB being compressed or uploaded at once; larger items wait, an item over the cap runs alone (default=0, no cap)")
+
+    p.add_argument(
+        "--promote", action="store_true",
+        help="Submit to live every sample whose test submission succeeded and whose staged files are unchanged; nothing is re-staged")
+
+    p.add_argument(
+        "--gc_store", action="store_true",
+        help="Remove staged objects in <submission_dir>/.objects/ that no sample folder links to any more")
+
+    p.add_argument(
+        "--report", action="store_true",
+        help="Print what the catalog (<submission_dir>/.catalog.sqlite) holds: samples and bytes per status, failed samples")
+
+    p.add_argument(
+        "--profile", action="store_true",
+        help="Run under cProfile and dump stats to logs/metrics/")
+
+    p.add_argument(
+        "--stream", action="store_true",
+        help="Read a TSV sheet in chunks and stage it chunk by chunk, with flat memory for very large sheets")
+
+    p.add_argument(
+        "--ftp_upload", action="store_true",
+        help="Stream every file of TABLE to the Webin FTPS upload area, gzipped and MD5-summed in memory, with no staging copy")
+
+    p.add_argument(
+        "--ftp_host", default=FTP_HOST,
+        help=f"FTP(S) server for --ftp_upload, host[:port] (default={FTP_HOST})")
+
+    p.add_argument(
+        "--ftp_dir", default="",
+        help="Remote folder for --ftp_upload, created if missing (default: the login folder)")
+
+    p.add_argument(
+        "--ftp_tsv", default=os.path.join("logs", "ftp_upload_md5s.tsv"),
+        help="TSV written by --ftp_upload: remote path and MD5 per file (default=logs/ftp_upload_md5s.tsv)")
+
+    p.add_argument(
+        "--ftp_plain", action="store_true",
+        help="Plain FTP instead of FTPS for --ftp_upload, e.g. against ../mock_ena/ftp_mock.py without a certificate")
+
+    p.add_argument(
+        "--watch", action="store_true",
+        help="Keep running: stage (and with -s submit) rows of TABLE as they and their files arrive, until Ctrl-C")
+
+    p.add_argument(
+        "--watch_settle", type=float, default=WATCH_SETTLE,
+        help=f"Seconds an input must keep its size and mtime before --watch stages it (default={WATCH_SETTLE:g})")
+
+    p.add_argument(
+        "--watch_poll", type=float, default=WATCH_POLL,
+        help=f"Seconds between --watch re-scans when inotify is unavailable (default={WATCH_POLL:g})")
+
+    p.add_argument(
+        "--table_cache", metavar="DIR",
+        help="Cache dir for parsed Excel sheets (default: ~/.cache/enflora/tables)")
+
+    p.add_argument(
+        "--no_table_cache", action="store_true",
+        help="Always re-parse Excel sheets instead of using the cache")
     
     args = p.parse_args()
 
@@ -298,24 +900,192 @@ def main():
     live = cfg.get("live")
     if not live:
         live = args.live
+    # Per-stage metrics under logs/metrics/, and optional cProfile of the whole run
+    init_metrics(args.logs_dir, "runs")
+    if args.profile:
+        start_profile(args.logs_dir, "runs")
+    # 7. Integrity check mode for compressed inputs (quick | full)
+    integrity = cfg.get("integrity")
+    if not integrity:
+        integrity = args.integrity
+    if integrity and integrity not in ("quick", "full"):
+        sys.exit(f"integrity must be 'quick' or 'full', not '{integrity}'")
+    threads = cfg.get("threads")
+    if not threads:
+        threads = args.threads
+    # 8. parsed Excel cache directory (table_cache: False disables it)
+    if cfg.get("table_cache") is False or args.no_table_cache:
+        enflora.TABLE_CACHE_DIR = None
+    elif cfg.get("table_cache") or args.table_cache:
+        enflora.TABLE_CACHE_DIR = cfg.get("table_cache") or args.table_cache
+    # 9. Stream large TSV sheets chunk by chunk instead of loading them whole
+    stream = cfg.get("stream_table")
+    if not stream:
+        stream = args.stream
+    # 10. Watch mode and its timings
+    watch = cfg.get("watch")
+    if not watch:
+        watch = args.watch
+    watch_settle = cfg.get("watch_settle")
+    if not watch_settle:
+        watch_settle = args.watch_settle
+    watch_poll = cfg.get("watch_poll")
+    if not watch_poll:
+        watch_poll = args.watch_poll
+    # 11. Zero-disk upload target (ftp_tls: False only for a local stand-in)
+    ftp_host = cfg.get("ftp_host")
+    if not ftp_host:
+        ftp_host = args.ftp_host
+    ftp_dir = cfg.get("ftp_dir")
+    if not ftp_dir:
+        ftp_dir = args.ftp_dir
+    ftp_tsv = cfg.get("ftp_tsv")
+    if not ftp_tsv:
+        ftp_tsv = args.ftp_tsv
+    ftp_tls = cfg.get("ftp_tls", True) is not False and not args.ftp_plain
 
-    manifests = []
-    if table_path:
-        manifests = convert_manifests(table_path, sub_dir)
+    # Dry run: cost estimate only, nothing is staged or submitted
+    if args.plan:
+        if not table_path:
+            sys.exit("--plan needs a table (-c TABLE or data_runs in config)")
+        samples = plan_inputs(table_path)
+        plan = plan_submission(samples, upload_mbps=args.plan_mbps)
+        print_plan(plan, suggest_slurm(plan))
+        return
+
+    # Samples locked by another job sharing submission/ or logs/: wait or skip
+    on_locked = cfg.get("on_locked")
+    if not on_locked:
+        on_locked = args.on_locked
+    if on_locked not in ("wait", "skip"):
+        sys.exit(f"on_locked must be 'wait' or 'skip', not '{on_locked}'")
+    wait = on_locked == "wait"
+
+    # Batched Webin-CLI: one JVM for all manifests
+    webin_batch = cfg.get("webin_batch")
+    if not webin_batch:
+        webin_batch = args.webin_batch
+
+    # Parallel submissions and the cap on bytes in flight (compression and upload)
+    jobs = cfg.get("jobs")
+    if not jobs:
+        jobs = args.jobs
+    max_inflight_gb = cfg.get("max_inflight_gb")
+    if not max_inflight_gb:
+        max_inflight_gb = args.max_inflight_gb
+    byte_budget = int(float(max_inflight_gb) * 1e9)
+    # Adaptive concurrency: with max_jobs the submissions at a time move between min_jobs and
+    # max_jobs (AIMD on throughput and throttling); max_mbps caps the total upload rate
+    max_jobs = cfg.get("max_jobs")
+    if not max_jobs:
+        max_jobs = args.max_jobs
+    min_jobs = cfg.get("min_jobs")
+    if not min_jobs:
+        min_jobs = args.min_jobs
+    max_mbps = cfg.get("max_mbps")
+    if not max_mbps:
+        max_mbps = args.max_mbps
+    limit = None
+    if max_jobs or max_mbps:
+        limit = AdaptiveConcurrency(lo=min_jobs if max_jobs else jobs, hi=max_jobs or jobs, start=jobs,
+                                    max_mbps=max_mbps, label="submit")
+
+    # Zero-disk upload: no submission folder, the files go straight to the FTPS area
+    if args.ftp_upload:
+        if not table_path:
+            sys.exit("--ftp_upload needs a table (-c TABLE or data_runs in config)")
+        user, pwd = load_credentials(cred_path)
+        ftp_upload_table(table_path, ftp_host, ftp_dir, user, pwd, ftp_tsv, tls=ftp_tls,
+                         jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+        return
+
+    # Promote: test-accepted samples go to live as staged, no conversion and no re-hashing
+    if args.promote:
+        user, pwd = load_credentials(cred_path)
+        jar = find_jar(jar_path)
+        logs = prepare_logs_dir(args.logs_dir)
+        manifests = discover_manifests(sub_dir)
+        if not manifests:
+            sys.exit("No manifests found; run with -c your.xlsx and submit to test first.")
+        promote_manifests(manifests, jar, user, pwd, logs, "reads", batch=bool(webin_batch), wait=wait,
+                          jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+        return
+
+    # Watch: stage, and submit, only the rows that are new or changed, as their data arrive
+    if watch:
+        if not table_path:
+            sys.exit("--watch needs a table (-c TABLE or data_runs in config)")
+        if submit:
+            user, pwd = load_credentials(cred_path)
+            jar = find_jar(jar_path)
+            logs = prepare_logs_dir(args.logs_dir)
+
+        def process(rows):
+            staged = {}
+            convert_manifests(table_path, sub_dir, integrity=integrity, threads=int(threads), wait=wait,
+                              byte_budget=byte_budget, rows=set(rows), staged=staged)
+            statuses = {idx: "staged" for idx in staged}
+            if not submit:
+                return statuses
+            # Samples the test server already accepted exactly as they are staged now are not sent again
+            todo = {idx: mf for idx, mf in staged.items() if live or not promotable(mf, logs)[0]}
+            statuses.update({idx: "submitted" for idx in staged if idx not in todo})
+            if todo:
+                results = submit_manifests(list(todo.values()), jar, user, pwd, live, logs, "reads",
+                                           batch=bool(webin_batch), wait=wait, jobs=int(jobs), byte_budget=byte_budget,
+                                           limit=limit)
+                for idx, res in zip(todo, results):
+                    if res.get("locked") or webin_throttled(res):
+                        del statuses[idx]  # not the row's fault: retried on the next round
+                    else:
+                        statuses[idx] = "submitted" if res["returncode"] == 0 else "failed"
+            return statuses
+
+        file_cols_of = lambda df: [c for c in df.columns if c.upper() in ("BAM", "CRAM") or c.upper().startswith("FASTQ")]
+        watch_sheet(table_path, sub_dir, ("SAMPLE", "NAME"), file_cols_of, _row_inputs, process,
+                    settle=float(watch_settle), poll=float(watch_poll))
+        return
 
     if submit:
         user, pwd = load_credentials(cred_path)
         jar = find_jar(jar_path)
         logs = prepare_logs_dir(args.logs_dir)
+
+    # A streamed sheet hands its manifests over chunk by chunk instead of keeping a list
+    # of them all; with -s each chunk is submitted as soon as it is staged
+    on_chunk = None
+    if stream and table_path:
+        on_chunk = lambda mfs: None
+        if submit:
+            on_chunk = lambda mfs: submit_manifests(mfs, jar, user, pwd, live, logs, "reads", batch=bool(webin_batch),
+                                                    wait=wait, jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+
+    manifests = []
+    if table_path:
+        manifests = convert_manifests(table_path, sub_dir, integrity=integrity, threads=int(threads), wait=wait,
+                                      byte_budget=byte_budget, stream=bool(stream), on_chunk=on_chunk)
+
+    if submit and not on_chunk:
         if not manifests: #discover
-            manifests = sorted(
-                glob.glob(os.path.join(sub_dir, "*", "manifest.txt"))
-            )
+            manifests = discover_manifests(sub_dir)
             if not manifests:
                 sys.exit("No manifests found; run with -c your.xlsx first.")
-        submit_manifests(manifests, jar, user, pwd, live, logs)
+        submit_manifests(manifests, jar, user, pwd, live, logs, "reads", batch=bool(webin_batch), wait=wait,
+                         jobs=int(jobs), byte_budget=byte_budget, limit=limit)
+
+    # Drop store objects left behind by deleted or re-staged samples
+    if args.gc_store:
+        gc_store(sub_dir)
+
+    # Samples, bytes and failures per status, from the catalog
+    if args.report:
+        cat = Catalog.existing(sub_dir)
+        if cat is None:
+            sys.exit(f"No catalog in {sub_dir}; stage with -c TABLE first.")
+        with cat:
+            cat.report()
 
-    if not table_path and not submit:
+    if not table_path and not submit and not args.gc_store and not args.report:
         p.print_help()
 
 if __name__ == "__main__":
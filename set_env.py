@@ -1,13 +1,19 @@
 import sys
 import subprocess
 import os
+import json
+import time
+import hashlib
+import platform
 from pathlib import Path
 import argparse
 
 # Paths
 ROOT    = Path(__file__).parent.resolve()
-ENV_DIR = ROOT / "env"
+ENV_DIR = Path(os.environ.get("ENFLORA_ENV") or ROOT / "env")
 BIN_DIR = ENV_DIR / ("Scripts" if os.name == "nt" else "bin")
+REQUIREMENTS = ROOT / "requirements.txt"
+STAMP_NAME   = ".enflora-env.json"
 
 
 def run_bash(cmd_list):
@@ -18,28 +24,124 @@ def run_bash(cmd_list):
     return subprocess.run(bash_cmd, check=True)
 
 
-def bootstrap_venv():
+def env_key(req_file=REQUIREMENTS):
     """
-    Create or update the virtual environment in ENV_DIR, then pip-install dependencies.
+    Hash of the requirement set + Python version/platform. An env/ built for the
+    same key is reused as is, without running pip at all.
     """
-    if not ENV_DIR.exists():
-        print(f"→ Creating virtual environment in {ENV_DIR}")
-        subprocess.check_call([sys.executable, "-m", "venv", str(ENV_DIR)])
-    else:
-        print(f"→ Virtual environment already exists at {ENV_DIR}, upgrading packages…")
+    reqs = sorted(
+        line.split("#", 1)[0].strip()
+        for line in Path(req_file).read_text().splitlines()
+        if line.split("#", 1)[0].strip()
+    )
+    ident = {
+        "requirements": reqs,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": f"{sys.platform}-{platform.machine()}",
+    }
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest(), ident
+
 
+def env_is_current(key):
+    """
+    True if ENV_DIR was fully built for `key` (the stamp is written last, so a half-built env never matches).
+    """
+    stamp = ENV_DIR / STAMP_NAME
     python_bin = BIN_DIR / ("python.exe" if os.name == "nt" else "python")
+    if not (stamp.exists() and python_bin.exists()):
+        return False
+    try:
+        return json.loads(stamp.read_text()).get("key") == key
+    except (OSError, ValueError):
+        return False
+
+
+class EnvLock:
+    """
+    Exclusive lock next to ENV_DIR, so concurrent array tasks build a shared env only once.
+    Without fcntl (Windows) or write access to the parent folder, it is a no-op.
+    """
+    def __init__(self):
+        self.path = ENV_DIR.parent / f".{ENV_DIR.name}.lock"
+        self.fh = None
+
+    def __enter__(self):
+        try:
+            import fcntl
+            self.fh = open(self.path, "w")
+        except (ImportError, OSError):
+            return self
+        try:
+            fcntl.flock(self.fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"→ Another job is building {ENV_DIR}, waiting for it…")
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fh:
+            self.fh.close()  # releases the lock
+
+
+def bootstrap_venv(wheelhouse=None, upgrade=False, req_file=REQUIREMENTS):
+    """
+    Create or update the virtual environment in ENV_DIR from requirements.txt.
+
+    Skips all pip work when ENV_DIR was already built for the same requirements and
+    Python (see env_key). With `wheelhouse`, installs offline from that folder of wheels
+    (see --download_wheels). `upgrade` forces the old behaviour: upgrade pip and all packages.
+    """
+    key, ident = env_key(req_file)
+    if not upgrade and env_is_current(key):
+        print(f"→ Virtual environment at {ENV_DIR} is up to date ({key[:12]}), nothing to install.\n")
+        return
+
+    with EnvLock():
+        # Another task may have finished the build while we waited for the lock
+        if not upgrade and env_is_current(key):
+            print(f"→ Virtual environment at {ENV_DIR} was just built by another job ({key[:12]}).\n")
+            return
 
-    # 1) Upgrade pip
-    print("→ Upgrading pip inside the venv…")
-    subprocess.check_call([str(python_bin), "-m", "pip", "install", "--upgrade", "pip"])
+        t0 = time.time()
+        python_bin = BIN_DIR / ("python.exe" if os.name == "nt" else "python")
+        stamp = ENV_DIR / STAMP_NAME
+        if not ENV_DIR.exists():
+            print(f"→ Creating virtual environment in {ENV_DIR}")
+            subprocess.check_call([sys.executable, "-m", "venv", str(ENV_DIR)])
+        elif stamp.exists() and json.loads(stamp.read_text()).get("python") != ident["python"]:
+            print(f"→ Python changed to {ident['python']}, recreating {ENV_DIR}")
+            subprocess.check_call([sys.executable, "-m", "venv", "--clear", str(ENV_DIR)])
+        else:
+            print(f"→ Virtual environment already exists at {ENV_DIR}, updating packages…")
+        if stamp.exists():
+            stamp.unlink()
 
-    # 2) Install / upgrade required packages
-    packages = ["pandas", "openpyxl", "biopython", "pyyaml"]
-    print(f"→ Installing/updating packages: {', '.join(packages)}")
-    subprocess.check_call([str(python_bin), "-m", "pip", "install", "--upgrade"] + packages)
+        pip = [str(python_bin), "-m", "pip", "install", "--disable-pip-version-check"]
+        if wheelhouse:
+            pip += ["--no-index", "--find-links", str(wheelhouse)]
 
-    print("Virtual environment is ready.\n")
+        # 1) Upgrade pip (only on request: it needs the internet or a pip wheel in the wheelhouse)
+        if upgrade:
+            print("→ Upgrading pip inside the venv…")
+            subprocess.check_call(pip + ["--upgrade", "pip"])
+
+        # 2) Install required packages
+        print(f"→ Installing packages from {req_file}" + (f" (offline, wheels from {wheelhouse})" if wheelhouse else ""))
+        subprocess.check_call(pip + (["--upgrade"] if upgrade else []) + ["-r", str(req_file)])
+
+        stamp.write_text(json.dumps({"key": key, **ident, "built": time.strftime("%Y-%m-%d %H:%M:%S")}, indent=1))
+        print(f"Virtual environment is ready ({time.time() - t0:.0f}s).\n")
+
+
+def download_wheels(dest, req_file=REQUIREMENTS):
+    """
+    Fill a wheelhouse for offline installs (run once on a node with internet).
+    """
+    print(f"→ Downloading wheels for {req_file} into {dest}")
+    subprocess.check_call([sys.executable, "-m", "pip", "download", "--only-binary", ":all:",
+                           "-r", str(req_file), "-d", str(dest)])
+    print(f"Done. Install from it with:\n  python set_env.py -s --wheelhouse {dest}\n")
 
 
 def open_venv_shell(use_hpc):
@@ -82,6 +184,13 @@ def main():
       python set_env.py -s -r [-H]
 
       (Add -H if running on the HPC, this way it will directly module load Java)
+
+      # 4) Compute nodes without internet: download wheels once, then install offline
+      python set_env.py --download_wheels wheelhouse/
+      python set_env.py -s --wheelhouse wheelhouse/
+
+      # 5) One env shared by all array tasks (built once, reused read-only afterwards)
+      python set_env.py -s --env_dir /shared/enflora-env    # or export ENFLORA_ENV=...
     """
     parser = argparse.ArgumentParser(
         description="Create/update venv and/or open a shell with venv activated"
@@ -98,9 +207,35 @@ def main():
         "--run", "-r", action="store_true",
         help="Open a new interactive shell with the venv activated (and HPC modules if requested)."
     )
+    parser.add_argument(
+        "--env_dir", metavar="DIR",
+        help="Where the venv lives (default: $ENFLORA_ENV or env/ next to this script)."
+    )
+    parser.add_argument(
+        "--wheelhouse", metavar="DIR", default=os.environ.get("ENFLORA_WHEELHOUSE"),
+        help="Install offline from this folder of wheels (default: $ENFLORA_WHEELHOUSE)."
+    )
+    parser.add_argument(
+        "--download_wheels", metavar="DIR",
+        help="Download wheels for requirements.txt into DIR (needs internet), for later --wheelhouse installs."
+    )
+    parser.add_argument(
+        "--upgrade", action="store_true",
+        help="Upgrade pip and all packages even if the env is up to date."
+    )
 
     args = parser.parse_args()
 
+    global ENV_DIR, BIN_DIR
+    if args.env_dir:
+        ENV_DIR = Path(args.env_dir).resolve()
+        BIN_DIR = ENV_DIR / ("Scripts" if os.name == "nt" else "bin")
+
+    if args.download_wheels:
+        download_wheels(args.download_wheels)
+        if not (args.setup or args.run):
+            return
+
     if not (args.setup or args.run):
         parser.print_help()
         sys.exit(1)
@@ -118,7 +253,7 @@ def main():
 
     # Perform setup if requested
     if args.setup:
-        bootstrap_venv()
+        bootstrap_venv(wheelhouse=args.wheelhouse, upgrade=args.upgrade)
 
     # Open the shell if requested
     if args.run:
@@ -0,0 +1,159 @@
+"""
+Tests for analysis/analysis.py. Run from the project root with `python -m pytest tests`
+(or `python -m unittest discover tests`).
+"""
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "analysis")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+import analysis
+
+
+class SeqIndexTest(unittest.TestCase):
+    """
+    build_seq_index and its <path>.seqidx cache.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fasta = os.path.join(self.tmp.name, "asm.fasta")
+        with open(self.fasta, "w") as fh:
+            fh.write(">chr1 first\nACGTACGT\nACG\n>chr2\nNNNNA\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        with mock.patch.object(analysis, "build_seq_index", wraps=analysis.build_seq_index) as build:
+            index = analysis.load_seq_index(self.fasta)
+        return index, build.call_count
+
+    def test_fasta_is_indexed_once(self):
+        self.assertEqual(self.load(), ([("chr1", 11, 12), ("chr2", 5, 31)], 1))
+        self.assertTrue(os.path.exists(self.fasta + ".seqidx"))
+        self.assertEqual(self.load(), ([("chr1", 11, 12), ("chr2", 5, 31)], 0))
+
+    def test_changed_input_is_reindexed(self):
+        self.load()
+        with open(self.fasta, "a") as fh:
+            fh.write(">chr3\nAC\n")
+        index, builds = self.load()
+        self.assertEqual(builds, 1)
+        self.assertEqual(index[-1][:2], ("chr3", 2))
+
+    def test_unwritable_cache_is_skipped(self):
+        real_open = open
+        def no_write(path, mode="r", *a, **kw):
+            if path.endswith(".seqidx") and "w" in mode:
+                raise PermissionError(13, "Permission denied", path)
+            return real_open(path, mode, *a, **kw)
+        with mock.patch("builtins.open", no_write), mock.patch("sys.stdout"):
+            self.assertEqual(self.load()[0][0], ("chr1", 11, 12))
+        self.assertFalse(os.path.exists(self.fasta + ".seqidx"))
+
+    def test_gzipped_embl(self):
+        path = os.path.join(self.tmp.name, "chr.embl.gz")
+        with gzip.open(path, "wt") as fh:
+            fh.write("ID   XXX; SV 1; linear; genomic DNA; STD; HUM; 12 BP.\n"
+                     "AC   * _scaffold1;\nSQ   Sequence 12 BP;\n"
+                     "     acgtacgtac gt                                                     12\n//\n")
+        self.assertEqual(analysis.build_seq_index(path), [("_scaffold1", 12, 0)])
+
+
+class AgpFromGapsTest(unittest.TestCase):
+    """
+    write_agp_from_gaps: contigs + AGP from the N-runs of a scaffold FASTA.
+    """
+    FASTA = ">s1 scaffold one\nNNACGTNNN\nNNGGNACNN\n>s2\nNNNN\n>s3\nAC\n"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fasta = os.path.join(self.tmp.name, "asm.fa")
+        with open(self.fasta, "w") as fh:
+            fh.write(self.FASTA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def split(self):
+        out = os.path.join(self.tmp.name, "out")
+        with mock.patch("sys.stdout") as stdout:
+            fa, agp, gaps = analysis.write_agp_from_gaps(self.fasta, out, min_gap=3, width=3)
+        self.assertIn("s2 is all N", "".join(c.args[0] for c in stdout.write.call_args_list))
+        with gzip.open(os.path.join(out, fa), "rt") as fh:
+            contigs = fh.read()
+        with gzip.open(os.path.join(out, agp), "rt") as fh:
+            lines = fh.read().splitlines()
+        return (fa, agp, gaps), contigs, lines
+
+    def test_gaps_split_scaffolds(self):
+        names, contigs, lines = self.split()
+        self.assertEqual(names, ("asm.contigs.fasta.gz", "asm.agp.gz", 1))
+        self.assertEqual(contigs, ">s1_1\nACG\nT\n>s1_2\nGGN\nAC\n>s3_1\nAC\n")
+        self.assertEqual(lines, [
+            "##agp-version\t2.0",
+            "s1\t1\t4\t1\tW\ts1_1\t1\t4\t+",
+            "s1\t5\t9\t2\tN\t5\tscaffold\tyes\tunspecified",
+            "s1\t10\t14\t3\tW\ts1_2\t1\t5\t+",
+            "s3\t1\t2\t1\tW\ts3_1\t1\t2\t+",
+        ])
+
+    def test_block_boundaries_do_not_matter(self):
+        whole = self.split()
+        with mock.patch.object(analysis, "AGP_BLOCK", 2):
+            self.assertEqual(self.split(), whole)
+
+
+class LintEmblTest(unittest.TestCase):
+    """
+    lint_embl on small hand-written flatfiles.
+    """
+    RECORD = ("ID   chr1; SV 1; linear; genomic DNA; STD; PLN; 12 BP.\n"
+              "FT   source          1..12\n"
+              "FT                   /organism=\"Zea mays\"\n"
+              "FT   misc_feature    join(J00194.1:100..202,3..{end})\n"
+              "SQ   Sequence 12 BP; 3 A; 3 C; 3 G; 3 T; 0 other;\n"
+              "     acgtacgtac gt                                                     {count}\n"
+              "//\n")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def lint(self, text, name="chr.embl"):
+        path = os.path.join(self.tmp.name, name)
+        with (gzip.open if name.endswith(".gz") else open)(path, "wt") as fh:
+            fh.write(text)
+        return analysis.lint_embl(path)
+
+    def test_valid_record(self):
+        self.assertEqual(self.lint(self.RECORD.format(end=12, count=12), "chr.embl.gz"), [])
+
+    def test_lengths_and_bounds(self):
+        problems = self.lint(self.RECORD.replace("12 BP.", "13 BP.").format(end=20, count=10))
+        self.assertEqual(problems, [
+            "line 6: record chr1: sequence line count 10 != residues so far 12",
+            "line 1: record chr1: ID line says 13 BP, sequence has 12",
+            "line 4: record chr1: feature location 20 is beyond the sequence end (12)",
+        ])
+
+    def test_truncated_file(self):
+        text = self.RECORD.format(end=12, count=12)
+        self.assertEqual(self.lint(text[:-3]), ["line 6: record chr1 is not terminated with '//' (truncated file?)"])
+
+    def test_problems_are_capped(self):
+        problems = self.lint("junk\n" * (analysis.LINT_MAX_PROBLEMS + 5))
+        self.assertEqual(len(problems), analysis.LINT_MAX_PROBLEMS + 1)
+        self.assertEqual(problems[-1], "… and 5 more")
+
+
+if __name__ == "__main__":
+    unittest.main()
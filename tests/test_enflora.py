@@ -0,0 +1,213 @@
+"""
+Tests for enflora.py. Run from the project root with `python -m pytest tests`
+(or `python -m unittest discover tests`).
+"""
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+import enflora
+from enflora import SampleLock
+
+
+def _enolck(fh, cmd, *args):
+    raise OSError(errno.ENOLCK, "No locks available")
+
+
+@mock.patch("fcntl.lockf", _enolck)
+class SampleLockWithoutLockfTest(unittest.TestCase):
+    """
+    Filesystems without a lock manager: lockf fails with ENOLCK and the O_EXCL fallback is used.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "SAMPLE.lock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_acquire_and_release(self):
+        with SampleLock(self.path, wait=False) as got:
+            self.assertTrue(got)
+            self.assertTrue(os.path.exists(self.path + ".excl"))
+        self.assertFalse(os.path.exists(self.path + ".excl"))
+        with SampleLock(self.path, wait=False) as got:
+            self.assertTrue(got)
+
+    def test_held_lock_is_not_taken(self):
+        with SampleLock(self.path, wait=False) as got:
+            self.assertTrue(got)
+            with SampleLock(self.path, wait=False) as again:
+                self.assertFalse(again)
+
+    def test_dead_holder_is_taken_over(self):
+        with open(self.path + ".excl", "w") as fh:
+            fh.write(f"{enflora.socket.gethostname()} 999999999 2000-01-01 00:00:00\n")
+        with mock.patch("os.kill", side_effect=ProcessLookupError):
+            with SampleLock(self.path, wait=False) as got:
+                self.assertTrue(got)
+
+    def test_empty_holder_file_is_judged_by_age(self):
+        excl = self.path + ".excl"
+        open(excl, "w").close()
+        with SampleLock(self.path, wait=False) as got:
+            self.assertFalse(got)
+        old = os.path.getmtime(excl) - SampleLock.STALE_AFTER - 60
+        os.utime(excl, (old, old))
+        with SampleLock(self.path, wait=False) as got:
+            self.assertTrue(got)
+
+    def test_store_lock(self):
+        with enflora._store_lock(self.tmp.name):
+            self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "store.lock.excl")))
+        with enflora._store_lock(self.tmp.name):
+            pass
+
+
+class SampleLockPathTest(unittest.TestCase):
+    def test_lock_files_are_hidden(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            samp = os.path.join(tmp, "submission", "SAMPLE")
+            os.makedirs(samp)
+            with enflora.sample_lock(samp) as got:
+                self.assertTrue(got)
+            self.assertEqual(sorted(os.listdir(os.path.dirname(samp))), [enflora.LOCK_DIR, "SAMPLE"])
+            self.assertEqual(os.listdir(os.path.join(tmp, "submission", enflora.LOCK_DIR)), ["SAMPLE.lock"])
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sub = os.path.join(self.tmp.name, "submission")
+        self.src = os.path.join(self.tmp.name, "reads.fastq")
+        with open(self.src, "wb") as fh:
+            fh.write(b"@r\nACGT\n+\nIIII\n" * 100)
+        for samp in ("A", "B"):
+            os.makedirs(os.path.join(self.sub, samp))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stage(self, samp):
+        with mock.patch("sys.stdout"):
+            return enflora.stage_compressed(self.src, os.path.join(self.sub, samp), self.sub)
+
+    def test_shared_input_is_compressed_once(self):
+        with mock.patch.object(enflora, "_store_put", wraps=enflora._store_put) as put:
+            self.stage("A")
+            self.stage("B")
+        self.assertEqual(put.call_count, 1)
+        store = os.path.join(self.sub, enflora.STORE_DIR)
+        (obj,) = [n for n in os.listdir(store) if n.endswith(".gz")]
+        with open(os.path.join(store, obj[:-3] + ".refs")) as fh:
+            self.assertEqual(fh.read().split(), ["A/reads.fastq.gz", "B/reads.fastq.gz"])
+        self.assertEqual(len(enflora._store_md5(store, obj[:-3])), 32)
+        self.assertFalse(os.path.exists(os.path.join(store, "index.json")))
+
+    def test_gc_keeps_linked_objects_only(self):
+        self.stage("A")
+        self.stage("B")
+        store = os.path.join(self.sub, enflora.STORE_DIR)
+        os.remove(os.path.join(self.sub, "A", "reads.fastq.gz"))
+        with mock.patch("sys.stdout"):
+            enflora.gc_store(self.sub)
+        (obj,) = [n for n in os.listdir(store) if n.endswith(".gz")]
+        with open(os.path.join(store, obj[:-3] + ".refs")) as fh:
+            self.assertEqual(fh.read().split(), ["B/reads.fastq.gz"])
+        os.remove(os.path.join(self.sub, "B", "reads.fastq.gz"))
+        with mock.patch("sys.stdout"):
+            enflora.gc_store(self.sub)
+        self.assertEqual([n for n in os.listdir(store) if not n.startswith(".") and n != "store.lock"],
+                         [enflora.STORE_SOURCES])
+        self.assertEqual(os.listdir(os.path.join(store, enflora.STORE_SOURCES)), [])
+
+
+class CatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        samp = os.path.join(self.tmp.name, "SAMPLE")
+        os.makedirs(samp)
+        with open(os.path.join(samp, "reads.fastq.gz"), "wb") as fh:
+            fh.write(b"x" * 10)
+        self.mf = os.path.join(samp, "manifest.txt")
+        with open(self.mf, "w") as fh:
+            fh.write("NAME\tSAMPLE\nFASTQ\treads.fastq.gz\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_add_sample_is_visible_to_other_jobs(self):
+        import sqlite3
+        with enflora.Catalog(self.tmp.name) as cat:
+            cat.add_sample("SAMPLE", 1, self.mf)
+            other = sqlite3.connect(os.path.join(self.tmp.name, enflora.CATALOG), timeout=0)
+            self.assertEqual(other.execute("SELECT sample_id, bytes FROM samples").fetchall(), [("SAMPLE", 10)])
+            with other:  # would fail with "database is locked" while add_sample held its transaction
+                other.execute("UPDATE samples SET status = 'test_ok'")
+            other.close()
+
+    def test_record_status_on_locked_catalog(self):
+        import sqlite3
+        with enflora.Catalog(self.tmp.name) as cat:
+            cat.add_sample("SAMPLE", 1, self.mf)
+        other = sqlite3.connect(os.path.join(self.tmp.name, enflora.CATALOG))
+        other.execute("BEGIN EXCLUSIVE")
+        try:
+            with mock.patch("sqlite3.connect", lambda path, **kw: sqlite3.dbapi2.connect(path, timeout=0)):
+                enflora.record_status(self.tmp.name, "SAMPLE", "failed")
+        finally:
+            other.rollback()
+            other.close()
+
+
+@mock.patch.dict(os.environ, {"FAKE_WEBIN_STARTUP": "0", "FAKE_WEBIN_CALL": "0"})
+class PromoteTest(unittest.TestCase):
+    """
+    Test and live submissions through mock_ena/fake_webin_cli.py.
+    """
+    JAR = os.path.join(ROOT, "mock_ena", "fake_webin_cli.py")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        samp = os.path.join(self.tmp.name, "submission", "SAMPLE")
+        os.makedirs(samp)
+        with open(os.path.join(samp, "reads.fastq.gz"), "wb") as fh:
+            fh.write(b"x" * 10)
+        self.mf = os.path.join(samp, "manifest.txt")
+        with open(self.mf, "w") as fh:
+            fh.write("STUDY\tPRJEB1\nSAMPLE\tSAMEA1\nNAME\tSAMPLE\nFASTQ\treads.fastq.gz\n")
+        self.logs = os.path.join(self.tmp.name, "logs")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def submit(self, live):
+        with mock.patch("sys.stdout"):
+            res = enflora.submit_manifest(self.mf, self.JAR, "user", "pwd", live, self.logs, "reads",
+                                          progress=False)
+        self.assertEqual(res["returncode"], 0)
+
+    def promote(self):
+        with mock.patch("sys.stdout"), mock.patch.object(enflora, "submit_manifest",
+                                                         wraps=enflora.submit_manifest) as sub:
+            enflora.promote_manifests([self.mf], self.JAR, "user", "pwd", self.logs, "reads")
+        return sub.call_count
+
+    def test_retest_after_promote_is_not_promoted_again(self):
+        self.submit(live=False)
+        self.assertEqual(self.promote(), 1)
+        self.submit(live=False)
+        ok, why = enflora.promotable(self.mf, self.logs)
+        self.assertFalse(ok)
+        self.assertIn("already submitted live", why)
+        self.assertEqual(self.promote(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+"""
+Tests for runs/runs.py. Run from the project root with `python -m pytest tests`
+(or `python -m unittest discover tests`).
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "runs"), os.path.join(ROOT, "mock_ena")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+import enflora
+import ftp_mock
+import runs
+
+COLUMNS = ["STUDY", "SAMPLE", "NAME", "INSTRUMENT", "INSERT_SIZE", "LIBRARY_NAME", "LIBRARY_SOURCE",
+           "LIBRARY_SELECTION", "LIBRARY_STRATEGY", "DESCRIPTION", "FASTQ"]
+
+
+class IntegrityTest(unittest.TestCase):
+    """
+    Tail checks of .bam/.cram/.gz inputs, and the full decode of --integrity full.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return path
+
+    def test_bgzf_eof_block(self):
+        self.assertIsNone(runs.check_file_tail(self.write("ok.bam", runs.BGZF_EOF * 2)))
+        cut = self.write("cut.bam", runs.BGZF_EOF + runs.BGZF_EOF[:20])
+        self.assertIn("BGZF EOF", runs.check_file_tail(cut))
+
+    def test_cram_eof_container(self):
+        head = b"CRAM\x03\x00" + b"file-id".ljust(20, b"\x00")
+        self.assertIsNone(runs.check_file_tail(self.write("ok.cram", head + runs.CRAM_EOF[3])))
+        self.assertIn("CRAM v3 EOF", runs.check_file_tail(self.write("cut.cram", head + b"\x00" * 40)))
+        self.assertIn("bad magic", runs.check_file_tail(self.write("bad.cram", b"BAM\x01" + b"\x00" * 40)))
+
+    def test_gzip_trailer(self):
+        data = gzip.compress(os.urandom(200))
+        self.assertIsNone(runs.check_file_tail(self.write("ok.fastq.gz", data)))
+        self.assertIn("zeroed", runs.check_file_tail(self.write("zero.fastq.gz", data[:-8] + b"\x00" * 8)))
+        small = gzip.compress(b"ACGT")
+        huge = self.write("isize.fastq.gz", small[:-4] + struct.pack("<I", 2 ** 31))
+        self.assertIn("implausible gzip ISIZE", runs.check_file_tail(huge))
+
+    def test_full_decode_finds_what_the_tail_misses(self):
+        data = bytearray(gzip.compress(b"ACGT" * 1000))
+        data[-8] ^= 0xFF  # wrong CRC32, plausible ISIZE
+        bad = self.write("crc.fastq.gz", bytes(data))
+        good = self.write("ok.fastq.gz", gzip.compress(b"ACGT"))
+        with mock.patch("sys.stdout"):
+            runs.verify_inputs([good, bad])
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr") as err, self.assertRaises(SystemExit) as cm:
+            runs.verify_inputs([good, bad, good], full=True, threads=2)
+        self.assertIn("1 of 2 file(s)", str(cm.exception))
+        self.assertIn(bad, "".join(c.args[0] for c in err.write.call_args_list))
+
+
+class TarMemberTest(unittest.TestCase):
+    """
+    archive.tar::member inputs, streamed out of the archive into the store.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sub = os.path.join(self.tmp.name, "submission")
+        self.archive = os.path.join(self.tmp.name, "delivery.tar.gz")
+        self.reads = {"lane1/r1.fastq": b"@r1\nACGT\n+\nIIII\n", "lane1/r2.fastq.gz": gzip.compress(b"@r2\nTT\n+\nII\n")}
+        with tarfile.open(self.archive, "w:gz") as tar:
+            for name, data in [("README", b"x")] + list(self.reads.items()):
+                info = tarfile.TarInfo("./" + name)  # './' prefixes as `tar -C dir .` writes them
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stage(self, *members):
+        with mock.patch("sys.stdout"):
+            return runs.stage_tar_members({self.archive: set(members)}, self.sub)
+
+    def test_split_tar_ref(self):
+        self.assertEqual(runs.split_tar_ref(f"{self.archive} :: ./lane1/r1.fastq"), (self.archive, "lane1/r1.fastq"))
+        self.assertIsNone(runs.split_tar_ref(self.archive))
+
+    def test_members_are_stored_once(self):
+        staged = self.stage(*self.reads)
+        self.assertEqual({k[1]: v[1] for k, v in staged.items()},
+                         {"lane1/r1.fastq": "r1.fastq.gz", "lane1/r2.fastq.gz": "r2.fastq.gz"})
+        store = os.path.join(self.sub, enflora.STORE_DIR)
+        digest = staged[(self.archive, "lane1/r1.fastq")][0]
+        with gzip.open(os.path.join(store, digest + ".gz")) as fh:
+            self.assertEqual(fh.read(), self.reads["lane1/r1.fastq"])
+        digest = staged[(self.archive, "lane1/r2.fastq.gz")][0]
+        with open(os.path.join(store, digest + ".gz"), "rb") as fh:
+            self.assertEqual(fh.read(), self.reads["lane1/r2.fastq.gz"])  # .gz members are kept as they are
+        with mock.patch("tarfile.open") as opened:
+            self.assertEqual(self.stage(*self.reads), staged)
+        opened.assert_not_called()
+
+    def test_missing_member(self):
+        with self.assertRaises(SystemExit) as cm:
+            self.stage("lane1/r1.fastq", "lane2/r1.fastq")
+        self.assertIn("lane2/r1.fastq", str(cm.exception))
+
+    def test_manifest_links_members(self):
+        table = os.path.join(self.tmp.name, "runs.tsv")
+        with open(table, "w") as fh:
+            fh.write("\t".join(COLUMNS + ["FASTQ2"]) + "\n")
+            fh.write("\t".join(["PRJEB1", "S1", "lane1", "Illumina NovaSeq 6000", "300", "lib1", "GENOMIC",
+                                "RANDOM", "WGS", "-"] + [f"{self.archive}::{m}" for m in self.reads]) + "\n")
+        with mock.patch("sys.stdout"):
+            (mf,) = runs.convert_manifests(table, self.sub)
+        with open(mf) as fh:
+            self.assertTrue(fh.read().endswith("FASTQ\tr1.fastq.gz\nFASTQ\tr2.fastq.gz\n"))
+        with gzip.open(os.path.join(self.sub, "S1", "r1.fastq.gz")) as fh:
+            self.assertEqual(fh.read(), self.reads["lane1/r1.fastq"])
+
+
+class StreamTest(unittest.TestCase):
+    """
+    --stream: a TSV sheet is staged two rows at a time and its manifests are handed over per chunk.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sub = os.path.join(self.tmp.name, "submission")
+        self.table = os.path.join(self.tmp.name, "runs.tsv")
+        with open(self.table, "w") as fh:
+            fh.write("\t".join(COLUMNS) + "\n")
+            for i, sample in enumerate(["S1", "S2", "S1", "S3", "S1"]):
+                reads = os.path.join(self.tmp.name, f"lane{i}.fastq")
+                with open(reads, "w") as rf:
+                    rf.write(f"@r{i}\nACGT\n+\nIIII\n")
+                fh.write("\t".join(["PRJEB1", sample, f"lane{i}", "Illumina NovaSeq 6000", "300", f"lib{i}",
+                                    "GENOMIC", "RANDOM", "WGS", "-", reads]) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def convert(self, **kw):
+        with mock.patch("sys.stdout"), mock.patch.object(enflora.TsvStream.__init__, "__defaults__", (2,)):
+            return runs.convert_manifests(self.table, self.sub, stream=True, **kw)
+
+    def test_manifests_are_handed_over_per_chunk(self):
+        chunks = []
+        self.assertEqual(self.convert(on_chunk=chunks.append), [])
+        self.assertEqual([[os.path.basename(os.path.dirname(mf)) for mf in c] for c in chunks],
+                         [["S1", "S2"], ["S1_2", "S3"], ["S1_3"]])
+        with open(chunks[-1][0]) as fh:
+            self.assertIn("FASTQ\tlane4.fastq.gz\n", fh.read())
+
+    def test_without_on_chunk_every_manifest_is_returned(self):
+        self.assertEqual(len(self.convert()), 5)
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is needed for the test certificate")
+class FtpUploadTest(unittest.TestCase):
+    """
+    --ftp_upload through GzipPipe into mock_ena/ftp_mock.py, with explicit TLS.
+    """
+    @classmethod
+    def setUpClass(cls):
+        import ssl
+        cls.tmp = tempfile.TemporaryDirectory()
+        cert, key = (os.path.join(cls.tmp.name, n) for n in ("cert.pem", "key.pem"))
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                        "-days", "1", "-subj", "/CN=127.0.0.1"], check=True, capture_output=True)
+        cls.root = os.path.join(cls.tmp.name, "ftp_root")
+        os.makedirs(cls.root)
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+        ftp_mock.FtpHandler.args = argparse.Namespace(root=cls.root, mbps=0, max_uploads=1, user="Webin-1",
+                                                      password="pwd")
+        ftp_mock.FtpHandler.tls = ctx
+        cls.server = ftp_mock.FtpServer(("127.0.0.1", 0), ftp_mock.FtpHandler)
+        cls.host = "127.0.0.1:%d" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.tmp.cleanup()
+
+    def upload(self, name, data, remote_dir="reads/batch1"):
+        src = os.path.join(self.tmp.name, name)
+        with open(src, "wb") as fh:
+            fh.write(data)
+        with mock.patch("sys.stdout"):
+            return runs.ftp_upload_file(src, remote_dir, self.host, "Webin-1", "pwd", label="S1")
+
+    def remote(self, res):
+        with open(os.path.join(self.root, res["remote"]), "rb") as fh:
+            return fh.read()
+
+    def test_fastq_is_gzipped_on_the_way(self):
+        data = b"@r\nACGT\n+\nIIII\n" * 50000
+        with mock.patch.object(runs, "FTP_CHUNK", 4096):  # many pieces through the bounded queue
+            res = self.upload("S1_R1.fastq", data)
+        self.assertIsNone(res["error"])
+        self.assertEqual(res["remote"], "reads/batch1/S1_R1.fastq.gz")
+        sent = self.remote(res)
+        self.assertEqual(gzip.decompress(sent), data)
+        self.assertEqual((res["md5"], res["bytes"]), (hashlib.md5(sent).hexdigest(), len(sent)))
+
+    def test_compressed_input_is_sent_as_is(self):
+        data = gzip.compress(b"@r\nACGT\n+\nIIII\n")
+        res = self.upload("S1_R2.fastq.gz", data, remote_dir="")
+        self.assertEqual(res["remote"], "S1_R2.fastq.gz")
+        self.assertEqual(self.remote(res), data)
+        self.assertEqual(res["md5"], hashlib.md5(data).hexdigest())
+
+    def test_busy_server_counts_as_throttled(self):
+        with mock.patch.dict(ftp_mock._STATE, uploads=1):  # max_uploads=1 already in use
+            res = self.upload("S1_R3.fastq", b"@r\nA\n+\nI\n")
+        self.assertIn("421", res["error"])
+        self.assertTrue(res["throttled"])
+
+    def test_unreadable_source_surfaces_from_read(self):
+        pipe = runs.GzipPipe(os.path.join(self.tmp.name, "missing.fastq"))
+        with self.assertRaises(FileNotFoundError):
+            pipe.read()
+        pipe.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import java.io.BufferedReader;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+
+/**
+ * Runs Webin-CLI many times inside one JVM, so JVM start-up, class loading and
+ * JIT warm-up are paid once per batch instead of once per manifest.
+ *
+ * Started by runs.py / analysis.py (--webin_batch) in Java's single-file source mode:
+ *
+ *   java -cp webin-cli-8.2.0.jar webin_batch/WebinBatch.java
+ *
+ * Protocol (UTF-8, one line each):
+ *   stdout  "@@READY"                 entry point found, waiting for jobs
+ *           "@@UNSUPPORTED <reason>"  this webin-cli.jar cannot be driven in-process; caller falls back
+ *   stdin   "<log file>\t<arg>\t<arg>…"  one Webin-CLI call; its output is appended to <log file>
+ *   stdout  "@@EXIT <code>"           that call's exit code
+ * The batch ends when stdin is closed.
+ */
+public class WebinBatch {
+    static final String MAIN_CLASS = "uk.ac.ebi.ena.webin.cli.WebinCli";
+
+    public static void main(String[] argv) throws Exception {
+        PrintStream ctl = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        PrintStream err = System.err;
+
+        // WebinCli.main() ends in System.exit(); __main() runs the same code and returns the exit code
+        Method entry;
+        try {
+            entry = Class.forName(MAIN_CLASS).getDeclaredMethod("__main", String[].class);
+            entry.setAccessible(true);
+        } catch (ReflectiveOperationException | RuntimeException e) {
+            ctl.println("@@UNSUPPORTED " + e);
+            return;
+        }
+        ctl.println("@@READY");
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+            String[] parts = line.split("\t", -1);
+            String[] args = Arrays.copyOfRange(parts, 1, parts.length);
+            int code;
+            try (PrintStream log = new PrintStream(new FileOutputStream(parts[0], true), true, "UTF-8")) {
+                System.setOut(log);
+                System.setErr(log);
+                try {
+                    Object ret = entry.invoke(null, (Object) args);
+                    code = ret instanceof Integer ? (Integer) ret : 0;
+                } catch (InvocationTargetException e) {
+                    e.getCause().printStackTrace(log);
+                    code = 1;
+                } finally {
+                    System.setOut(ctl);
+                    System.setErr(err);
+                }
+            }
+            ctl.println("@@EXIT " + code);
+        }
+    }
+}